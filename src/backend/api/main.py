@@ -4,20 +4,51 @@ import os
 # Add the parent directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, validator
+from fastapi.responses import StreamingResponse, Response
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from pydantic import BaseModel, Field, validator
 from typing import List, Optional
 import uvicorn
 import logging
+import json
+import time
+import shutil
+import asyncio
 
 # Import services
-from services.pdf_processor import save_and_extract_pdf
-from services.web_processor import fetch_and_clean_website
-from services.chunker import chunk_text
-from services.vector_store import create_or_load_vector_store
-from services.rag_retriever import retrieve_relevant_chunks
-from workflows.rag_workflow import graph
+from services.pdf_processor import save_pdf_upload, PDF_DIR
+from services.uploads import (
+    create_upload, get_upload, append_upload, complete_upload, abort_upload, UploadTooLarge, UploadOffsetMismatch,
+    MAX_UPLOAD_BYTES, UPLOAD_DIR
+)
+from services.web_processor import WEB_DIR
+from services.vector_store import (
+    load_vector_store, get_corpus_version, list_sources, reset_vector_store, get_store_stats, list_collections,
+    get_collection_stats, validate_collection_name, collection_dir, DEFAULT_COLLECTION
+)
+from services.embeddings import describe_embedding_model
+from services.metrics import (
+    HTTP_REQUESTS, HTTP_LATENCY, HTTP_IN_FLIGHT, CORPUS_VECTORS, CORPUS_DOCUMENTS, COLLECTIONS_LOADED,
+    COLLECTION_MEMORY_BYTES
+)
+from services.content_cache import clear_content_caches
+from services.chunk_store import get_chunk_store
+from services.answer_cache import answer_cache, ANSWER_CACHE_ENABLED
+from services.ingest_jobs import submit_job, get_job, delete_ingested_source, delete_ingested_collection
+from services.rag_retriever import retrieve_relevant_chunks, retrieve_relevant_chunks_batch, embed_query, get_cache_stats
+from services.context_packer import pack_context, load_tokenizer
+from services.chat_sessions import chat_sessions, has_history, followup_query
+from workflows.rag_workflow import graph, stream_answer, generate_answer, LLM_DEPLOYMENT_NAME
+
+# Most URLs accepted by one /upload/urls call
+MAX_BATCH_URLS = int(os.getenv("MAX_BATCH_URLS", "1000"))
+
+# Batch query limits
+BATCH_QUERY_CONCURRENCY = int(os.getenv("BATCH_QUERY_CONCURRENCY", "16"))
+MAX_BATCH_QUESTIONS = int(os.getenv("MAX_BATCH_QUESTIONS", "1000"))
+MAX_TOP_K = int(os.getenv("MAX_TOP_K", "50"))
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -38,6 +69,57 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Count requests and time them per route, with the number in flight"""
+    start = time.perf_counter()
+    status = 500
+    with HTTP_IN_FLIGHT.track_inprogress():
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # Label by route template, not raw path, to keep label cardinality bounded
+            route = request.scope.get("route")
+            route = route.path if route is not None else "unmatched"
+            HTTP_REQUESTS.labels(request.method, route, str(status)).inc()
+            HTTP_LATENCY.labels(request.method, route).observe(time.perf_counter() - start)
+
+# ---------------------------
+# Startup
+# ---------------------------
+@app.on_event("startup")
+def load_persisted_index():
+    """
+    Load the default collection's persisted FAISS index so restarts don't
+    require re-ingesting; named collections load on first use
+    """
+    try:
+        stats = load_vector_store()
+        if stats["loaded"]:
+            logger.info(
+                f"Loaded {stats['vectors']} vectors in {stats['load_seconds']}s "
+                f"(generation {stats['generation']}, {stats['logged_vectors']} from the vector log, "
+                f"mmap={stats['mmapped']}, index={stats['index_bytes']} bytes, "
+                f"rss {stats['rss_bytes_before']} -> {stats['rss_bytes_after']} bytes)"
+            )
+            index = stats["index"]
+            logger.info(
+                f"Vector index: {index['type']}/{index['encoding']}, {index['bytes_per_vector']} bytes per vector "
+                f"(~{index['mb_per_million_vectors']} MB per million chunks)"
+            )
+        else:
+            logger.info("No persisted index found, starting with an empty vector store")
+    except Exception as e:
+        logger.error(f"Error loading persisted index: {str(e)}")
+
+@app.on_event("startup")
+def load_context_tokenizer():
+    """Load the prompt tokenizer before serving, so no request waits on its download"""
+    encoding = load_tokenizer()
+    logger.info(f"Counting prompt tokens with {encoding.name if encoding else 'a character estimate'}")
+
 # ---------------------------
 # Health Check
 # ---------------------------
@@ -50,13 +132,54 @@ def health_check():
         "version": "1.0.0"
     }
 
+# ---------------------------
+# Collections
+# ---------------------------
+def resolve_collection(collection: Optional[str]) -> str:
+    """Validated collection name from a query parameter; the default collection if not given"""
+    try:
+        return validate_collection_name(collection or DEFAULT_COLLECTION)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def check_collection(v):
+    """Shared pydantic validator for `collection` fields"""
+    return validate_collection_name(v.strip())
+
+def pdf_dir(collection: str) -> str:
+    """Where a collection's uploaded PDFs are kept"""
+    return collection_dir(collection, PDF_DIR)
+
+@app.get("/collections")
+def get_collections():
+    """List collections with their load state and size on disk"""
+    return {"success": True, "collections": list_collections(), **get_collection_stats()}
+
+@app.delete("/collections/{collection}")
+def delete_collection_endpoint(collection: str):
+    """Delete a collection: its index, documents and saved PDFs"""
+    collection = resolve_collection(collection)
+    try:
+        deleted = delete_ingested_collection(collection)
+    except Exception as e:
+        logger.error(f"Error deleting collection {collection}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error deleting collection {collection}: {str(e)}")
+
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"Collection '{collection}' not found")
+    if collection != DEFAULT_COLLECTION:
+        shutil.rmtree(pdf_dir(collection), ignore_errors=True)
+    logger.info(f"Deleted collection {collection}")
+    return {"success": True, "collection": collection}
+
 # ---------------------------
 # PDF Upload Endpoint
 # ---------------------------
 @app.post("/upload/pdf")
-async def upload_pdf(files: List[UploadFile] = File(...)):
-    """Upload and process PDF documents"""
-    all_chunks = []
+async def upload_pdf(files: List[UploadFile] = File(...), collection: str = DEFAULT_COLLECTION):
+    """Upload PDF documents and queue them for background ingestion into a collection"""
+    collection = resolve_collection(collection)
+    items = []
     
     for file in files:
         try:
@@ -67,46 +190,134 @@ async def upload_pdf(files: List[UploadFile] = File(...)):
                     detail=f"File '{file.filename}' is not a PDF"
                 )
             
-            # Validate file size (10MB limit)
-            content = await file.read()
-            if len(content) > 10 * 1024 * 1024:  # 10MB
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"File '{file.filename}' exceeds 10MB limit"
-                )
-            
-            # Reset file pointer for processing
-            await file.seek(0)
+            logger.info(f"Saving PDF: {file.filename}")
             
-            logger.info(f"Processing PDF: {file.filename}")
-            
-            # Process PDF and chunk the text
-            text = await save_and_extract_pdf(file)
-            chunks = chunk_text(text, source=file.filename)
-            create_or_load_vector_store(chunks)
-            all_chunks.extend(chunks)
+            # Stream the PDF to disk, enforcing the size limit as it is copied;
+            # extraction, chunking and embedding run in the job
+            file_path, file_hash = await save_pdf_upload(file, pdf_dir(collection))
+            items.append({"filename": file.filename, "path": file_path, "hash": file_hash})
             
         except HTTPException:
             raise
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
         except Exception as e:
-            logger.error(f"Error processing PDF {file.filename}: {str(e)}")
+            logger.error(f"Error saving PDF {file.filename}: {str(e)}")
             raise HTTPException(
                 status_code=500, 
-                detail=f"Error processing PDF {file.filename}: {str(e)}"
+                detail=f"Error saving PDF {file.filename}: {str(e)}"
             )
     
+    job_id = submit_job("pdf", items, collection)
+    
     return {
         "success": True,
-        "message": f"Processed {len(files)} PDF(s) successfully",
-        "total_chunks": len(all_chunks),
-        "files_processed": [file.filename for file in files]
+        "message": f"Queued {len(files)} PDF(s) for processing",
+        "collection": collection,
+        "job_id": job_id,
+        "files_queued": [item["filename"] for item in items]
     }
 
+# ---------------------------
+# Resumable PDF Uploads
+# ---------------------------
+class UploadRequest(BaseModel):
+    filename: str
+    size: Optional[int] = None
+    sha256: Optional[str] = None
+    collection: str = DEFAULT_COLLECTION
+
+    @validator('filename')
+    def validate_filename(cls, v):
+        name = os.path.basename(v.strip())
+        if name in ('', '.', '..'):
+            raise ValueError(f"Invalid filename '{v}'")
+        if not name.lower().endswith('.pdf'):
+            raise ValueError(f"File '{v}' is not a PDF")
+        return name
+
+    @validator('size')
+    def validate_size(cls, v):
+        if v is not None and not 0 < v <= MAX_UPLOAD_BYTES:
+            raise ValueError(f'Size must be between 1 and {MAX_UPLOAD_BYTES} bytes')
+        return v
+
+    _check_collection = validator('collection', allow_reuse=True)(check_collection)
+
+@app.post("/uploads")
+def start_upload(data: UploadRequest):
+    """
+    Start a resumable PDF upload. Send the file with PUT /uploads/{upload_id}
+    in one or more chunks, then POST /uploads/{upload_id}/complete
+    """
+    try:
+        return {"success": True, **create_upload(data.filename, data.size, data.sha256, data.collection)}
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def offset_conflict(e: UploadOffsetMismatch):
+    """409 telling the client where to resume"""
+    return HTTPException(status_code=409, detail={"message": str(e), "offset": e.offset})
+
+@app.get("/uploads/{upload_id}")
+def get_upload_status(upload_id: str):
+    """Bytes received so far (`offset`), to resume an interrupted upload"""
+    upload = get_upload(upload_id)
+    if upload is None:
+        raise HTTPException(status_code=404, detail=f"Upload '{upload_id}' not found")
+    return {"success": True, **upload}
+
+@app.put("/uploads/{upload_id}")
+async def upload_chunk(upload_id: str, request: Request, offset: int = 0):
+    """
+    Append the raw request body at `offset`, which must equal the bytes
+    received so far. A failed chunk is discarded and can be sent again.
+    """
+    try:
+        return {"success": True, **await append_upload(upload_id, offset, request.stream())}
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Upload '{upload_id}' not found")
+    except UploadOffsetMismatch as e:
+        raise offset_conflict(e)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+@app.post("/uploads/{upload_id}/complete")
+async def finish_upload(upload_id: str):
+    """Check the received file and queue it for ingestion like POST /upload/pdf"""
+    upload = get_upload(upload_id)
+    if upload is None:
+        raise HTTPException(status_code=404, detail=f"Upload '{upload_id}' not found")
+    collection = upload.get("collection") or DEFAULT_COLLECTION
+    try:
+        file_path, file_hash = await complete_upload(upload_id, pdf_dir(collection))
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Upload '{upload_id}' not found")
+    except UploadOffsetMismatch as e:
+        raise offset_conflict(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    filename = upload["filename"]
+    logger.info(f"Completed upload of {filename}")
+    job_id = submit_job("pdf", [{"filename": filename, "path": file_path, "hash": file_hash}], collection)
+    return {"success": True, "filename": filename, "sha256": file_hash, "collection": collection, "job_id": job_id}
+
+@app.delete("/uploads/{upload_id}")
+def cancel_upload(upload_id: str):
+    """Abort a resumable upload and delete the bytes received"""
+    if not abort_upload(upload_id):
+        raise HTTPException(status_code=404, detail=f"Upload '{upload_id}' not found")
+    return {"success": True, "upload_id": upload_id}
+
 # ---------------------------
 # Website URL Ingestion
 # ---------------------------
 class URLRequest(BaseModel):
     url: str
+    collection: str = DEFAULT_COLLECTION
     
     @validator('url')
     def validate_url(cls, v):
@@ -116,37 +327,95 @@ class URLRequest(BaseModel):
             raise ValueError('URL must start with http:// or https://')
         return v.strip()
 
+    _check_collection = validator('collection', allow_reuse=True)(check_collection)
+
 @app.post("/upload/url")
 def upload_url(data: URLRequest):
-    """Process and ingest website content"""
+    """Queue website content for background ingestion"""
     try:
-        logger.info(f"Processing URL: {data.url}")
+        logger.info(f"Queueing URL: {data.url}")
         
-        # Process website content and chunk the text
-        text = fetch_and_clean_website(data.url)
-        chunks = chunk_text(text, source=data.url.replace("/", "_"))
-        create_or_load_vector_store(chunks)
+        job_id = submit_job("url", [data.url], data.collection)
         
         return {
             "success": True,
-            "message": f"Website content from '{data.url}' processed and chunked successfully",
+            "message": f"Queued website '{data.url}' for processing",
             "url": data.url,
-            "total_chunks": len(chunks)
+            "collection": data.collection,
+            "job_id": job_id
         }
         
     except Exception as e:
-        logger.error(f"Error processing URL {data.url}: {str(e)}")
+        logger.error(f"Error queueing URL {data.url}: {str(e)}")
         raise HTTPException(
             status_code=500, 
             detail=f"Error processing URL: {str(e)}"
         )
 
+class URLBatchRequest(BaseModel):
+    urls: List[str]
+    collection: str = DEFAULT_COLLECTION
+
+    @validator('urls')
+    def validate_urls(cls, v):
+        urls = [url.strip() for url in v if url.strip()]
+        if not urls:
+            raise ValueError('URLs cannot be empty')
+        if len(urls) > MAX_BATCH_URLS:
+            raise ValueError(f'At most {MAX_BATCH_URLS} URLs per request')
+        for url in urls:
+            if not url.startswith(('http://', 'https://')):
+                raise ValueError(f'URL must start with http:// or https://: {url}')
+        # Drop duplicates, keeping the first occurrence
+        return list(dict.fromkeys(urls))
+
+    _check_collection = validator('collection', allow_reuse=True)(check_collection)
+
+@app.post("/upload/urls")
+def upload_urls(data: URLBatchRequest):
+    """
+    Queue a batch of URLs as one ingestion job. Pages are fetched
+    concurrently within per-host politeness limits and robots.txt.
+    """
+    try:
+        logger.info(f"Queueing {len(data.urls)} URLs")
+
+        job_id = submit_job("url", data.urls, data.collection)
+
+        return {
+            "success": True,
+            "message": f"Queued {len(data.urls)} URL(s) for processing",
+            "urls_queued": len(data.urls),
+            "collection": data.collection,
+            "job_id": job_id
+        }
+
+    except Exception as e:
+        logger.error(f"Error queueing URLs: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing URLs: {str(e)}"
+        )
+
+# ---------------------------
+# Ingestion Job Status
+# ---------------------------
+@app.get("/jobs/{job_id}")
+def get_job_status(job_id: str):
+    """Report stage, chunk counts and errors of an ingestion job"""
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return {"success": True, **job}
+
 # ---------------------------
 # Question Answering
 # ---------------------------
 class QueryRequest(BaseModel):
     question: str
-    chat_history: Optional[List[dict]] = []
+    # History is kept server-side; omit to start a new session
+    session_id: Optional[str] = None
+    collection: str = DEFAULT_COLLECTION
     
     @validator('question')
     def validate_question(cls, v):
@@ -154,63 +423,303 @@ class QueryRequest(BaseModel):
             raise ValueError('Question cannot be empty')
         return v.strip()
 
+    @validator('session_id')
+    def validate_session_id(cls, v):
+        if v is not None and (not v.strip() or len(v) > 128):
+            raise ValueError('Session ID must be 1-128 characters')
+        return v.strip() if v is not None else v
+
+    _check_collection = validator('collection', allow_reuse=True)(check_collection)
+
+def format_sources(docs, context=None):
+    """Source attribution fields shared by the query endpoints"""
+    sources = {
+        "sources": [
+            doc.metadata.get("source")
+            for doc in docs
+        ],
+        "source_details": [
+            {
+                "source": doc.metadata.get("source"),
+                "chunk_info": doc.metadata.get("chunk_info", f"Chunk {doc.metadata.get('chunk_id', 'N/A')}"),
+                "preview": doc.page_content[:100] + "..." if len(doc.page_content) > 100 else doc.page_content
+            }
+            for doc in docs
+        ],
+        "total_chunks_retrieved": len(docs)
+    }
+    if context is not None:
+        sources["context_tokens"] = context["tokens"]
+    return sources
+
+def lookup_cached_answer(question: str, collection: str):
+    """
+    Check the semantic answer cache for a question to a collection.
+    Returns (question vector, corpus version, cached response or None).
+    """
+    corpus_version = get_corpus_version(collection)
+    question_vector = embed_query(question)
+    return question_vector, corpus_version, answer_cache.lookup(question_vector, corpus_version, collection)
+
 @app.post("/query")
-def query_documents(data: QueryRequest):
+async def query_documents(data: QueryRequest):
     """Answer questions based on uploaded documents"""
     try:
         logger.info(f"Processing question: {data.question}")
+        session_id, history = chat_sessions.open(data.session_id)
+        
+        # A follow-up's answer depends on the conversation, so only questions
+        # opening a session go through the answer cache
+        use_cache = ANSWER_CACHE_ENABLED and not has_history(history)
+        if use_cache:
+            question_vector, corpus_version, cached = await asyncio.to_thread(
+                lookup_cached_answer, data.question, data.collection
+            )
+            if cached is not None:
+                logger.info("Answer served from semantic cache")
+                chat_sessions.add_turn(session_id, data.question, cached["answer"], cached["sources"])
+                return {**cached, "question": data.question, "session_id": session_id, "cached": True}
         
         state = {
             "question": data.question,
-            "chat_history": data.chat_history
+            "collection": data.collection,
+            "history": history
         }
 
         # Run LangGraph workflow
-        output_state = graph.invoke(state)
+        output_state = await graph.ainvoke(state)
 
-        return {
+        response = {
             "success": True,
             "question": data.question,
+            "collection": data.collection,
             "answer": output_state["answer"],
-            "sources": [
-                doc.metadata.get("source")
-                for doc in output_state["retrieved_docs"]
-            ],
-            "source_details": [
-                {
-                    "source": doc.metadata.get("source"),
-                    "chunk_info": doc.metadata.get("chunk_info", f"Chunk {doc.metadata.get('chunk_id', 'N/A')}"),
-                    "preview": doc.page_content[:100] + "..." if len(doc.page_content) > 100 else doc.page_content
-                }
-                for doc in output_state["retrieved_docs"]
-            ],
-            "total_chunks_retrieved": len(output_state["retrieved_docs"])
+            **format_sources(output_state["retrieved_docs"], output_state["context"]),
+            "cached": False
         }
+        if use_cache:
+            answer_cache.store(question_vector, corpus_version, response, data.collection)
+        chat_sessions.add_turn(session_id, data.question, response["answer"], response["sources"])
+
+        return {**response, "session_id": session_id}
 
     except Exception as e:
         logger.error(f"Query error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/query/stream")
+async def query_documents_stream(data: QueryRequest):
+    """
+    Answer a question as server-sent events: a `sources` event first (with
+    the session ID), then `token` events as the LLM generates, then `done`
+    with time-to-first-token
+    """
+    logger.info(f"Processing streaming question: {data.question}")
+    session_id, history = chat_sessions.open(data.session_id)
+    use_cache = ANSWER_CACHE_ENABLED and not has_history(history)
+    
+    async def events():
+        start = time.perf_counter()
+        try:
+            if use_cache:
+                question_vector, corpus_version, cached = await asyncio.to_thread(
+                    lookup_cached_answer, data.question, data.collection
+                )
+                if cached is not None:
+                    yield sse_event("sources", {
+                        **{key: cached[key] for key in ("sources", "source_details", "total_chunks_retrieved")},
+                        "session_id": session_id
+                    })
+                    yield sse_event("token", {"text": cached["answer"]})
+                    chat_sessions.add_turn(session_id, data.question, cached["answer"], cached["sources"])
+                    elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+                    yield sse_event("done", {"ttft_ms": elapsed_ms, "total_ms": elapsed_ms, "cached": True})
+                    return
+
+            query = followup_query(data.question, history)
+            docs = await asyncio.to_thread(retrieve_relevant_chunks, query, collection=data.collection)
+            context = pack_context(docs)
+            sources = format_sources(context["documents"], context)
+            yield sse_event("sources", {**sources, "session_id": session_id})
+
+            ttft_ms = None
+            answer_parts = []
+            async for token in stream_answer(data.question, context, history):
+                if ttft_ms is None:
+                    ttft_ms = round((time.perf_counter() - start) * 1000, 1)
+                answer_parts.append(token)
+                yield sse_event("token", {"text": token})
+
+            total_ms = round((time.perf_counter() - start) * 1000, 1)
+            logger.info(f"Streamed answer: ttft={ttft_ms}ms total={total_ms}ms")
+            answer = "".join(answer_parts)
+            if use_cache:
+                answer_cache.store(question_vector, corpus_version, {
+                    "success": True,
+                    "question": data.question,
+                    "collection": data.collection,
+                    "answer": answer,
+                    **sources
+                }, data.collection)
+            chat_sessions.add_turn(session_id, data.question, answer, sources["sources"])
+            yield sse_event("done", {"ttft_ms": ttft_ms, "total_ms": total_ms, "cached": False})
+        except Exception as e:
+            logger.error(f"Streaming query error: {str(e)}")
+            yield sse_event("error", {"detail": str(e)})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ---------------------------
+# Batch Question Answering
+# ---------------------------
+class BatchQueryRequest(BaseModel):
+    # The length is checked before any question is looked at
+    questions: List[str] = Field(..., max_length=MAX_BATCH_QUESTIONS)
+    top_k: int = Field(5, ge=1, le=MAX_TOP_K)
+    max_concurrency: Optional[int] = Field(None, ge=1, le=BATCH_QUERY_CONCURRENCY)
+    collection: str = DEFAULT_COLLECTION
+    
+    @validator('questions')
+    def validate_questions(cls, v):
+        questions = [q.strip() for q in v]
+        if not questions:
+            raise ValueError('Questions cannot be empty')
+        if any(not q for q in questions):
+            raise ValueError('Questions cannot be blank')
+        return questions
+
+    _check_collection = validator('collection', allow_reuse=True)(check_collection)
+
+@app.post("/query/batch")
+async def query_documents_batch(data: BatchQueryRequest):
+    """
+    Answer many questions at once: all questions are embedded as one matrix
+    and searched with a single FAISS call, then answers are generated
+    concurrently up to `max_concurrency`
+    """
+    try:
+        start = time.perf_counter()
+        logger.info(f"Processing batch of {len(data.questions)} questions")
+        
+        all_docs = await asyncio.to_thread(
+            retrieve_relevant_chunks_batch, data.questions, data.top_k, collection=data.collection
+        )
+        retrieval_ms = round((time.perf_counter() - start) * 1000, 1)
+        
+        semaphore = asyncio.Semaphore(data.max_concurrency or BATCH_QUERY_CONCURRENCY)
+        
+        async def answer(question, docs):
+            async with semaphore:
+                generation_start = time.perf_counter()
+                context = pack_context(docs)
+                result = {"question": question, **format_sources(context["documents"], context)}
+                try:
+                    state = await generate_answer({"question": question, "retrieved_docs": docs, "context": context})
+                    result.update(success=True, answer=state["answer"])
+                except Exception as e:
+                    logger.error(f"Batch query error for '{question}': {str(e)}")
+                    result.update(success=False, answer=None, error=str(e))
+                result["generation_ms"] = round((time.perf_counter() - generation_start) * 1000, 1)
+                return result
+        
+        results = await asyncio.gather(*(
+            answer(question, docs) for question, docs in zip(data.questions, all_docs)
+        ))
+        
+        return {
+            "success": True,
+            "collection": data.collection,
+            "total_questions": len(results),
+            "failed_questions": sum(1 for result in results if not result["success"]),
+            "retrieval_ms": retrieval_ms,
+            "total_ms": round((time.perf_counter() - start) * 1000, 1),
+            "results": results
+        }
+        
+    except Exception as e:
+        logger.error(f"Batch query error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ---------------------------
+# Chat Sessions
+# ---------------------------
+@app.get("/sessions/{session_id}")
+def get_session(session_id: str):
+    """Recent turns and the compacted summary of older turns of a chat session"""
+    history = chat_sessions.get_history(session_id)
+    if history is None:
+        raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found")
+    return {"success": True, "session_id": session_id, **history}
+
+@app.delete("/sessions/{session_id}")
+def delete_session(session_id: str):
+    """Forget a chat session's history"""
+    if not chat_sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found")
+    return {"success": True, "session_id": session_id}
+
+# ---------------------------
+# Documents
+# ---------------------------
+@app.get("/documents")
+def list_documents(collection: str = DEFAULT_COLLECTION):
+    """List stored sources of a collection and their chunk counts"""
+    collection = resolve_collection(collection)
+    sources = list_sources(collection)
+    return {
+        "success": True,
+        "collection": collection,
+        "documents": [{"source": source, "chunks": count} for source, count in sorted(sources.items())],
+        "total_chunks": sum(sources.values())
+    }
+
+@app.delete("/documents/{source:path}")
+def delete_document(source: str, collection: str = DEFAULT_COLLECTION):
+    """Delete every chunk of one PDF or URL source from a collection"""
+    collection = resolve_collection(collection)
+    try:
+        deleted = delete_ingested_source(source, collection)
+    except Exception as e:
+        logger.error(f"Error deleting {source}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error deleting {source}: {str(e)}")
+
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"No stored chunks for source '{source}'")
+    logger.info(f"Deleted {deleted} chunks of {source}")
+    return {"success": True, "source": source, "collection": collection, "chunks_deleted": deleted}
+
 # ---------------------------
 # Reset System
 # ---------------------------
 @app.post("/reset")
 def reset_system():
-    """Reset the vector store and chat history"""
+    """Reset the vector store, caches and saved documents"""
     try:
         logger.info("Resetting system...")
-        
-        # TODO: Add actual reset logic here
-        # - Clear FAISS vector database
-        # - Clear chat history
-        # - Reset document metadata
-        # - Clear any cached embeddings
-        
+
+        # Every collection's index, docstore and BM25 index, and the fitted embedding state
+        reset_vector_store()
+        # Extracted pages, embeddings, ingested sources and URL validators
+        clear_content_caches()
+        get_chunk_store().clear()
+        for directory in (PDF_DIR, WEB_DIR, UPLOAD_DIR):
+            shutil.rmtree(directory, ignore_errors=True)
+            os.makedirs(directory, exist_ok=True)
+        answer_cache.clear()
+        chat_sessions.clear()
+
         return {
             "success": True,
-            "message": "System reset successfully - all documents and chat history cleared"
+            "message": "System reset successfully - all documents and cached data cleared"
         }
-        
+
     except Exception as e:
         logger.error(f"Error resetting system: {str(e)}")
         raise HTTPException(
@@ -222,21 +731,31 @@ def reset_system():
 # Get System Status
 # ---------------------------
 @app.get("/status")
-def get_status():
-    """Get current system status and statistics"""
+def get_status(collection: str = DEFAULT_COLLECTION):
+    """Get current system status and statistics of a collection"""
+    collection = resolve_collection(collection)
     try:
-        # TODO: Add actual status logic here
-        # - Count of documents in vector store
-        # - Vector database size
-        # - Available models
-        # - System health metrics
-        
+        store = get_store_stats(collection)
+        stored_bytes = store["index_bytes"] + store["vector_log_bytes"] + store["docstore_bytes"]
         return {
             "success": True,
-            "documents_count": 0,  # Placeholder
-            "vector_store_size": "0 MB",
-            "embedding_model": "text-embedding-ada-002",
-            "llm_model": "gpt-3.5-turbo",
+            "collection": collection,
+            "collections": get_collection_stats(),
+            "answer_cache": answer_cache.stats(),
+            "retrieval_cache": get_cache_stats(),
+            "chat_sessions": chat_sessions.stats(),
+            "documents_count": store["documents"],
+            "vectors_count": store["vectors"],
+            "deleted_vectors": store["deleted_vectors"],
+            "index": store["index"],
+            "index_generation": store["generation"],
+            "index_bytes": store["index_bytes"],
+            "vector_log_bytes": store["vector_log_bytes"],
+            "docstore_bytes": store["docstore_bytes"],
+            "lexical_index_bytes": store["lexical_index_bytes"],
+            "vector_store_size": f"{stored_bytes / 2 ** 20:.1f} MB",
+            "embedding_model": describe_embedding_model(),
+            "llm_model": LLM_DEPLOYMENT_NAME,
             "status": "ready"
         }
         
@@ -247,6 +766,20 @@ def get_status():
             detail=f"Error getting status: {str(e)}"
         )
 
+# ---------------------------
+# Prometheus Metrics
+# ---------------------------
+# Scrapes only look at loaded collections, never loading one
+CORPUS_VECTORS.set_function(lambda: get_collection_stats()["vectors"])
+CORPUS_DOCUMENTS.set_function(lambda: get_collection_stats()["documents"])
+COLLECTIONS_LOADED.set_function(lambda: len(get_collection_stats()["loaded"]))
+COLLECTION_MEMORY_BYTES.set_function(lambda: get_collection_stats()["memory_bytes"])
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus metrics: per-stage latency histograms, throughput counters and in-flight gauges"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 # ---------------------------
 # Run the application
 # ---------------------------
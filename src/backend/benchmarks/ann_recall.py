@@ -0,0 +1,157 @@
+"""
+Recall/latency/memory report for ANN index settings.
+
+Builds flat, IVF and HNSW indexes in each vector encoding over the persisted
+vectors (or a synthetic set) and, for each nprobe / efSearch value, reports
+recall@k against the exact float32 flat index, single-query search latency
+and memory per million vectors. With --rerank, compressed encodings are also
+measured re-scoring a shortlist against the exact vectors. Run from `src/`:
+
+    python backend/benchmarks/ann_recall.py --k 10 --nprobe 4,16,64 --ef-search 32,64,128
+    python backend/benchmarks/ann_recall.py --synthetic 200000 --dim 384 --encodings float32,sq8,pq --rerank 4
+"""
+import sys
+import os
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import time
+import faiss
+import numpy as np
+
+from services.ann_index import (
+    build_index, apply_search_params, bytes_per_vector, rerank, ivf_nlist, pq_m, HNSW_M, HNSW_EF_CONSTRUCTION
+)
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def synthetic_vectors(count: int, dim: int, clusters: int = 256, seed: int = 0):
+    """Clustered, L2-normalized vectors, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + 0.5 * rng.standard_normal((count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def load_corpus(query_count: int):
+    """Stored vectors, plus queries embedded from the opening words of sampled chunks."""
+    from services.vector_store import load_vector_store, get_stored_vectors, get_vector_store
+    from services.embeddings import embed_queries
+
+    if not load_vector_store()["loaded"]:
+        raise SystemExit("No persisted index found; ingest documents first or use --synthetic")
+    vectors = get_stored_vectors()
+    store = get_vector_store()
+    rng = np.random.default_rng(0)
+    positions = rng.choice(len(vectors), min(query_count, len(vectors)), replace=False)
+    texts = [" ".join(store.docstore.search(store.index_to_docstore_id[int(p)]).page_content.split()[:12])
+             for p in positions]
+    return vectors, np.ascontiguousarray(embed_queries(texts), dtype=np.float32)
+
+
+def measure(index, queries, k: int, truth=None, rerank_factor: int = 0, exact_vectors=None):
+    """
+    Search one query at a time, optionally re-ranking rerank_factor * k
+    candidates against exact_vectors; return (recall@k, p50 ms, p99 ms, results).
+    """
+    latencies = []
+    results = np.empty((len(queries), k), dtype=np.int64)
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        if rerank_factor:
+            _, candidates = index.search(query[None, :], k * rerank_factor)
+            indices = rerank(query[None, :], candidates, lambda positions: exact_vectors[positions], k)
+        else:
+            _, indices = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results[i] = indices[0]
+
+    recall = 1.0
+    if truth is not None:
+        hits = sum(len(set(row[row >= 0]) & set(expected[expected >= 0])) for row, expected in zip(results, truth))
+        recall = hits / max(1, int((truth >= 0).sum()))
+    return recall, float(np.percentile(latencies, 50)), float(np.percentile(latencies, 99)), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--index-types", default="flat,ivf,hnsw")
+    parser.add_argument("--encodings", default="float32", help="comma-separated: float32,fp16,sq8,pq")
+    parser.add_argument("--pq-m", type=int, default=0, help="PQ bytes per vector (default: dim / 4 or less)")
+    parser.add_argument("--rerank", type=int, default=0, help="also re-rank N * k candidates of compressed indexes")
+    parser.add_argument("--nlist", type=int, default=0, help="IVF lists (default: picked from the corpus size)")
+    parser.add_argument("--nprobe", type=_int_list, default=[1, 4, 16, 64])
+    parser.add_argument("--hnsw-m", type=int, default=HNSW_M)
+    parser.add_argument("--ef-construction", type=int, default=HNSW_EF_CONSTRUCTION)
+    parser.add_argument("--ef-search", type=_int_list, default=[16, 32, 64, 128])
+    parser.add_argument("--synthetic", type=int, default=0, help="use N synthetic vectors instead of the stored index")
+    parser.add_argument("--dim", type=int, default=384, help="dimension of synthetic vectors")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(1)
+    if args.synthetic:
+        vectors = synthetic_vectors(args.synthetic + args.queries, args.dim)
+        vectors, queries = vectors[:args.synthetic], vectors[args.synthetic:]
+    else:
+        vectors, queries = load_corpus(args.queries)
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}")
+
+    exact = build_index(vectors, "flat")
+    _, _, _, truth = measure(exact, queries, args.k)
+    rows = []
+
+    for kind in args.index_types.split(","):
+        for encoding in args.encodings.split(","):
+            start = time.perf_counter()
+            params = {"pq_m": args.pq_m or pq_m(vectors.shape[1])}
+            if kind == "flat":
+                sweep = [("-", None, {})]
+                label = "flat"
+            elif kind == "ivf":
+                params["nlist"] = args.nlist or ivf_nlist(len(vectors))
+                sweep = [("nprobe", value, {"nprobe": value}) for value in args.nprobe]
+                label = f"ivf{params['nlist']}"
+            elif kind == "hnsw":
+                params.update(m=args.hnsw_m, ef_construction=args.ef_construction)
+                sweep = [("efSearch", value, {"ef_search": value}) for value in args.ef_search]
+                label = f"hnsw{args.hnsw_m}"
+            else:
+                raise SystemExit(f"Unknown index type '{kind}'")
+            index = exact if (kind, encoding) == ("flat", "float32") else build_index(vectors, kind, encoding, **params)
+            build_seconds = time.perf_counter() - start
+            mb_per_million = bytes_per_vector(index) * 1e6 / 2 ** 20
+
+            rerank_factors = [0] + ([args.rerank] if args.rerank and encoding != "float32" else [])
+            for name, value, search_params in sweep:
+                apply_search_params(index, **search_params)
+                for factor in rerank_factors:
+                    recall, p50, p99, _ = measure(index, queries, args.k, truth, factor, vectors)
+                    setting = "-" if value is None else f"{name}={value}"
+                    rows.append({"index": label, "encoding": encoding, "param": setting,
+                                 "rerank": factor, "recall": recall, "p50_ms": p50, "p99_ms": p99,
+                                 "mb_per_million": mb_per_million, "build_s": build_seconds})
+
+    print(f"{'index':<10}{'encoding':<10}{'setting':<14}{'rerank':>7}{'recall@' + str(args.k):>11}"
+          f"{'p50 ms':>9}{'p99 ms':>9}{'MB/1M':>9}{'build s':>9}")
+    for row in rows:
+        print(f"{row['index']:<10}{row['encoding']:<10}{row['param']:<14}{row['rerank'] or '-':>7}"
+              f"{row['recall']:>11.3f}{row['p50_ms']:>9.3f}{row['p99_ms']:>9.3f}"
+              f"{row['mb_per_million']:>9.0f}{row['build_s']:>9.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"vectors": len(vectors), "dim": int(vectors.shape[1]), "k": args.k, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
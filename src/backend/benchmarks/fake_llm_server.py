@@ -0,0 +1,125 @@
+"""
+Local stand-in for an (Azure) OpenAI chat completions endpoint.
+
+Answers every POST to a path ending in /chat/completions with a canned
+answer after a configurable delay, streamed token by token when the request
+asks for it, so the query path can be load-tested without credentials or
+API costs. Point the backend at it with:
+
+    AZURE_OPENAI_API_BASE=http://127.0.0.1:8081
+    AZURE_OPENAI_API_KEY=fake
+    AZURE_OPENAI_API_VERSION=2024-02-01
+    AZURE_OPENAI_DEPLOYMENT_NAME=fake
+
+Run from `src/`:
+
+    python backend/benchmarks/fake_llm_server.py --port 8081 --latency-ms 400 --token-ms 15 --tokens 120
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER_WORDS = ("the", "context", "describes", "how", "chunks", "are", "indexed", "and", "retrieved", "for", "each",
+                "question", "with", "sources", "cited", "below")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.split("?")[0].endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        settings = self.server.settings
+        prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in request.get("messages", []))
+        tokens = [f"{word} " for word in (ANSWER_WORDS * (settings["tokens"] // len(ANSWER_WORDS) + 1))[:settings["tokens"]]]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        base = {"id": completion_id, "created": int(time.time()), "model": request.get("model") or "fake"}
+
+        delay = settings["latency_ms"] + random.uniform(0, settings["jitter_ms"])
+        time.sleep(delay / 1000)
+
+        if not request.get("stream"):
+            time.sleep(settings["token_ms"] * len(tokens) / 1000)
+            self._send_json(200, {
+                **base,
+                "object": "chat.completion",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                          "total_tokens": prompt_tokens + len(tokens)}
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def event(delta, finish_reason=None):
+            chunk = {**base, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        event({"role": "assistant", "content": ""})
+        for token in tokens:
+            event({"content": token})
+            time.sleep(settings["token_ms"] / 1000)
+        event({}, "stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def start_fake_llm_server(port: int = 0, latency_ms: float = 300, token_ms: float = 0,
+                          tokens: int = 64, jitter_ms: float = 0, host: str = "127.0.0.1"):
+    """
+    Serve fake chat completions on a background thread. Returns
+    (server, base URL); call server.shutdown() to stop it.
+    """
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.settings = {"latency_ms": latency_ms, "token_ms": token_ms, "tokens": tokens, "jitter_ms": jitter_ms}
+    threading.Thread(target=server.serve_forever, daemon=True, name="fake-llm").start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=300, help="delay before the first token")
+    parser.add_argument("--token-ms", type=float, default=0, help="delay per generated token")
+    parser.add_argument("--tokens", type=int, default=64, help="tokens per answer")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="extra random delay, uniform in [0, jitter]")
+    args = parser.parse_args()
+
+    server, url = start_fake_llm_server(args.port, args.latency_ms, args.token_ms, args.tokens, args.jitter_ms, args.host)
+    print(f"Fake LLM server listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Throughput report for the HTML text extractors.
+
+Extracts every saved HTML file of a directory (or a set of synthetic pages)
+with each extractor and reports MB/s of HTML, pages/s and characters of
+text extracted, whether each extractor's text matches the first one's, and
+how many pages the old 50,000-character cut-off would have truncated. Run
+from `src/`:
+
+    python backend/benchmarks/html_extract.py --html-dir ~/saved_pages
+    python backend/benchmarks/html_extract.py --synthetic 200 --paragraphs 2000 --repeat 3
+"""
+import sys
+import os
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import glob
+import json
+import random
+import time
+
+from services.html_extractor import EXTRACTORS, extract_text
+
+# Text length at which web pages used to be cut off
+LEGACY_TRUNCATE_CHARS = 50000
+
+
+def synthetic_pages(count: int, paragraphs: int, seed: int = 0):
+    """Documentation-like pages with navigation, scripts and nested inline markup."""
+    rng = random.Random(seed)
+    words = ("index vector query chunk embedding retrieval latency throughput server request "
+             "response cache token document parser stream batch memory budget").split()
+
+    def sentence():
+        return " ".join(rng.choice(words) for _ in range(rng.randint(6, 24))).capitalize() + "."
+
+    pages = []
+    for n in range(count):
+        body = []
+        for _ in range(paragraphs):
+            kind = rng.random()
+            if kind < 0.1:
+                body.append(f"<h2>{sentence()}</h2>")
+            elif kind < 0.2:
+                body.append("<ul>" + "".join(f"<li><a href='#{i}'>{sentence()}</a></li>" for i in range(5)) + "</ul>")
+            elif kind < 0.25:
+                body.append(f"<pre><code>def f(x):\n    return x * {rng.randint(1, 99)}\n</code></pre>")
+            else:
+                body.append(f"<p>{sentence()} <b>{sentence()}</b> <a href='/x'>{sentence()}</a> {sentence()}</p>")
+        pages.append(
+            f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>Page {n}: {sentence()}</title>"
+            f"<style>body {{ font-family: sans-serif; }}</style><script>var page = {n};</script></head><body>"
+            "<header><nav>" + "".join(f"<a href='/{i}'>Section {i}</a>" for i in range(30)) + "</nav></header>"
+            "<main><article>" + "".join(body) + "</article></main>"
+            "<aside><form><input name='q'><button>Search</button></form></aside>"
+            f"<footer>&copy; Example Docs {n}</footer></body></html>"
+        )
+    return pages
+
+
+def load_pages(html_dir: str):
+    paths = sorted(glob.glob(os.path.join(html_dir, "**", "*.htm*"), recursive=True))
+    if not paths:
+        raise SystemExit(f"No .html files found under {html_dir}")
+    pages = []
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            pages.append(f.read())
+    return pages
+
+
+def measure(pages, extractor: str, repeat: int):
+    """Best-of-repeat wall time to extract all pages; returns (seconds, texts)."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        texts = [extract_text(html, extractor) for html in pages]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--html-dir", help="directory of saved .html pages (searched recursively)")
+    parser.add_argument("--synthetic", type=int, default=100, help="number of synthetic pages without --html-dir")
+    parser.add_argument("--paragraphs", type=int, default=500, help="blocks per synthetic page")
+    parser.add_argument("--extractors", default="bs4,lxml", help=f"comma-separated: {','.join(EXTRACTORS)}")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    pages = load_pages(args.html_dir) if args.html_dir else synthetic_pages(args.synthetic, args.paragraphs)
+    html_mb = sum(len(html.encode("utf-8")) for html in pages) / 2 ** 20
+    print(f"{len(pages)} pages, {html_mb:.1f} MB of HTML, best of {args.repeat}")
+
+    rows = []
+    reference = None
+    for extractor in args.extractors.split(","):
+        seconds, texts = measure(pages, extractor, args.repeat)
+        if reference is None:
+            reference = texts
+        rows.append({
+            "extractor": extractor,
+            "seconds": seconds,
+            "mb_per_s": html_mb / seconds,
+            "pages_per_s": len(pages) / seconds,
+            "chars": sum(len(text) for text in texts),
+            "identical_pages": sum(a == b for a, b in zip(texts, reference)),
+            "over_legacy_limit": sum(len(text) > LEGACY_TRUNCATE_CHARS for text in texts),
+        })
+
+    print(f"{'extractor':<10}{'seconds':>9}{'MB/s':>9}{'pages/s':>9}{'chars':>13}{'identical':>11}{'>50k':>7}")
+    for row in rows:
+        print(f"{row['extractor']:<10}{row['seconds']:>9.2f}{row['mb_per_s']:>9.1f}{row['pages_per_s']:>9.1f}"
+              f"{row['chars']:>13}{row['identical_pages']:>11}{row['over_legacy_limit']:>7}")
+    if len(rows) > 1:
+        print(f"{rows[-1]['extractor']}: {rows[0]['seconds'] / rows[-1]['seconds']:.1f}x the speed of {rows[0]['extractor']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"pages": len(pages), "html_mb": html_mb, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
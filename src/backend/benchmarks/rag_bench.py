@@ -0,0 +1,475 @@
+"""
+End-to-end ingest and query benchmark.
+
+Generates a synthetic corpus of PDFs, HTML pages and plain-text documents,
+ingests it through the real pipeline, then drives POST /query on a live
+backend whose LLM is the local fake server (fake_llm_server.py) with a
+configurable latency.
+- PDFs go through ingestion jobs: page extraction, chunking and embedding
+  into the vector store.
+- HTML pages are served from a local HTTP server and ingested as URL jobs.
+- Text documents are chunked and added to the store directly.
+
+The report covers:
+- ingest chunks/s per corpus type;
+- query p50/p95/p99 latency and throughput;
+- peak RSS;
+- index and docstore size.
+
+The results are written as JSON; --compare prints them next to an earlier
+run.
+
+Everything runs in a scratch working directory (a new temporary directory
+unless --workdir is given), so the real backend/data is never touched. Run
+from `src/`:
+
+    python backend/benchmarks/rag_bench.py --pdfs 20 --pdf-pages 30 --html 200 --texts 200 --queries 500 --concurrency 32
+    python backend/benchmarks/rag_bench.py --llm-latency-ms 800 --output after.json --compare before.json
+"""
+import sys
+import os
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import platform
+import random
+import resource
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from benchmarks.fake_llm_server import start_fake_llm_server
+
+SYLLABLES = ("ka", "lo", "mi", "ne", "ru", "ta", "vi", "zo", "pe", "shi", "dra", "qu", "len", "mor", "tix", "val")
+# Seconds to wait for the API to start serving
+BACKEND_START_TIMEOUT = 60
+
+
+# ---------------------------
+# Synthetic corpus
+# ---------------------------
+class TextGenerator:
+    """
+    Deterministic pseudo-English: a Zipf-distributed vocabulary of made-up
+    words plus identifiers like ERR-1234, so both BM25 and the embeddings see
+    realistic term statistics.
+    """
+    def __init__(self, vocabulary: int = 5000, seed: int = 0):
+        self.rng = random.Random(seed)
+        words = set()
+        while len(words) < vocabulary:
+            words.add("".join(self.rng.choice(SYLLABLES) for _ in range(self.rng.randint(2, 4))))
+        self.words = sorted(words)
+        weights = 1.0 / np.arange(1, vocabulary + 1)
+        self.cumulative = np.cumsum(weights / weights.sum())
+
+    def sentence(self) -> str:
+        picks = np.searchsorted(self.cumulative, [self.rng.random() for _ in range(self.rng.randint(8, 24))])
+        words = [self.words[min(i, len(self.words) - 1)] for i in picks]
+        if self.rng.random() < 0.1:
+            words.insert(self.rng.randrange(len(words)), f"ERR-{self.rng.randint(1000, 9999)}")
+        return " ".join(words).capitalize() + "."
+
+    def paragraph(self) -> str:
+        return " ".join(self.sentence() for _ in range(self.rng.randint(3, 7)))
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages) -> bytes:
+    """A minimal PDF with one Helvetica text line per entry of each page's list of lines."""
+    kids = [4 + 2 * i for i in range(len(pages))]
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{kid} 0 R' for kid in kids)}] /Count {len(pages)} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for kid, lines in zip(kids, pages):
+        stream = ("BT /F1 9 Tf 11 TL 36 806 Td " +
+                  " ".join(f"({_pdf_escape(line)}) Tj T*" for line in lines) + " ET").encode("latin-1", "replace")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {kid + 1} 0 R >>".encode())
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def _wrap(text: str, width: int = 110):
+    line, lines = [], []
+    for word in text.split():
+        line.append(word)
+        if sum(len(w) + 1 for w in line) > width:
+            lines.append(" ".join(line))
+            line = []
+    if line:
+        lines.append(" ".join(line))
+    return lines
+
+
+def generate_corpus(root: str, args, generator: TextGenerator):
+    """Write the synthetic PDFs, HTML pages and text documents under root."""
+    corpus = {"pdf": [], "html": [], "text": []}
+    for kind in corpus:
+        os.makedirs(os.path.join(root, kind), exist_ok=True)
+
+    for n in range(args.pdfs):
+        pages = []
+        for _ in range(args.pdf_pages):
+            lines = []
+            while len(lines) < 60:
+                lines.extend(_wrap(generator.paragraph()))
+            pages.append(lines[:60])
+        path = os.path.join(root, "pdf", f"bench-{n:05d}.pdf")
+        with open(path, "wb") as f:
+            f.write(make_pdf(pages))
+        corpus["pdf"].append(path)
+
+    for n in range(args.html):
+        body = "".join(
+            f"<h2>{generator.sentence()}</h2>" if i % 8 == 0 else f"<p>{generator.paragraph()}</p>"
+            for i in range(args.html_paragraphs)
+        )
+        nav = "".join(f"<a href='/{i}'>Section {i}</a>" for i in range(20))
+        html = (f"<!DOCTYPE html><html><head><title>Page {n}</title><script>var page = {n};</script></head>"
+                f"<body><header><nav>{nav}</nav></header><main>{body}</main><footer>Footer {n}</footer></body></html>")
+        path = os.path.join(root, "html", f"page-{n:05d}.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(html)
+        corpus["html"].append(path)
+
+    for n in range(args.texts):
+        paragraphs, size = [], 0
+        while size < args.text_kb * 1024:
+            paragraphs.append(generator.paragraph())
+            size += len(paragraphs[-1]) + 2
+        path = os.path.join(root, "text", f"doc-{n:05d}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n\n".join(paragraphs))
+        corpus["text"].append(path)
+    return corpus
+
+
+# ---------------------------
+# Ingest
+# ---------------------------
+def _wait_for_job(job_id: str):
+    from services.ingest_jobs import get_job
+    while True:
+        job = get_job(job_id)
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.05)
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def _serve_directory(directory: str):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_QuietHandler, directory=directory))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="bench-html").start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def _job_result(kind: str, count: int, seconds: float, job: dict):
+    return {
+        "kind": kind, "documents": count, "seconds": round(seconds, 3),
+        "chunks": job["chunks_total"], "chunks_per_s": round(job["chunks_total"] / seconds, 1) if seconds else None,
+        "errors": len(job["errors"])
+    }
+
+
+def ingest_pdfs(paths):
+    from services.pdf_processor import PDF_DIR
+    from services.content_cache import hash_bytes
+    from services.ingest_jobs import submit_job
+
+    start = time.perf_counter()
+    items = []
+    for path in paths:
+        filename = os.path.basename(path)
+        with open(path, "rb") as f:
+            content = f.read()
+        saved = os.path.join(PDF_DIR, filename)
+        with open(saved, "wb") as f:
+            f.write(content)
+        items.append({"filename": filename, "path": saved, "hash": hash_bytes(content)})
+    job = _wait_for_job(submit_job("pdf", items))
+    return _job_result("pdf", len(paths), time.perf_counter() - start, job)
+
+
+def ingest_html(paths):
+    from services.ingest_jobs import submit_job
+
+    server, base_url = _serve_directory(os.path.dirname(paths[0]))
+    try:
+        start = time.perf_counter()
+        job = _wait_for_job(submit_job("url", [f"{base_url}/{os.path.basename(path)}" for path in paths]))
+        return _job_result("html", len(paths), time.perf_counter() - start, job)
+    finally:
+        server.shutdown()
+
+
+def ingest_texts(paths):
+    from services.chunker import chunk_stream
+    from services.vector_store import replace_source
+
+    start = time.perf_counter()
+    chunks = 0
+    for path in paths:
+        source = os.path.basename(path)
+        with open(path, encoding="utf-8") as f:
+            added, _ = replace_source(source, chunk_stream((line.rstrip("\n") for line in f), source=source))
+        chunks += added
+    seconds = time.perf_counter() - start
+    return {"kind": "text", "documents": len(paths), "seconds": round(seconds, 3),
+            "chunks": chunks, "chunks_per_s": round(chunks / seconds, 1) if seconds else None, "errors": 0}
+
+
+# ---------------------------
+# Query
+# ---------------------------
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_backend():
+    """Run the FastAPI app with uvicorn on a background thread; returns (server, base URL)."""
+    import uvicorn
+    from api.main import app
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True, name="bench-backend")
+    thread.start()
+    deadline = time.monotonic() + BACKEND_START_TIMEOUT
+    while not server.started:
+        # A failing startup hook makes uvicorn exit its thread instead of serving
+        if not thread.is_alive():
+            raise RuntimeError("The backend failed to start; see its log above")
+        if time.monotonic() > deadline:
+            server.should_exit = True
+            raise RuntimeError(f"The backend did not start within {BACKEND_START_TIMEOUT}s")
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+async def run_queries(base_url: str, questions, concurrency: int):
+    import httpx
+
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as client:
+        async def ask(question):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/query", json={"question": question})
+                    response.raise_for_status()
+                except httpx.HTTPError:
+                    errors += 1
+                    return
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(ask(question) for question in questions))
+        wall = time.perf_counter() - start
+
+    result = {"queries": len(questions), "concurrency": concurrency, "errors": errors,
+              "seconds": round(wall, 3), "qps": round(len(latencies) / wall, 1) if wall else None}
+    if latencies:
+        result.update({f"p{p}_ms": round(float(np.percentile(latencies, p)), 1) for p in (50, 95, 99)})
+        result["max_ms"] = round(max(latencies), 1)
+    return result
+
+
+# ---------------------------
+# Report
+# ---------------------------
+def peak_rss_bytes():
+    """Peak RSS of this process and of its reaped worker processes (ru_maxrss is in KiB on Linux)."""
+    scale = 1 if sys.platform == "darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    }
+
+
+def print_report(results, previous=None):
+    def row(label, key, value, fmt="{}"):
+        line = f"  {label:<24}{fmt.format(value) if value is not None else '-':>14}"
+        if previous is not None:
+            old = previous.get(key)
+            line += f"{fmt.format(old) if old is not None else '-':>14}"
+            if isinstance(value, (int, float)) and isinstance(old, (int, float)) and old:
+                line += f"{(value - old) / old * 100:>+9.1f}%"
+        print(line)
+
+    flat = flatten(results)
+    previous = flatten(previous) if previous else None
+    print(f"\n{'':<26}{'this run':>14}" + (f"{'previous':>14}{'change':>10}" if previous else ""))
+    print("Ingest")
+    for ingest in results["ingest"]:
+        kind = ingest["kind"]
+        row(f"{kind} chunks/s", f"ingest.{kind}.chunks_per_s", flat.get(f"ingest.{kind}.chunks_per_s"))
+        row(f"{kind} chunks", f"ingest.{kind}.chunks", flat.get(f"ingest.{kind}.chunks"))
+    print("Query")
+    for key in ("qps", "p50_ms", "p95_ms", "p99_ms", "errors"):
+        row(key, f"query.{key}", flat.get(f"query.{key}"))
+    print("Store")
+    for key in ("vectors", "index_bytes", "docstore_bytes"):
+        row(key, f"store.{key}", flat.get(f"store.{key}"))
+    row("peak RSS MB", "peak_rss_mb", flat.get("peak_rss_mb"), "{:.0f}")
+
+
+def flatten(results):
+    """Key figures of a result file as a flat dict, for comparing runs."""
+    flat = {f"query.{k}": v for k, v in (results.get("query") or {}).items()}
+    for ingest in results.get("ingest", []):
+        flat.update({f"ingest.{ingest['kind']}.{k}": v for k, v in ingest.items()})
+    flat.update({f"store.{k}": v for k, v in results.get("store", {}).items() if not isinstance(v, dict)})
+    flat["peak_rss_mb"] = results["peak_rss_bytes"]["self"] / 2 ** 20
+    return flat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdfs", type=int, default=10)
+    parser.add_argument("--pdf-pages", type=int, default=20)
+    parser.add_argument("--html", type=int, default=100)
+    parser.add_argument("--html-paragraphs", type=int, default=60)
+    parser.add_argument("--texts", type=int, default=100)
+    parser.add_argument("--text-kb", type=int, default=20, help="size of each text document")
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200, help="0 skips the query phase")
+    parser.add_argument("--unique-queries", type=int, default=0, help="distinct questions (default: all distinct)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--llm-token-ms", type=float, default=0)
+    parser.add_argument("--llm-tokens", type=int, default=64)
+    parser.add_argument("--llm-jitter-ms", type=float, default=0)
+    parser.add_argument("--answer-cache", action="store_true", help="keep the semantic answer cache on")
+    parser.add_argument("--workdir", help="scratch directory for data (default: a new temporary directory)")
+    parser.add_argument("--keep-workdir", action="store_true")
+    parser.add_argument("--output", help="result JSON file (default: rag_bench_<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier result JSON to compare against")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output or f"rag_bench_{datetime.now():%Y%m%d_%H%M%S}.json")
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+
+    original_cwd = os.getcwd()
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="rag_bench_"))
+    os.makedirs(workdir, exist_ok=True)
+    llm_server, llm_url = start_fake_llm_server(
+        latency_ms=args.llm_latency_ms, token_ms=args.llm_token_ms, tokens=args.llm_tokens, jitter_ms=args.llm_jitter_ms
+    )
+    # Services resolve backend/data relative to the working directory and
+    # read their settings at import, so both are set before any import
+    os.chdir(workdir)
+    os.environ.update({
+        "AZURE_OPENAI_API_BASE": llm_url,
+        "AZURE_OPENAI_API_KEY": "fake",
+        "AZURE_OPENAI_API_VERSION": "2024-02-01",
+        "AZURE_OPENAI_DEPLOYMENT_NAME": "fake",
+        "ANSWER_CACHE_ENABLED": "true" if args.answer_cache else "false",
+        # One local host serves every page; politeness limits would only measure the sleeps
+        "WEB_MIN_DELAY_PER_HOST": "0",
+        "WEB_MAX_CONNECTIONS_PER_HOST": os.getenv("WEB_FETCH_WORKERS", "16"),
+        # Count prompt tokens without downloading a tiktoken encoding
+        "CONTEXT_TOKENIZER": os.getenv("CONTEXT_TOKENIZER", "chars"),
+    })
+
+    try:
+        generator = TextGenerator(args.vocabulary, args.seed)
+        start = time.perf_counter()
+        corpus = generate_corpus(os.path.join(workdir, "corpus"), args, generator)
+        print(f"Generated {args.pdfs} PDFs, {args.html} HTML pages and {args.texts} text documents "
+              f"in {time.perf_counter() - start:.1f}s under {workdir}")
+
+        ingest = []
+        for kind, run in (("pdf", ingest_pdfs), ("html", ingest_html), ("text", ingest_texts)):
+            if corpus[kind]:
+                ingest.append(run(corpus[kind]))
+                print(f"Ingested {kind}: {ingest[-1]}")
+
+        from services.vector_store import get_store_stats, wait_for_index_maintenance
+        from services.embeddings import describe_embedding_model
+        # Rebuilds triggered by the ingest run in the background; query the final index
+        wait_for_index_maintenance()
+        # Importing the API turns on INFO logging, and the backend logs every question at INFO
+        import api.main  # noqa: F401
+        logging.getLogger().setLevel(logging.WARNING)
+
+        query = None
+        if args.queries:
+            unique = args.unique_queries or args.queries
+            questions = [" ".join(generator.sentence().split()[:8]) for _ in range(unique)]
+            questions = [questions[i % unique] for i in range(args.queries)]
+            backend, base_url = start_backend()
+            try:
+                query = asyncio.run(run_queries(base_url, questions, args.concurrency))
+            finally:
+                backend.should_exit = True
+            print(f"Queries: {query}")
+
+        results = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "config": vars(args),
+            "environment": {
+                "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+                "embedding": describe_embedding_model()
+            },
+            "ingest": ingest,
+            "query": query,
+            "store": get_store_stats(),
+            "peak_rss_bytes": peak_rss_bytes()
+        }
+    finally:
+        llm_server.shutdown()
+        os.chdir(original_cwd)
+        if not args.workdir and not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print_report(results, previous)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Optional
 
 class URLRequest(BaseModel):
     url: str
+    collection: str = "default"
 
 class QueryRequest(BaseModel):
     question: str
-    chat_history: Optional[List[dict]] = []
\ No newline at end of file
+    session_id: Optional[str] = None
+    collection: str = "default"
\ No newline at end of file
@@ -0,0 +1,281 @@
+import os
+import math
+import faiss
+import numpy as np
+
+# "flat" (exact), "ivf" (inverted lists, trained) or "hnsw" (graph)
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat").lower()
+INDEX_TYPES = ("flat", "ivf", "hnsw")
+# How vectors are stored: "float32" (exact), "fp16" (2x smaller),
+# "sq8" (8-bit scalar quantization, 4x) or "pq" (product quantization)
+INDEX_ENCODING = os.getenv("INDEX_ENCODING", "float32").lower()
+INDEX_ENCODINGS = ("float32", "fp16", "sq8", "pq")
+
+# IVF: number of lists (0 picks it from the corpus size when training),
+# lists probed per query, and the corpus size at which IVF is first trained
+IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+IVF_TRAIN_MIN_VECTORS = int(os.getenv("IVF_TRAIN_MIN_VECTORS", "10000"))
+# Training uses at most this many sampled vectors per list
+IVF_TRAIN_SAMPLES_PER_LIST = 256
+
+# HNSW: graph degree, build-time and search-time beam widths
+HNSW_M = int(os.getenv("HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+
+# PQ: bytes per vector (0 picks the largest divisor of dim up to dim / 4)
+PQ_M = int(os.getenv("PQ_M", "0"))
+# sq8 and pq codebooks are trained once this many vectors exist; until then
+# vectors are stored as float32
+ENCODING_TRAIN_MIN_VECTORS = int(os.getenv("ENCODING_TRAIN_MIN_VECTORS", "10000"))
+ENCODING_TRAIN_SAMPLES = 65536
+# Trained layouts (IVF lists, sq8/pq codebooks) are retrained once the index
+# holds this many times the vectors they were trained on
+RETRAIN_GROWTH_FACTOR = float(os.getenv("RETRAIN_GROWTH_FACTOR", "4"))
+
+# Re-score RERANK_FACTOR * k candidates from a compressed index against the
+# exact float32 vectors before returning the top k
+RERANK_EXACT = os.getenv("RERANK_EXACT", "false").lower() == "true"
+RERANK_FACTOR = int(os.getenv("RERANK_FACTOR", "4"))
+
+_SQ_TYPES = {"fp16": faiss.ScalarQuantizer.QT_fp16, "sq8": faiss.ScalarQuantizer.QT_8bit}
+
+
+def index_type(index) -> str:
+    """Which of INDEX_TYPES a FAISS index is."""
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
+
+
+def index_encoding(index) -> str:
+    """Which of INDEX_ENCODINGS a FAISS index stores its vectors in."""
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    if isinstance(index, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+        return "pq"
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return "fp16" if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "sq8"
+    return "float32"
+
+
+def ivf_nlist(vector_count: int) -> int:
+    """IVF_NLIST, or 4 * sqrt(n) capped so each list gets ~39 training points."""
+    if IVF_NLIST > 0:
+        return IVF_NLIST
+    return max(1, min(int(4 * math.sqrt(vector_count)), vector_count // 39))
+
+
+def pq_m(dim: int) -> int:
+    if PQ_M > 0:
+        return PQ_M
+    return max(m for m in range(1, max(1, dim // 4) + 1) if dim % m == 0)
+
+
+def target_layout(vector_count: int, kind: str = None, encoding: str = None):
+    """
+    (index type, encoding) the store should use at this size. Trained
+    layouts need data first: the store stays flat until IVF_TRAIN_MIN_VECTORS
+    vectors exist, and float32 until ENCODING_TRAIN_MIN_VECTORS for sq8/pq.
+    """
+    kind = (kind or INDEX_TYPE).lower()
+    encoding = (encoding or INDEX_ENCODING).lower()
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{kind}', expected one of {INDEX_TYPES}")
+    if encoding not in INDEX_ENCODINGS:
+        raise ValueError(f"Unknown index encoding '{encoding}', expected one of {INDEX_ENCODINGS}")
+    if kind == "ivf" and vector_count < max(IVF_TRAIN_MIN_VECTORS, ivf_nlist(vector_count)):
+        kind = "flat"
+    if encoding in ("sq8", "pq") and vector_count < max(ENCODING_TRAIN_MIN_VECTORS, 256):
+        encoding = "float32"
+    return kind, encoding
+
+
+def is_trained_layout(kind: str, encoding: str) -> bool:
+    """True for layouts fitted to the data they were built from."""
+    return kind == "ivf" or encoding in ("sq8", "pq")
+
+
+def needs_rebuild(index, kind: str = None, encoding: str = None, trained_vectors: int = None) -> bool:
+    """
+    True if the index should be rebuilt: it does not have the target layout,
+    or it has a trained layout and has grown to RETRAIN_GROWTH_FACTOR times
+    the trained_vectors it was built from, so its IVF lists have grown long
+    (with automatic nlist, too few) and its centroids and codebooks stale.
+    """
+    target_kind, target_encoding = target_layout(index.ntotal, kind, encoding)
+    if (index_type(index), index_encoding(index)) != (target_kind, target_encoding):
+        return True
+    if trained_vectors and is_trained_layout(target_kind, target_encoding):
+        return index.ntotal >= RETRAIN_GROWTH_FACTOR * trained_vectors
+    return False
+
+
+def new_index(dim: int, kind: str, encoding: str = "float32", **params):
+    """Create an empty, untrained FAISS index (L2 metric, like the flat store)."""
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{kind}', expected one of {INDEX_TYPES}")
+    if encoding not in INDEX_ENCODINGS:
+        raise ValueError(f"Unknown index encoding '{encoding}', expected one of {INDEX_ENCODINGS}")
+    m = params.get("pq_m") or pq_m(dim)
+
+    if kind == "hnsw":
+        graph_m = params.get("m", HNSW_M)
+        if encoding == "float32":
+            index = faiss.IndexHNSWFlat(dim, graph_m)
+        elif encoding == "pq":
+            index = faiss.IndexHNSWPQ(dim, m, graph_m)
+        else:
+            index = faiss.IndexHNSWSQ(dim, _SQ_TYPES[encoding], graph_m)
+        index.hnsw.efConstruction = params.get("ef_construction", HNSW_EF_CONSTRUCTION)
+        return index
+
+    if kind == "ivf":
+        quantizer = faiss.IndexFlatL2(dim)
+        if encoding == "float32":
+            return faiss.IndexIVFFlat(quantizer, dim, params["nlist"], faiss.METRIC_L2)
+        if encoding == "pq":
+            return faiss.IndexIVFPQ(quantizer, dim, params["nlist"], m, 8)
+        return faiss.IndexIVFScalarQuantizer(quantizer, dim, params["nlist"], _SQ_TYPES[encoding], faiss.METRIC_L2)
+
+    if encoding == "float32":
+        return faiss.IndexFlatL2(dim)
+    if encoding == "pq":
+        return faiss.IndexPQ(dim, m, 8)
+    return faiss.IndexScalarQuantizer(dim, _SQ_TYPES[encoding])
+
+
+def build_index(vectors, kind: str, encoding: str = "float32", **params):
+    """
+    Build an index of the given layout holding `vectors` at positions
+    0..n-1, training it first if needed. Params override the env defaults:
+    nlist for IVF, m and ef_construction for HNSW, pq_m for PQ.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count, dim = vectors.shape
+    if kind == "ivf":
+        params.setdefault("nlist", ivf_nlist(count))
+    index = new_index(dim, kind, encoding, **params)
+
+    if not index.is_trained:
+        sample_size = min(count, max(params.get("nlist", 0) * IVF_TRAIN_SAMPLES_PER_LIST, ENCODING_TRAIN_SAMPLES))
+        sample = vectors
+        if sample_size < count:
+            rows = np.random.default_rng(0).choice(count, sample_size, replace=False)
+            sample = vectors[np.sort(rows)]
+        index.train(sample)
+
+    index.add(vectors)
+    return index
+
+
+def reconstruct_vectors(index, positions):
+    """
+    Decode stored vectors by position; lossy for compressed encodings. IVF
+    lists have no position lookup, so IVF decodes everything in one scan.
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    if not len(positions):
+        return np.empty((0, index.d), dtype=np.float32)
+    if index_type(index) == "ivf":
+        return index.reconstruct_n(0, index.ntotal)[positions]
+    return np.vstack([index.reconstruct(int(p)) for p in positions])
+
+
+def rerank(queries, candidates, get_vectors, k: int):
+    """
+    Re-score candidate positions (one row per query, -1 for none) by exact L2
+    distance. `get_vectors(positions)` returns their float32 vectors. Returns
+    an (n, k) array of positions, best first, padded with -1.
+    """
+    unique = np.unique(candidates[candidates >= 0])
+    vectors = get_vectors(unique) if len(unique) else None
+    rows = {int(p): i for i, p in enumerate(unique)}
+
+    results = np.full((len(queries), k), -1, dtype=np.int64)
+    for i, (query, row) in enumerate(zip(queries, candidates)):
+        row = row[row >= 0]
+        if not len(row):
+            continue
+        distances = ((vectors[[rows[int(p)] for p in row]] - query) ** 2).sum(axis=1)
+        best = row[np.argsort(distances, kind="stable")[:k]]
+        results[i, :len(best)] = best
+    return results
+
+
+class PositionFilter:
+    """Index positions hidden from search, e.g. deleted vectors awaiting compaction."""
+    def __init__(self, positions):
+        self.positions = np.array(sorted(positions), dtype=np.int64)
+        self._batch = faiss.IDSelectorBatch(self.positions)
+        self.selector = faiss.IDSelectorNot(self._batch)
+
+    def __len__(self):
+        return len(self.positions)
+
+
+def search_index(index, queries, k: int, excluded: PositionFilter = None):
+    """
+    Search an index, skipping the positions in `excluded`. The filter runs
+    inside FAISS with the index's current nprobe / efSearch; flat PQ has no
+    selector support, so it over-fetches and drops excluded positions.
+    """
+    if not excluded:
+        return index.search(queries, k)
+
+    if isinstance(index, faiss.IndexPQ):
+        distances, indices = index.search(queries, min(index.ntotal, k + len(excluded)))
+        keep = (indices >= 0) & ~np.isin(indices, excluded.positions)
+        out_distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        out_indices = np.full((len(queries), k), -1, dtype=np.int64)
+        for row in range(len(queries)):
+            kept = np.flatnonzero(keep[row])[:k]
+            out_distances[row, :len(kept)] = distances[row, kept]
+            out_indices[row, :len(kept)] = indices[row, kept]
+        return out_distances, out_indices
+
+    kind = index_type(index)
+    if kind == "ivf":
+        params = faiss.SearchParametersIVF(sel=excluded.selector, nprobe=index.nprobe)
+    elif kind == "hnsw":
+        params = faiss.SearchParametersHNSW(sel=excluded.selector, efSearch=index.hnsw.efSearch)
+    else:
+        params = faiss.SearchParameters(sel=excluded.selector)
+    return index.search(queries, k, params=params)
+
+
+def apply_search_params(index, nprobe: int = None, ef_search: int = None):
+    """Set the query-time recall/latency knobs that apply to this index."""
+    kind = index_type(index)
+    if kind == "ivf":
+        index.nprobe = min(nprobe or IVF_NPROBE, index.nlist)
+    elif kind == "hnsw":
+        index.hnsw.efSearch = ef_search or HNSW_EF_SEARCH
+
+
+def bytes_per_vector(index) -> float:
+    """Approximate resident bytes per stored vector: codes plus index structure."""
+    kind = index_type(index)
+    if kind == "hnsw":
+        storage = faiss.downcast_index(index.storage)
+        # Neighbor lists, plus a level and an offset entry per vector
+        graph = index.hnsw.neighbors.size() * 4 / max(1, index.ntotal) + 4 + 8
+        return storage.code_size + graph
+    if kind == "ivf":
+        return index.code_size + 8
+    return index.code_size
+
+
+def describe_index(index) -> dict:
+    info = {"type": index_type(index), "encoding": index_encoding(index), "vectors": index.ntotal, "dim": index.d}
+    if info["type"] == "ivf":
+        info.update(nlist=index.nlist, nprobe=index.nprobe)
+    elif info["type"] == "hnsw":
+        info.update(m=index.hnsw.nb_neighbors(1), ef_search=index.hnsw.efSearch)
+    per_vector = bytes_per_vector(index)
+    info["bytes_per_vector"] = round(per_vector, 1)
+    info["mb_per_million_vectors"] = round(per_vector * 1e6 / 2 ** 20, 1)
+    return info
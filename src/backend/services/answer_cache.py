@@ -0,0 +1,113 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+# Minimum cosine similarity between questions for a cached answer to be reused
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+
+
+class SemanticAnswerCache:
+    """
+    LRU/TTL cache of answers keyed by question embedding.
+
+    A new question hits when its cosine similarity to a cached question is at
+    least `threshold` and the entry was stored for the same collection at its
+    current corpus version. Question vectors live in one preallocated matrix, so a lookup is
+    a single matrix-vector product over the cached questions.
+    """
+    def __init__(self, max_size: int = ANSWER_CACHE_SIZE, ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+                 threshold: float = ANSWER_CACHE_THRESHOLD):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._vectors = None
+        # slot -> (collection, corpus version, stored at, response), in LRU order
+        self._entries = OrderedDict()
+        self._free_slots = list(range(max_size - 1, -1, -1))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _drop(self, slot):
+        del self._entries[slot]
+        self._free_slots.append(slot)
+
+    def _drop_stale(self, collection, corpus_version, now):
+        for slot, (entry_collection, version, stored_at, _) in list(self._entries.items()):
+            if (entry_collection == collection and version != corpus_version) or now - stored_at > self.ttl_seconds:
+                self._drop(slot)
+                self.evictions += 1
+
+    def lookup(self, question_vector, corpus_version, collection: str = None):
+        """Return the cached response for a similar question in the collection, or None."""
+        query = self._normalize(question_vector)
+        with self._lock:
+            self._drop_stale(collection, corpus_version, time.time())
+            candidates = [slot for slot, entry in self._entries.items() if entry[0] == collection]
+            if not candidates:
+                self.misses += 1
+                return None
+
+            slots = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            similarities = self._vectors[slots] @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            slot = int(slots[best])
+            self._entries.move_to_end(slot)
+            self.hits += 1
+            return self._entries[slot][3]
+
+    def store(self, question_vector, corpus_version, response, collection: str = None):
+        """Cache a response for a question under the collection's given corpus version."""
+        if self.max_size <= 0:
+            return
+        vector = self._normalize(question_vector)
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                self._vectors = np.zeros((self.max_size, vector.shape[0]), dtype=np.float32)
+                self._entries.clear()
+                self._free_slots = list(range(self.max_size - 1, -1, -1))
+            if not self._free_slots:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+            slot = self._free_slots.pop()
+            self._vectors[slot] = vector
+            self._entries[slot] = (collection, corpus_version, time.time(), response)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._free_slots = list(range(self.max_size - 1, -1, -1))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": ANSWER_CACHE_ENABLED,
+                "entries": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+answer_cache = SemanticAnswerCache()
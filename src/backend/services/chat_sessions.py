@@ -0,0 +1,181 @@
+import os
+import re
+import time
+import uuid
+import threading
+from collections import OrderedDict, deque
+
+from .context_packer import count_tokens, truncate_to_tokens
+
+CHAT_SESSION_MAX = int(os.getenv("CHAT_SESSION_MAX", "10000"))
+CHAT_SESSION_TTL_SECONDS = float(os.getenv("CHAT_SESSION_TTL_SECONDS", "86400"))
+# Most recent turns kept word for word; older ones are compacted into a summary
+CHAT_HISTORY_TURNS = int(os.getenv("CHAT_HISTORY_TURNS", "4"))
+# Token caps for one stored answer and for the summary of compacted turns
+CHAT_TURN_MAX_TOKENS = int(os.getenv("CHAT_TURN_MAX_TOKENS", "300"))
+CHAT_SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", "300"))
+# Previous questions added to a follow-up question's retrieval query
+CHAT_FOLLOWUP_QUESTIONS = int(os.getenv("CHAT_FOLLOWUP_QUESTIONS", "1"))
+
+# A compacted answer keeps its first sentence, up to this many characters
+SUMMARY_ANSWER_CHARS = 200
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def _compact(turn) -> str:
+    """One summary line for a turn leaving the recent window."""
+    answer = " ".join(turn["answer"].split())
+    answer = _SENTENCE_END.split(answer, 1)[0][:SUMMARY_ANSWER_CHARS]
+    return f"- Q: {turn['question']} A: {answer}"
+
+
+class ChatSession:
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.turns = deque()
+        # (line, tokens) of compacted turns, oldest first
+        self.summary = deque()
+        self.summary_tokens = 0
+
+    def history(self):
+        return {
+            "summary": "\n".join(line for line, _ in self.summary),
+            "turns": [dict(turn) for turn in self.turns]
+        }
+
+
+class ChatSessionStore:
+    """
+    Server-side chat history keyed by session ID, so clients send only the
+    new question.
+
+    Each session keeps its last `history_turns` turns verbatim (answers cut
+    to CHAT_TURN_MAX_TOKENS) and compacts older turns into one summary line
+    each, dropping the oldest lines beyond `summary_tokens`. Sessions are
+    LRU-evicted beyond `max_sessions` and expire after `ttl_seconds` idle.
+    """
+    def __init__(self, max_sessions: int = CHAT_SESSION_MAX, ttl_seconds: float = CHAT_SESSION_TTL_SECONDS,
+                 history_turns: int = CHAT_HISTORY_TURNS, summary_tokens: int = CHAT_SUMMARY_TOKENS):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.history_turns = history_turns
+        self.summary_tokens = summary_tokens
+        self._lock = threading.Lock()
+        # session ID -> ChatSession, least recently used first
+        self._sessions = OrderedDict()
+        self.created = 0
+        self.evictions = 0
+        self.compacted_turns = 0
+
+    def _drop_expired(self, now):
+        # LRU order is idle-time order, so expired sessions are at the front
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_used <= self.ttl_seconds:
+                break
+            del self._sessions[session.session_id]
+            self.evictions += 1
+
+    def _get(self, session_id: str, now):
+        self._drop_expired(now)
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.last_used = now
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def open(self, session_id: str = None):
+        """
+        Return (session ID, history) for a session, creating it if the ID is
+        new, expired or not given.
+        """
+        now = time.time()
+        with self._lock:
+            session = self._get(session_id, now) if session_id else None
+            if session is None:
+                session = ChatSession(session_id or uuid.uuid4().hex)
+                self._sessions[session.session_id] = session
+                self.created += 1
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.evictions += 1
+            return session.session_id, session.history()
+
+    def get_history(self, session_id: str):
+        """History of a live session, or None."""
+        with self._lock:
+            session = self._get(session_id, time.time())
+            return session.history() if session is not None else None
+
+    def add_turn(self, session_id: str, question: str, answer: str, sources=None):
+        """Record a finished turn, compacting the oldest recent turn if the window is full."""
+        turn = {
+            "question": question,
+            "answer": truncate_to_tokens(answer.strip(), CHAT_TURN_MAX_TOKENS),
+            "sources": sorted({source for source in sources or [] if source}),
+            "at": time.time()
+        }
+        with self._lock:
+            session = self._get(session_id, turn["at"])
+            if session is None:
+                return
+            session.turns.append(turn)
+            while len(session.turns) > self.history_turns:
+                line = truncate_to_tokens(_compact(session.turns.popleft()), self.summary_tokens)
+                tokens = count_tokens(line)
+                session.summary.append((line, tokens))
+                session.summary_tokens += tokens
+                self.compacted_turns += 1
+            while session.summary and session.summary_tokens > self.summary_tokens:
+                session.summary_tokens -= session.summary.popleft()[1]
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "created": self.created,
+                "evictions": self.evictions,
+                "compacted_turns": self.compacted_turns
+            }
+
+
+def format_history(history) -> str:
+    """History as prompt text, empty for a new session."""
+    if not history:
+        return ""
+    parts = []
+    if history["summary"]:
+        parts.append(f"Earlier questions:\n{history['summary']}")
+    for turn in history["turns"]:
+        parts.append(f"User: {turn['question']}\nAssistant: {turn['answer']}")
+    return "\n\n".join(parts)
+
+
+def followup_query(question: str, history) -> str:
+    """
+    Retrieval query for a question in a conversation: the latest previous
+    questions are prepended, so follow-ups such as "and its limits?" still
+    retrieve chunks about the topic under discussion.
+    """
+    if not history or CHAT_FOLLOWUP_QUESTIONS <= 0:
+        return question
+    previous = [turn["question"] for turn in history["turns"][-CHAT_FOLLOWUP_QUESTIONS:]]
+    return " ".join(previous + [question])
+
+
+def has_history(history) -> bool:
+    return bool(history and (history["turns"] or history["summary"]))
+
+
+chat_sessions = ChatSessionStore()
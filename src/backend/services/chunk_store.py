@@ -0,0 +1,240 @@
+import os
+import sys
+import json
+import mmap
+import threading
+from array import array
+
+CHUNK_DIR = "backend/data/chunks"
+CHUNKS_FILE = "chunks.jsonl"
+OFFSETS_FILE = "chunks.idx"
+# Store IDs of chunks no longer referenced by any collection, until compaction
+DELETED_FILE = "chunks.deleted"
+# Names the generation of the chunk and offset files in use
+MANIFEST_FILE = "chunks.manifest.json"
+# The store is rewritten without deleted chunks once they pass this fraction of it
+CHUNK_STORE_COMPACT_FRACTION = float(os.getenv("CHUNK_STORE_COMPACT_FRACTION", "0.2"))
+
+# Offset recorded for a chunk that compaction removed
+_REMOVED = 2 ** 64 - 1
+
+os.makedirs(CHUNK_DIR, exist_ok=True)
+
+
+def _generation_file(name: str, generation: int) -> str:
+    if not generation:
+        return name
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{generation}{ext}"
+
+
+def _read_ids(path: str):
+    # A torn write can leave a partial entry; ignore it
+    with open(path, "rb") as f:
+        raw = f.read()
+    ids = array("Q", raw[:len(raw) // 8 * 8])
+    if sys.byteorder == "big":
+        ids.byteswap()
+    return ids
+
+
+def _write_ids(f, ids):
+    packed = array("Q", ids)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    f.write(packed.tobytes())
+
+
+class ChunkStore:
+    """
+    Chunk store with O(1) lookup by chunk store ID.
+
+    Chunks are written as compact JSON lines; the offsets file holds one
+    little-endian uint64 byte offset per store ID. Deleted chunks are listed
+    in DELETED_FILE and dropped by compact(), which keeps store IDs stable.
+    """
+    def __init__(self, directory: str = CHUNK_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._data = None
+        self._data_size = 0
+        os.makedirs(directory, exist_ok=True)
+        self._use_generation(self._read_generation())
+        for path in (self.chunks_path, self.offsets_path, self.deleted_path):
+            if not os.path.exists(path):
+                open(path, "ab").close()
+        self._offsets = _read_ids(self.offsets_path)
+        self._count = len(self._offsets)
+        self._removed = sum(1 for offset in self._offsets if offset == _REMOVED)
+        self._deleted = {store_id for store_id in _read_ids(self.deleted_path)
+                         if store_id < self._count and self._offsets[store_id] != _REMOVED}
+
+    def _read_generation(self):
+        try:
+            with open(os.path.join(self.directory, MANIFEST_FILE)) as f:
+                return json.load(f)["generation"]
+        except FileNotFoundError:
+            return 0
+
+    def _use_generation(self, generation: int):
+        self.generation = generation
+        self.chunks_path = os.path.join(self.directory, _generation_file(CHUNKS_FILE, generation))
+        self.offsets_path = os.path.join(self.directory, _generation_file(OFFSETS_FILE, generation))
+        self.deleted_path = os.path.join(self.directory, DELETED_FILE)
+
+    def __len__(self):
+        return self._count - self._removed - len(self._deleted)
+
+    def append_many(self, chunks):
+        """
+        Append chunks and return their store IDs. Each chunk dict gets its
+        ID under "store_id" as well.
+        """
+        with self._lock:
+            with open(self.chunks_path, "ab") as data_file:
+                data_file.seek(0, os.SEEK_END)
+                offsets = []
+                for chunk in chunks:
+                    offsets.append(data_file.tell())
+                    data_file.write(json.dumps(chunk, separators=(",", ":")).encode("utf-8") + b"\n")
+                data_file.flush()
+
+            with open(self.offsets_path, "r+b") as offsets_file:
+                offsets_file.truncate(self._count * 8)
+                offsets_file.seek(self._count * 8)
+                _write_ids(offsets_file, offsets)
+
+            first_id = self._count
+            self._offsets.extend(offsets)
+            self._count += len(offsets)
+
+        ids = list(range(first_id, first_id + len(offsets)))
+        for store_id, chunk in zip(ids, chunks):
+            chunk["store_id"] = store_id
+        return ids
+
+    def discard(self, store_ids):
+        """Mark chunks as no longer referenced; compact() drops them."""
+        with self._lock:
+            store_ids = [store_id for store_id in dict.fromkeys(store_ids)
+                         if 0 <= store_id < self._count and store_id not in self._deleted
+                         and self._offsets[store_id] != _REMOVED]
+            if not store_ids:
+                return
+            with open(self.deleted_path, "ab") as f:
+                _write_ids(f, store_ids)
+            self._deleted.update(store_ids)
+
+    def needs_compaction(self):
+        return len(self._deleted) > CHUNK_STORE_COMPACT_FRACTION * (self._count - self._removed)
+
+    def compact(self):
+        """
+        Rewrite the store without deleted chunks as a new generation. Store
+        IDs do not change; removed ones no longer resolve. Returns how many
+        chunks were removed.
+        """
+        with self._lock:
+            if not self._deleted:
+                return 0
+            generation = self.generation + 1
+            chunks_path = os.path.join(self.directory, _generation_file(CHUNKS_FILE, generation))
+            offsets_path = os.path.join(self.directory, _generation_file(OFFSETS_FILE, generation))
+            offsets = array("Q")
+            with open(self.chunks_path, "rb") as old, open(chunks_path, "wb") as new:
+                for store_id, offset in enumerate(self._offsets[:self._count]):
+                    if offset == _REMOVED or store_id in self._deleted:
+                        offsets.append(_REMOVED)
+                        continue
+                    old.seek(offset)
+                    offsets.append(new.tell())
+                    new.write(old.readline())
+            with open(offsets_path, "wb") as f:
+                _write_ids(f, offsets)
+
+            # The manifest switches generations in one step; the deleted list
+            # left behind only names chunks the new generation already removed
+            manifest_path = os.path.join(self.directory, MANIFEST_FILE)
+            with open(manifest_path + ".tmp", "w") as f:
+                json.dump({"generation": generation}, f)
+            os.replace(manifest_path + ".tmp", manifest_path)
+            old_paths = (self.chunks_path, self.offsets_path)
+            self._use_generation(generation)
+            open(self.deleted_path, "wb").close()
+            for path in old_paths:
+                os.remove(path)
+
+            removed = len(self._deleted)
+            self._offsets = offsets
+            self._removed += removed
+            self._deleted = set()
+            self._data = None
+            self._data_size = 0
+        return removed
+
+    def compact_if_needed(self):
+        return self.compact() if self.needs_compaction() else 0
+
+    def _mapped_data(self):
+        size = os.path.getsize(self.chunks_path)
+        if self._data is None or size > self._data_size:
+            with open(self.chunks_path, "rb") as f:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._data_size = size
+        return self._data
+
+    def get(self, store_id: int):
+        """Return the chunk with this store ID."""
+        with self._lock:
+            if not 0 <= store_id < self._count or store_id in self._deleted or self._offsets[store_id] == _REMOVED:
+                raise KeyError(store_id)
+            start = self._offsets[store_id]
+            data = self._mapped_data()
+            end = data.find(b"\n", start)
+            chunk = json.loads(data[start:end])
+        chunk["store_id"] = store_id
+        return chunk
+
+    def clear(self):
+        """Delete every chunk; store IDs start again from 0."""
+        with self._lock:
+            for name in os.listdir(self.directory):
+                if name.startswith("chunks."):
+                    os.remove(os.path.join(self.directory, name))
+            self._use_generation(0)
+            for path in (self.chunks_path, self.offsets_path, self.deleted_path):
+                open(path, "wb").close()
+            self._offsets = array("Q")
+            self._count = 0
+            self._removed = 0
+            self._deleted = set()
+            self._data = None
+            self._data_size = 0
+
+    def iter_chunks(self):
+        """Stream every stored chunk in store ID order."""
+        with self._lock:
+            offsets = self._offsets[:self._count]
+            deleted = set(self._deleted)
+            chunks_path = self.chunks_path
+        with open(chunks_path, "rb") as data_file:
+            for store_id, offset in enumerate(offsets):
+                if offset == _REMOVED or store_id in deleted:
+                    continue
+                data_file.seek(offset)
+                chunk = json.loads(data_file.readline())
+                chunk["store_id"] = store_id
+                yield chunk
+
+
+_chunk_store = None
+_chunk_store_lock = threading.Lock()
+
+
+def get_chunk_store():
+    """Return the process-wide chunk store."""
+    global _chunk_store
+    with _chunk_store_lock:
+        if _chunk_store is None:
+            _chunk_store = ChunkStore()
+        return _chunk_store
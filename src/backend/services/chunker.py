@@ -1,17 +1,27 @@
-import os
-import json
+from collections import deque
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from .chunk_store import get_chunk_store
+from .metrics import track_stage, count_items
 
-CHUNK_DIR = "backend/data/chunks"
-os.makedirs(CHUNK_DIR, exist_ok=True)
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 100
+# Separators the splitter tries in order; chunk_stream applies the first two
+# while streaming and hands longer pieces to a splitter for the rest
+PARAGRAPH_SEPARATOR = "\n\n"
+LINE_SEPARATOR = "\n"
 
-def chunk_text(text: str, source: str):
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=800,
-        chunk_overlap=100
+def _get_splitter():
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP
     )
 
-    chunks = splitter.split_text(text)
+def chunk_text(text: str, source: str):
+    splitter = _get_splitter()
+
+    with track_stage("chunk"):
+        chunks = splitter.split_text(text)
+    count_items("chunk", len(chunks))
 
     chunk_data = []
     for idx, chunk in enumerate(chunks):
@@ -22,8 +32,217 @@ def chunk_text(text: str, source: str):
             "chunk_info": f"Chunk {idx+1} of {len(chunks)}"
         })
 
-    file_path = os.path.join(CHUNK_DIR, f"{source}_chunks.json")
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(chunk_data, f, indent=2)
+    get_chunk_store().append_many(chunk_data)
 
     return chunk_data
+
+def chunk_pages(pages, source: str):
+    """
+    Chunk a stream of (page_number, text) pairs page by page, yielding chunks
+    as soon as each page is split and appended to the chunk store. Chunk IDs
+    run across the whole document and every chunk records the page it came
+    from.
+    """
+    splitter = _get_splitter()
+    chunk_store = get_chunk_store()
+
+    idx = 0
+    for page_number, text in pages:
+        page_chunks = []
+        with track_stage("chunk"):
+            texts = splitter.split_text(text)
+        count_items("chunk", len(texts))
+        for chunk in texts:
+            page_chunks.append({
+                "chunk_id": idx,
+                "text": chunk,
+                "source": source,
+                "page": page_number,
+                "chunk_info": f"Page {page_number}, chunk {idx+1}"
+            })
+            idx += 1
+
+        chunk_store.append_many(page_chunks)
+        yield from page_chunks
+
+class _SeparatorStream:
+    """
+    Split text fed in pieces on a separator the way the splitter does: each
+    piece starts with the separator that preceded it. A piece is complete
+    once the next separator has been seen, and is only empty at the start of
+    the text or right after release().
+    """
+
+    def __init__(self, separator: str):
+        self.separator = separator
+        self.pending = ""
+        self._scan = 0
+
+    def feed(self, text: str):
+        self.pending += text
+        while True:
+            found = self.pending.find(self.separator, self._scan)
+            if found < 0:
+                self._scan = max(self._scan, len(self.pending) - len(self.separator) + 1)
+                return
+            piece, self.pending = self.pending[:found], self.pending[found:]
+            self._scan = len(self.separator)
+            yield piece
+
+    def settled(self):
+        """Length of the pending text that belongs to the current piece whatever follows."""
+        return len(self.pending) - len(self.separator) + 1
+
+    def release(self):
+        """
+        Give up the pending text that cannot be the start of a separator,
+        for a piece already known to be too long to merge.
+        """
+        keep = len(self.separator) - 1
+        released, self.pending = self.pending[:len(self.pending) - keep], self.pending[len(self.pending) - keep:]
+        self._scan = 0
+        return released
+
+    def finish(self):
+        piece, self.pending, self._scan = self.pending, "", 0
+        return piece
+
+
+class _Merger:
+    """Merge pieces shorter than a chunk into chunks with overlap, as the splitter does."""
+
+    def __init__(self):
+        self._current = deque()
+        self._total = 0
+
+    def push(self, piece: str):
+        if self._total + len(piece) > CHUNK_SIZE and self._current:
+            chunk = "".join(self._current).strip()
+            if chunk:
+                yield chunk
+            while self._total > CHUNK_OVERLAP or (self._total + len(piece) > CHUNK_SIZE and self._total > 0):
+                self._total -= len(self._current.popleft())
+        self._current.append(piece)
+        self._total += len(piece)
+
+    def flush(self):
+        chunk = "".join(self._current).strip()
+        self._current.clear()
+        self._total = 0
+        if chunk:
+            yield chunk
+
+
+class _LongPiece:
+    """Split a paragraph too long for one chunk into lines, then words."""
+
+    def __init__(self):
+        self._lines = _SeparatorStream(LINE_SEPARATOR)
+        self._merger = _Merger()
+
+    def _line(self, line: str):
+        if len(line) < CHUNK_SIZE:
+            yield from self._merger.push(line)
+            return
+        yield from self._merger.flush()
+        yield from RecursiveCharacterTextSplitter(
+            separators=[" ", ""],
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP
+        ).split_text(line)
+
+    def feed(self, text: str):
+        for line in self._lines.feed(text):
+            if line:
+                yield from self._line(line)
+
+    def finish(self):
+        line = self._lines.finish()
+        if line:
+            yield from self._line(line)
+        yield from self._merger.flush()
+
+
+def _split_stream(lines):
+    """
+    Yield the chunks of "\n".join(lines) without building the string. Only
+    the paragraph being read and the chunk being merged are held, and the
+    chunks are those of _get_splitter().split_text on the whole text.
+    """
+    paragraphs = _SeparatorStream(PARAGRAPH_SEPARATOR)
+    merger = _Merger()
+    # Set while the paragraph being read is too long to merge
+    long_piece = None
+
+    def paragraph(text):
+        if len(text) < CHUNK_SIZE:
+            yield from merger.push(text)
+            return
+        yield from merger.flush()
+        piece = _LongPiece()
+        yield from piece.feed(text)
+        yield from piece.finish()
+
+    for n, line in enumerate(lines):
+        for text in paragraphs.feed(line if n == 0 else LINE_SEPARATOR + line):
+            if long_piece is not None:
+                yield from long_piece.feed(text)
+                yield from long_piece.finish()
+                long_piece = None
+            elif text:
+                yield from paragraph(text)
+        if long_piece is None and paragraphs.settled() >= CHUNK_SIZE:
+            yield from merger.flush()
+            long_piece = _LongPiece()
+        if long_piece is not None:
+            yield from long_piece.feed(paragraphs.release())
+
+    text = paragraphs.finish()
+    if long_piece is not None:
+        yield from long_piece.feed(text)
+        yield from long_piece.finish()
+    elif text:
+        yield from paragraph(text)
+    yield from merger.flush()
+
+
+def chunk_stream(lines, source: str, batch_size: int = 32):
+    """
+    Chunk text that arrives as a stream of lines, yielding chunks as soon as
+    they are complete, so long documents are chunked in full without joining
+    them into one string. Chunk boundaries and overlap are exactly those of
+    chunking "\n".join(lines) at once.
+    """
+    chunk_store = get_chunk_store()
+
+    idx = 0
+    batch = []
+
+    def emit():
+        nonlocal idx, batch
+        count_items("chunk", len(batch))
+        chunk_data = []
+        for chunk in batch:
+            chunk_data.append({
+                "chunk_id": idx,
+                "text": chunk,
+                "source": source,
+                "chunk_info": f"Chunk {idx+1}"
+            })
+            idx += 1
+        chunk_store.append_many(chunk_data)
+        batch = []
+        return chunk_data
+
+    chunks = _split_stream(lines)
+    while True:
+        with track_stage("chunk"):
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            yield from emit()
+
+    if batch:
+        yield from emit()
@@ -0,0 +1,244 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+import numpy as np
+
+CACHE_DIR = "backend/data/cache"
+TEXT_CACHE_DIR = os.path.join(CACHE_DIR, "text")
+EMBEDDING_CACHE_DIR = os.path.join(CACHE_DIR, "embeddings")
+SOURCES_PATH = os.path.join(CACHE_DIR, "sources.json")
+VALIDATORS_PATH = os.path.join(CACHE_DIR, "validators.json")
+
+os.makedirs(TEXT_CACHE_DIR, exist_ok=True)
+os.makedirs(EMBEDDING_CACHE_DIR, exist_ok=True)
+
+_sources_lock = threading.Lock()
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hash_lines(lines) -> str:
+    """hash_text of the lines joined with newlines, without joining them."""
+    digest = hashlib.sha256()
+    for n, line in enumerate(lines):
+        if n:
+            digest.update(b"\n")
+        digest.update(line.encode("utf-8"))
+    return digest.hexdigest()
+
+
+# ---------------------------
+# Extracted pages, keyed by file hash
+# ---------------------------
+def _pages_path(file_hash: str):
+    return os.path.join(TEXT_CACHE_DIR, f"{file_hash}.pages.jsonl")
+
+
+def get_cached_pages(file_hash: str):
+    """
+    Return a generator of (page_number, text) previously extracted from a
+    file hash, or None if the file has not been extracted before.
+    """
+    path = _pages_path(file_hash)
+    if not os.path.exists(path):
+        return None
+
+    def read_pages():
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                page = json.loads(line)
+                yield page["page"], page["text"]
+    return read_pages()
+
+
+def cache_pages(file_hash: str, pages):
+    """
+    Pass (page_number, text) pairs through while writing them to the page
+    cache. The cache entry only becomes visible once every page was seen.
+    """
+    path = _pages_path(file_hash)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    completed = False
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for page_number, text in pages:
+                f.write(json.dumps({"page": page_number, "text": text}) + "\n")
+                yield page_number, text
+        os.replace(tmp_path, path)
+        completed = True
+    finally:
+        if not completed and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+# ---------------------------
+# Ingested sources, keyed by source name
+# ---------------------------
+def _load_sources():
+    if not os.path.exists(SOURCES_PATH):
+        return {}
+    with open(SOURCES_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def is_source_unchanged(source: str, content_hash: str) -> bool:
+    """True if this exact content was already ingested under this source."""
+    with _sources_lock:
+        return _load_sources().get(source) == content_hash
+
+
+def _write_json(path: str, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def record_source(source: str, content_hash: str):
+    with _sources_lock:
+        sources = _load_sources()
+        sources[source] = content_hash
+        _write_json(SOURCES_PATH, sources)
+
+
+def forget_source(source: str):
+    """Forget that a source was ingested, so it is ingested in full next time."""
+    with _sources_lock:
+        sources = _load_sources()
+        if sources.pop(source, None) is not None:
+            _write_json(SOURCES_PATH, sources)
+
+
+# ---------------------------
+# HTTP validators of fetched URLs, keyed by URL
+# ---------------------------
+def _load_validators():
+    if not os.path.exists(VALIDATORS_PATH):
+        return {}
+    with open(VALIDATORS_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def get_validators(urls):
+    """Stored ETag / Last-Modified per URL, for the URLs that have any."""
+    with _sources_lock:
+        validators = _load_validators()
+    return {url: validators[url] for url in urls if url in validators}
+
+
+def record_validators(url: str, etag: str = None, last_modified: str = None):
+    """Remember a URL's validators for the next conditional fetch."""
+    with _sources_lock:
+        validators = _load_validators()
+        if etag or last_modified:
+            validators[url] = {"etag": etag, "last_modified": last_modified}
+        else:
+            validators.pop(url, None)
+        _write_json(VALIDATORS_PATH, validators)
+
+
+def forget_validators(urls):
+    """Drop stored validators, so the next fetch of these URLs is unconditional."""
+    with _sources_lock:
+        validators = _load_validators()
+        if any(validators.pop(url, None) is not None for url in list(urls)):
+            _write_json(VALIDATORS_PATH, validators)
+
+
+def validated_urls():
+    """URLs that have stored validators."""
+    with _sources_lock:
+        return list(_load_validators())
+
+
+def clear_content_caches():
+    """
+    Delete everything cached on disk: extracted pages, embeddings, ingested
+    sources and URL validators.
+    """
+    with _sources_lock:
+        for directory in (TEXT_CACHE_DIR, EMBEDDING_CACHE_DIR):
+            shutil.rmtree(directory, ignore_errors=True)
+            os.makedirs(directory, exist_ok=True)
+        for path in (SOURCES_PATH, VALIDATORS_PATH):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+# ---------------------------
+# Embeddings, keyed by chunk hash
+# ---------------------------
+class EmbeddingCache:
+    """Append-only on-disk cache of embedding vectors keyed by chunk hash."""
+    def __init__(self, namespace: str, directory: str = EMBEDDING_CACHE_DIR):
+        safe_name = "".join(c if c.isalnum() or c in "._-" else "_" for c in namespace)
+        self.vectors_path = os.path.join(directory, f"{safe_name}.f32")
+        self.keys_path = os.path.join(directory, f"{safe_name}.keys")
+        self.dim = None
+        self.rows = {}
+        self._lock = threading.Lock()
+        self._mmap = None
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.keys_path):
+            return
+        with open(self.keys_path, encoding="utf-8") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) != 2:
+                    continue
+                if parts[0] == "#dim":
+                    self.dim = int(parts[1])
+                else:
+                    self.rows[parts[0]] = int(parts[1])
+
+    def _vectors(self):
+        row_count = os.path.getsize(self.vectors_path) // (self.dim * 4)
+        if self._mmap is None or self._mmap.shape[0] < row_count:
+            self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(row_count, self.dim))
+        return self._mmap
+
+    def get_many(self, hashes):
+        """
+        Look up vectors for chunk hashes. Returns a dict of hash -> vector for
+        the hits; misses are simply absent.
+        """
+        with self._lock:
+            hits = [h for h in hashes if h in self.rows]
+            if not hits:
+                return {}
+            vectors = self._vectors()[[self.rows[h] for h in hits]]
+        return dict(zip(hits, np.asarray(vectors, dtype=np.float32)))
+
+    def put_many(self, hashes, vectors):
+        """Append vectors for new chunk hashes."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            new = [(h, v) for h, v in zip(hashes, vectors) if h not in self.rows]
+            if not new:
+                return
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                with open(self.keys_path, "a", encoding="utf-8") as f:
+                    f.write(f"#dim {self.dim}\n")
+
+            # Rows are numbered from the file size, so a torn earlier write
+            # can never shift later rows onto the wrong keys
+            first_row = (os.path.getsize(self.vectors_path) // (self.dim * 4)
+                         if os.path.exists(self.vectors_path) else 0)
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(first_row * self.dim * 4)
+                f.write(np.stack([v for _, v in new]).tobytes())
+            with open(self.keys_path, "a", encoding="utf-8") as f:
+                for offset, (h, _) in enumerate(new):
+                    self.rows[h] = first_row + offset
+                    f.write(f"{h} {first_row + offset}\n")
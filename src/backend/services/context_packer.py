@@ -0,0 +1,174 @@
+import os
+import threading
+
+from .metrics import CONTEXT_TOKENS
+from .content_cache import hash_text
+
+# Most prompt tokens spent on retrieved context per question
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+# tiktoken encoding used to count tokens, or "chars" to estimate
+# CHARS_PER_TOKEN characters per token without tiktoken (e.g. offline)
+CONTEXT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER", "cl100k_base")
+ESTIMATE_TOKENIZER = "chars"
+# A segment that does not fit is cut to the remaining budget, unless less
+# than this is left
+CONTEXT_MIN_SEGMENT_TOKENS = int(os.getenv("CONTEXT_MIN_SEGMENT_TOKENS", "64"))
+
+# Longest text repeated between neighbouring chunks (chunker overlap is 100),
+# and the shortest match taken as overlap rather than coincidence
+MAX_OVERLAP_CHARS = 400
+MIN_OVERLAP_CHARS = 8
+# Rough characters per token for the offline estimate
+CHARS_PER_TOKEN = 4
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def load_tokenizer():
+    """
+    Load the configured tokenizer: the tiktoken encoding, or False for the
+    character estimate. tiktoken downloads an encoding on its first use,
+    so the API calls this at startup rather than inside a request. Raises
+    RuntimeError if the encoding cannot be loaded.
+    """
+    global _encoding
+    with _encoding_lock:
+        if _encoding is None:
+            if CONTEXT_TOKENIZER == ESTIMATE_TOKENIZER:
+                _encoding = False
+            else:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding(CONTEXT_TOKENIZER)
+                except Exception as e:
+                    raise RuntimeError(
+                        f"Cannot load tiktoken encoding '{CONTEXT_TOKENIZER}' ({e}); set "
+                        f"CONTEXT_TOKENIZER={ESTIMATE_TOKENIZER} to estimate {CHARS_PER_TOKEN} characters per token"
+                    ) from e
+    return _encoding
+
+
+def _get_encoding():
+    return _encoding if _encoding is not None else load_tokenizer()
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens, at a word boundary where possible."""
+    encoding = _get_encoding()
+    if encoding:
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        cut = encoding.decode(tokens[:max_tokens])
+    else:
+        if len(text) <= max_tokens * CHARS_PER_TOKEN:
+            return text
+        cut = text[:max_tokens * CHARS_PER_TOKEN]
+    space = cut.rfind(" ")
+    return (cut[:space] if space > len(cut) // 2 else cut).rstrip() + " ..."
+
+
+def _overlap(previous: str, following: str) -> int:
+    """Length of the longest suffix of `previous` that `following` starts with."""
+    for size in range(min(len(previous), len(following), MAX_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(following[:size]):
+            return size
+    return 0
+
+
+def _segment_header(segment) -> str:
+    ids = segment["chunk_ids"]
+    label = f"Source: {segment['source']}"
+    if ids:
+        label += f", chunk {ids[0] + 1}" if len(ids) == 1 else f", chunks {ids[0] + 1}-{ids[-1] + 1}"
+    pages = sorted({doc.metadata["page"] for doc in segment["documents"] if "page" in doc.metadata})
+    if pages:
+        label += f", page {pages[0]}" if len(pages) == 1 else f", pages {pages[0]}-{pages[-1]}"
+    return f"[{label}]"
+
+
+def _merge_adjacent(docs):
+    """
+    Group retrieved chunks into segments of consecutive chunk_ids from the
+    same ingest of a source, dropping the text each chunk repeats from the
+    one before. Each segment keeps the rank of its best chunk.
+    """
+    ranked, segments = {}, []
+    for rank, doc in enumerate(docs):
+        source, chunk_id = doc.metadata.get("source"), doc.metadata.get("chunk_id")
+        if chunk_id is None:
+            segments.append({"source": source, "chunk_ids": [], "documents": [doc],
+                             "text": doc.page_content, "rank": rank})
+        else:
+            # Only the same chunk retrieved twice is dropped; distinct chunks
+            # may share a chunk_id, e.g. across versions of a source
+            content_hash = doc.metadata.get("content_hash") or hash_text(doc.page_content)
+            key = (str(source), str(doc.metadata.get("ingest_id", "")), chunk_id, content_hash)
+            ranked.setdefault(key, (rank, doc))
+
+    last = None
+    for (source, ingest_id, chunk_id, _), (rank, doc) in sorted(ranked.items()):
+        if (last is not None and (last["source"], last["ingest_id"]) == (source, ingest_id)
+                and chunk_id == last["chunk_ids"][-1] + 1):
+            size = _overlap(last["text"], doc.page_content)
+            last["text"] += doc.page_content[size:] if size else "\n" + doc.page_content
+            last["chunk_ids"].append(chunk_id)
+            last["documents"].append(doc)
+            last["rank"] = min(last["rank"], rank)
+        else:
+            last = {"source": source, "ingest_id": ingest_id, "chunk_ids": [chunk_id], "documents": [doc],
+                    "text": doc.page_content, "rank": rank}
+            segments.append(last)
+    return segments
+
+
+def pack_context(docs, token_budget: int = None):
+    """
+    Build the prompt context from ranked retrieved chunks. Adjacent chunks
+    of the same source are merged with their overlapping text removed, then
+    the merged segments are packed best-ranked first until the token
+    budget is spent; the last one that does not fit is cut to the rest of
+    the budget. Each segment is labelled with its source, chunks and pages
+    so answers can cite it.
+
+    Returns a dict with the context "text", its "tokens", the tokens the
+    chunks would have cost unpacked ("retrieved_tokens"), and the
+    "documents" whose text made it in, in rank order.
+    """
+    budget = CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    segments = sorted(_merge_adjacent(docs), key=lambda segment: segment["rank"])
+
+    parts, used, tokens = [], [], 0
+    for segment in segments:
+        header = _segment_header(segment)
+        text = f"{header}\n{segment['text']}"
+        cost = count_tokens(text)
+        if tokens + cost > budget:
+            remaining = budget - tokens - count_tokens(header) - 1
+            if remaining < CONTEXT_MIN_SEGMENT_TOKENS:
+                continue
+            text = f"{header}\n{truncate_to_tokens(segment['text'], remaining)}"
+            cost = count_tokens(text)
+        parts.append(text)
+        used.extend(segment["documents"])
+        tokens += cost
+
+    retrieved_tokens = sum(count_tokens(doc.page_content) for doc in docs)
+    CONTEXT_TOKENS.labels("retrieved").inc(retrieved_tokens)
+    CONTEXT_TOKENS.labels("packed").inc(tokens)
+
+    rank = {id(doc): position for position, doc in enumerate(docs)}
+    return {
+        "text": "\n\n".join(parts),
+        "tokens": tokens,
+        "retrieved_tokens": retrieved_tokens,
+        "documents": sorted(used, key=lambda doc: rank[id(doc)])
+    }
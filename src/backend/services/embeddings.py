@@ -1,79 +1,291 @@
 import os
+import pickle
+import threading
+from typing import List
+import numpy as np
 from dotenv import load_dotenv
+from langchain.embeddings.base import Embeddings
 
 # Load environment variables
 load_dotenv()
 
-def get_embedding_model():
+EMBEDDING_STATE_FILE = "embeddings.pkl"
+HASHED_EMBEDDING_DIM = int(os.getenv("HASHED_EMBEDDING_DIM", "1024"))
+
+# Process-wide embedding model, built lazily by get_embedding_model()
+_embedding_model = None
+_embedding_backend = None
+_embedding_lock = threading.Lock()
+# Bumped whenever query vectors could change: the model is rebuilt or its
+# fitted corpus statistics move. Callers caching query vectors key on it.
+_embedding_version = 0
+
+
+class HashedTFIDFEmbeddings(Embeddings):
+    """
+    Offline TF-IDF embeddings built on feature hashing, so there is no
+    vocabulary to fit and the dimension is fixed. Document vectors use only
+    sublinear term frequencies and never change as the corpus grows; document
+    frequencies are counted incrementally and the IDF weights are applied on
+    the query side, which keeps old and new chunks comparable.
+
+    Embedding a document does not count it: the store calls
+    count_documents() for the chunks it actually adds and removes, so cached,
+    re-ingested and deleted chunks keep the statistics exact.
+    """
+    def __init__(self, n_features: int = HASHED_EMBEDDING_DIM, doc_freq=None, n_docs: int = 0):
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        self.n_features = n_features
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features,
+            stop_words='english',
+            ngram_range=(1, 2),
+            alternate_sign=False,
+            norm=None,
+            dtype=np.float32
+        )
+        self.doc_freq = doc_freq if doc_freq is not None else np.zeros(n_features, dtype=np.int64)
+        self.n_docs = n_docs
+        self._lock = threading.Lock()
+
+    def _term_frequencies(self, texts: List[str]):
+        """Sparse sublinear term-frequency matrix for a batch of texts."""
+        tf = self.vectorizer.transform(texts)
+        np.log(tf.data, out=tf.data)
+        tf.data += 1.0
+        return tf
+
+    def idf(self) -> np.ndarray:
+        """Current smoothed IDF weights, one per hashed feature."""
+        with self._lock:
+            return (np.log((1.0 + self.n_docs) / (1.0 + self.doc_freq)) + 1.0).astype(np.float32)
+
+    def count_documents(self, texts: List[str], sign: int = 1):
+        """Add (sign=1) or subtract (sign=-1) documents from the document frequencies."""
+        if not texts:
+            return
+        tf = self._term_frequencies(texts)
+        with self._lock:
+            self.doc_freq += sign * np.bincount(tf.indices, minlength=self.n_features)
+            self.n_docs += sign * tf.shape[0]
+        _bump_embedding_version()
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of documents as an (n, n_features) float32 array."""
+        return _l2_normalize(self._term_frequencies(texts).toarray())
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of queries as an (n, n_features) float32 array."""
+        vectors = self._term_frequencies(texts).toarray()
+        vectors *= self.idf()
+        return _l2_normalize(vectors)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        """Embed a single query."""
+        return self.embed_queries([text])[0]
+
+
+def _l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors /= norms
+    return vectors
+
+
+def _bump_embedding_version():
+    global _embedding_version
+    with _embedding_lock:
+        _embedding_version += 1
+
+
+def get_embedding_version() -> int:
     """
-    Returns embedding model - tries multiple options for reliability
+    Version of the process-wide embedding model's query side; query
+    vectors embedded under one version stay valid until it changes
     """
-    # Option 1: Try simple TFIDF embeddings (most reliable, no internet needed)
+    return _embedding_version
+
+
+HF_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+OPENAI_MODEL_NAME = "text-embedding-3-small"
+
+
+def _build_hashed_tfidf(state=None):
+    if state is None:
+        return HashedTFIDFEmbeddings()
+    return HashedTFIDFEmbeddings(
+        n_features=state["n_features"],
+        doc_freq=state["doc_freq"],
+        n_docs=state["n_docs"]
+    )
+
+
+def _build_huggingface():
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(
+        model_name=HF_MODEL_NAME,
+        model_kwargs={'device': 'cpu'},
+        encode_kwargs={'normalize_embeddings': True}
+    )
+
+
+def _build_openai():
+    from langchain_openai import OpenAIEmbeddings
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY is not set")
+    return OpenAIEmbeddings(
+        model=OPENAI_MODEL_NAME,
+        openai_api_key=api_key
+    )
+
+
+def _build_embedding_model():
+    """
+    Returns (backend name, embedding model) - tries multiple options for reliability
+    """
+    # Option 1: Try hashed TFIDF embeddings (most reliable, no internet needed)
     try:
-        from sklearn.feature_extraction.text import TfidfVectorizer
-        from langchain.embeddings.base import Embeddings
-        from typing import List
-        import numpy as np
-        
-        class SimpleTFIDFEmbeddings(Embeddings):
-            """Simple TFIDF-based embeddings that work offline"""
-            def __init__(self):
-                self.vectorizer = TfidfVectorizer(
-                    max_features=1000,
-                    stop_words='english',
-                    ngram_range=(1, 2)
-                )
-                self.is_fitted = False
-                self.documents_cache = []
-            
-            def embed_documents(self, texts: List[str]) -> List[List[float]]:
-                """Embed a list of documents."""
-                self.documents_cache.extend(texts)
-                
-                if not self.is_fitted:
-                    self.vectorizer.fit(self.documents_cache)
-                    self.is_fitted = True
-                
-                vectors = self.vectorizer.transform(texts).toarray()
-                return vectors.tolist()
-            
-            def embed_query(self, text: str) -> List[float]:
-                """Embed a single query."""
-                if not self.is_fitted:
-                    self.vectorizer.fit([text])
-                    self.is_fitted = True
-                
-                vector = self.vectorizer.transform([text]).toarray()[0]
-                return vector.tolist()
-        
-        print("Using simple TFIDF embeddings (offline)")
-        return SimpleTFIDFEmbeddings()
+        model = _build_hashed_tfidf()
+        print("Using hashed TFIDF embeddings (offline)")
+        return "hashed_tfidf", model
     except Exception as e:
         print(f"Simple embeddings failed: {e}")
-    
+
     # Option 2: Try Hugging Face (if network allows)
     try:
-        from langchain_huggingface import HuggingFaceEmbeddings
         print("Attempting Hugging Face embeddings...")
-        return HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
-        )
+        return "huggingface", _build_huggingface()
     except Exception as e:
         print(f"Hugging Face embeddings failed: {e}")
-    
+
     # Option 3: Try OpenAI API (if API key available)
     try:
-        from langchain_openai import OpenAIEmbeddings
-        api_key = os.getenv("OPENAI_API_KEY")
-        if api_key:
-            print("Attempting OpenAI embeddings...")
-            return OpenAIEmbeddings(
-                model="text-embedding-3-small",
-                openai_api_key=api_key
-            )
+        print("Attempting OpenAI embeddings...")
+        return "openai", _build_openai()
     except Exception as e:
         print(f"OpenAI embeddings failed: {e}")
-    
-    raise Exception("All embedding options failed. Please check your network or add OPENAI_API_KEY.")
\ No newline at end of file
+
+    raise Exception("All embedding options failed. Please check your network or add OPENAI_API_KEY.")
+
+
+def get_embedding_model():
+    """
+    Returns the process-wide embedding model, building it on first use
+    """
+    global _embedding_model, _embedding_backend, _embedding_version
+
+    if _embedding_model is None:
+        with _embedding_lock:
+            if _embedding_model is None:
+                _embedding_backend, _embedding_model = _build_embedding_model()
+                _embedding_version += 1
+    return _embedding_model
+
+
+def embed_queries(texts: List[str]) -> np.ndarray:
+    """
+    Embed a batch of queries as one (n, dim) float32 matrix
+    """
+    model = get_embedding_model()
+    if hasattr(model, "embed_queries"):
+        return model.embed_queries(texts)
+    # Pretrained backends embed queries and documents the same way, in batches
+    return np.asarray(model.embed_documents(texts), dtype=np.float32)
+
+
+def count_documents(texts: List[str], sign: int = 1):
+    """
+    Count stored documents in (sign=1) or out (sign=-1) of the fitted corpus
+    statistics. Pretrained backends have none, so this is a no-op for them.
+    """
+    model = get_embedding_model()
+    if hasattr(model, "count_documents"):
+        model.count_documents(texts, sign)
+
+
+def describe_embedding_model():
+    """
+    Returns the active embedding backend and model name
+    """
+    get_embedding_model()
+    model_names = {
+        "hashed_tfidf": f"hashed-tfidf-{getattr(_embedding_model, 'n_features', HASHED_EMBEDDING_DIM)}",
+        "huggingface": HF_MODEL_NAME,
+        "openai": OPENAI_MODEL_NAME
+    }
+    return {"backend": _embedding_backend, "model": model_names[_embedding_backend]}
+
+
+def save_embedding_state(directory: str):
+    """
+    Save the embedding backend and its fitted state next to the index so
+    query and document vectors keep coming from the same model after a restart
+    """
+    state_path = os.path.join(directory, EMBEDDING_STATE_FILE)
+    model = get_embedding_model()
+    state = {"backend": _embedding_backend}
+    if _embedding_backend == "hashed_tfidf":
+        # Document frequencies follow every add and delete
+        with model._lock:
+            state.update(
+                n_features=model.n_features,
+                doc_freq=model.doc_freq.copy(),
+                n_docs=model.n_docs
+            )
+    elif os.path.exists(state_path):
+        # Pretrained backends have no fitted state, so one save is enough
+        return
+
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(state, f)
+    os.replace(tmp_path, state_path)
+
+
+def load_embedding_state(directory: str):
+    """
+    Rebuild the process-wide embedding model from state saved by
+    save_embedding_state(). Returns False if no state was found.
+    """
+    global _embedding_model, _embedding_backend, _embedding_version
+
+    state_path = os.path.join(directory, EMBEDDING_STATE_FILE)
+    if not os.path.exists(state_path):
+        return False
+
+    with open(state_path, "rb") as f:
+        state = pickle.load(f)
+
+    if state["backend"] not in ("hashed_tfidf", "huggingface", "openai"):
+        print(f"Ignoring unsupported embedding state '{state['backend']}' in {state_path}")
+        return False
+
+    builders = {
+        "hashed_tfidf": lambda: _build_hashed_tfidf(state),
+        "huggingface": _build_huggingface,
+        "openai": _build_openai
+    }
+    with _embedding_lock:
+        _embedding_model = builders[state["backend"]]()
+        _embedding_backend = state["backend"]
+        _embedding_version += 1
+    print(f"Loaded {state['backend']} embedding state from {state_path}")
+    return True
+
+
+def reset_embedding_state(directory: str):
+    """
+    Forget fitted embedding state, in memory and as saved under directory,
+    e.g. when every document is removed. The backend itself is kept.
+    """
+    state_path = os.path.join(directory, EMBEDDING_STATE_FILE)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+
+    if _embedding_backend == "hashed_tfidf":
+        with _embedding_model._lock:
+            _embedding_model.doc_freq[:] = 0
+            _embedding_model.n_docs = 0
+        _bump_embedding_version()
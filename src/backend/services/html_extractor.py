@@ -0,0 +1,104 @@
+import os
+from bs4 import BeautifulSoup
+from lxml import etree
+
+# Backend used to turn HTML into text: "lxml" (streaming, C parser) or
+# "bs4" (BeautifulSoup with the pure-Python html.parser)
+HTML_EXTRACTOR = os.getenv("HTML_EXTRACTOR", "lxml").lower()
+# Characters of HTML handed to the streaming parser at a time
+HTML_FEED_CHARS = 64 * 1024
+
+# Elements whose content is never page text
+SKIP_TAGS = frozenset(["script", "style", "nav", "footer", "header", "aside", "form", "iframe", "noscript"])
+# Shorter lines are likely navigation/UI elements
+MIN_LINE_CHARS = 11
+
+
+def _keep_lines(text: str):
+    for line in text.splitlines():
+        line = line.strip()
+        if len(line) >= MIN_LINE_CHARS:
+            yield line
+
+
+class _TextTarget:
+    """
+    Parser target collecting the text outside skipped elements. Each text
+    node is flushed as soon as the next tag starts or ends, so lines come out
+    in document order while the page is still being parsed and no tree is
+    ever built.
+    """
+
+    def __init__(self):
+        self.lines = []
+        self._pending = []
+        self._skip_depth = 0
+
+    def _flush(self):
+        if self._pending:
+            self.lines.extend(_keep_lines("".join(self._pending)))
+            self._pending = []
+
+    def start(self, tag, attrib):
+        self._flush()
+        if self._skip_depth or tag in SKIP_TAGS:
+            self._skip_depth += 1
+
+    def end(self, tag):
+        self._flush()
+        if self._skip_depth:
+            self._skip_depth -= 1
+
+    def data(self, text):
+        if not self._skip_depth:
+            self._pending.append(text)
+
+    def close(self):
+        self._flush()
+
+
+def _lxml_lines(html: str):
+    target = _TextTarget()
+    parser = etree.HTMLParser(target=target, remove_comments=True, remove_pis=True)
+    for start in range(0, len(html), HTML_FEED_CHARS):
+        parser.feed(html[start:start + HTML_FEED_CHARS])
+        yield from target.lines
+        target.lines = []
+    parser.close()
+    yield from target.lines
+
+
+def _bs4_lines(html: str):
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(list(SKIP_TAGS)):
+        tag.decompose()
+    yield from _keep_lines(soup.get_text(separator="\n"))
+
+
+EXTRACTORS = {
+    "lxml": _lxml_lines,
+    "bs4": _bs4_lines,
+}
+
+
+def iter_text_lines(html: str, extractor: str = None):
+    """
+    Yield the readable lines of an HTML page one at a time, in document
+    order. The whole page is extracted; nothing is truncated.
+    """
+    name = extractor or HTML_EXTRACTOR
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown HTML extractor '{name}'. Choose from: {', '.join(EXTRACTORS)}")
+    if not html:
+        return
+    yield from EXTRACTORS[name](html)
+
+
+def extract_lines(html: str, extractor: str = None) -> list:
+    """Extract the readable lines of an HTML page as a list."""
+    return list(iter_text_lines(html, extractor))
+
+
+def extract_text(html: str, extractor: str = None) -> str:
+    """Extract the readable text of an HTML page as newline-separated lines."""
+    return "\n".join(iter_text_lines(html, extractor))
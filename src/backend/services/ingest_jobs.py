@@ -0,0 +1,242 @@
+import os
+import time
+import uuid
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from .pdf_processor import iter_pdf_pages
+from .web_processor import fetch_and_clean_websites
+from .chunker import chunk_stream, chunk_pages
+from .vector_store import (
+    replace_source, delete_source, list_sources, delete_collection, validate_collection_name, DEFAULT_COLLECTION
+)
+from .content_cache import (
+    hash_lines, is_source_unchanged, record_source, forget_source, get_validators, record_validators,
+    forget_validators, validated_urls
+)
+from .metrics import INGEST_JOBS, INGEST_JOBS_IN_FLIGHT, INGEST_ITEMS
+
+logger = logging.getLogger(__name__)
+
+# Ingestion runs on a small pool so bulk uploads cannot starve query handling
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+# Finished jobs are kept for polling, oldest dropped past this count
+MAX_FINISHED_JOBS = int(os.getenv("MAX_FINISHED_JOBS", "500"))
+# Chunks embedded per batch while streaming a document
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+
+_executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+class IngestJob:
+    """Progress of one ingestion request, as reported by GET /jobs/{id}"""
+    def __init__(self, kind: str, items: list, collection: str = DEFAULT_COLLECTION):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.items = items
+        self.collection = collection
+        self.status = "queued"
+        self.stage = "queued"
+        self.current_item = None
+        self.items_done = 0
+        self.items_unchanged = []
+        self.pages_done = 0
+        self.chunks_total = 0
+        self.chunks_deleted = 0
+        self.errors = []
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "collection": self.collection,
+            "status": self.status,
+            "stage": self.stage,
+            "current_item": self.current_item,
+            "items_total": len(self.items),
+            "items_done": self.items_done,
+            "items_unchanged": list(self.items_unchanged),
+            "pages_done": self.pages_done,
+            "chunks_total": self.chunks_total,
+            "chunks_deleted": self.chunks_deleted,
+            "errors": list(self.errors),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+def _record_key(collection: str, name: str):
+    """Content cache key of a source or URL, prefixed with the collection unless it is the default one."""
+    return name if collection == DEFAULT_COLLECTION else f"{collection}/{name}"
+
+
+def _ingest_chunks(job, chunks, source, content_hash):
+    """Replace a source's chunks with a stream of chunks, then record it as ingested."""
+    job.stage = "embedding"
+
+    def on_batch(batch):
+        job.chunks_total += len(batch)
+        if "page" in batch[-1]:
+            job.pages_done = batch[-1]["page"]
+
+    _, deleted = replace_source(source, chunks, batch_size=INGEST_BATCH_SIZE, on_batch=on_batch,
+                                collection=job.collection)
+    if deleted:
+        logger.info(f"Deleted {deleted} stale chunks of {source}")
+        job.chunks_deleted += deleted
+    record_source(_record_key(job.collection, source), content_hash)
+
+
+def _ingest_pdf(job, item):
+    source = item["filename"]
+    if is_source_unchanged(_record_key(job.collection, source), item["hash"]):
+        logger.info(f"Skipping unchanged source: {source}")
+        job.items_unchanged.append(source)
+        return
+
+    # Pages are extracted, chunked and embedded as a stream
+    pages = iter_pdf_pages(item["path"], item["hash"])
+    _ingest_chunks(job, chunk_pages(pages, source), source, item["hash"])
+
+
+def url_source(url: str):
+    """Source name the chunks of a URL are stored under."""
+    return url.replace("/", "_")
+
+
+def _ingest_url(job, fetched):
+    url, page = fetched
+    if isinstance(page, Exception):
+        raise page
+    source = url_source(url)
+    if page["not_modified"]:
+        logger.info(f"Skipping unmodified source: {source}")
+        job.items_unchanged.append(source)
+        return
+
+    # Servers without validators, or whose validators change on every
+    # request, are caught by comparing the cleaned text instead
+    lines = page["lines"]
+    content_hash = hash_lines(lines)
+    if is_source_unchanged(_record_key(job.collection, source), content_hash):
+        logger.info(f"Skipping unchanged source: {source}")
+        job.items_unchanged.append(source)
+        record_validators(_record_key(job.collection, url), page["etag"], page["last_modified"])
+        return
+
+    job.stage = "chunking"
+    _ingest_chunks(job, chunk_stream(lines, source=source), source, content_hash)
+    record_validators(_record_key(job.collection, url), page["etag"], page["last_modified"])
+    # Back to waiting on the remaining URLs
+    job.stage = "fetching"
+
+
+def _fetch_urls(job):
+    """URLs are fetched and parsed concurrently and ingested as each one arrives"""
+    job.stage = "fetching"
+    keys = {url: _record_key(job.collection, url) for url in job.items}
+    stored = get_validators(keys.values())
+    validators = {url: stored[key] for url, key in keys.items() if key in stored}
+    return fetch_and_clean_websites(job.items, validators=validators)
+
+
+# kind -> (handler, item description, optional function preparing the items)
+_HANDLERS = {
+    "pdf": (_ingest_pdf, lambda item: item["filename"], None),
+    "url": (_ingest_url, lambda item: item[0], _fetch_urls)
+}
+
+
+def _run_job(job):
+    handler, describe, prepare = _HANDLERS[job.kind]
+    job.status = "running"
+    job.started_at = time.time()
+
+    with INGEST_JOBS_IN_FLIGHT.track_inprogress():
+        for item in (prepare(job) if prepare else job.items):
+            job.current_item = describe(item)
+            unchanged = len(job.items_unchanged)
+            try:
+                handler(job, item)
+                outcome = "unchanged" if len(job.items_unchanged) > unchanged else "ingested"
+            except Exception as e:
+                logger.error(f"Error ingesting {job.current_item}: {str(e)}")
+                job.errors.append({"item": job.current_item, "error": str(e)})
+                outcome = "failed"
+            INGEST_ITEMS.labels(job.kind, outcome).inc()
+            job.items_done += 1
+
+    job.current_item = None
+    job.stage = "done"
+    job.status = "failed" if len(job.errors) == len(job.items) else "completed"
+    job.finished_at = time.time()
+    INGEST_JOBS.labels(job.kind, job.status).inc()
+
+
+def _prune_finished_jobs():
+    finished = [job for job in _jobs.values() if job.finished_at is not None]
+    if len(finished) > MAX_FINISHED_JOBS:
+        finished.sort(key=lambda job: job.finished_at)
+        for job in finished[:len(finished) - MAX_FINISHED_JOBS]:
+            del _jobs[job.id]
+
+
+def submit_job(kind: str, items: list, collection: str = None):
+    """
+    Queue an ingestion job and return its ID. `kind` is "pdf" (items are
+    dicts with filename, path and hash) or "url" (items are URLs).
+    """
+    job = IngestJob(kind, items, validate_collection_name(collection or DEFAULT_COLLECTION))
+    with _jobs_lock:
+        _prune_finished_jobs()
+        _jobs[job.id] = job
+    _executor.submit(_run_job, job)
+    return job.id
+
+
+def delete_ingested_source(source: str, collection: str = None):
+    """
+    Delete every chunk of a PDF or URL source from a collection and forget
+    it was ingested. Returns how many chunks were deleted.
+    """
+    collection = collection or DEFAULT_COLLECTION
+    deleted = delete_source(source, collection=collection)
+    _forget_ingested(collection, [source])
+    return deleted
+
+
+def _forget_ingested(collection: str, sources):
+    """Forget the content hashes and URL validators recorded for sources of a collection."""
+    for source in sources:
+        forget_source(_record_key(collection, source))
+    prefix = _record_key(collection, "")
+    sources = set(sources)
+    forget_validators([key for key in validated_urls()
+                       if key.startswith(prefix) and url_source(key[len(prefix):]) in sources])
+
+
+def delete_ingested_collection(collection: str):
+    """
+    Delete a collection with everything stored for it and forget which
+    sources were ingested into it. Returns False if it did not exist.
+    """
+    collection = validate_collection_name(collection)
+    sources = list(list_sources(collection))
+    if not delete_collection(collection):
+        return False
+    _forget_ingested(collection, sources)
+    return True
+
+
+def get_job(job_id: str):
+    """Return a job's progress as a dict, or None if the ID is unknown."""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    return job.to_dict() if job else None
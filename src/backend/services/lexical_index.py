@@ -0,0 +1,222 @@
+import os
+import re
+import math
+import pickle
+import threading
+from array import array
+from collections import Counter
+import numpy as np
+
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+# Identifiers such as ERR-404, os.path.join or v1.2.3 stay whole tokens;
+# their parts are indexed too so "404" or "join" still match
+TOKEN_PATTERN = re.compile(r"[a-z0-9_]+(?:[.\-:/][a-z0-9_]+)*")
+PART_SEPARATORS = re.compile(r"[.\-:/]")
+
+
+def tokenize(text: str):
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if PART_SEPARATORS.search(token):
+            tokens.extend(part for part in PART_SEPARATORS.split(token) if part)
+    return tokens
+
+
+class BM25Index:
+    """
+    Incremental BM25 inverted index.
+
+    Each term's postings are two parallel array('I') lists of document
+    numbers and term frequencies, appended to as chunks are ingested. A query
+    only touches the postings of its own terms, scored with numpy over views
+    of those arrays, so lexical search cost follows the rarity of the query
+    terms rather than the corpus size. Removed documents are masked out of
+    results until the index is rebuilt, and left out of the document count,
+    document frequencies and average length.
+
+    Document numbers follow insertion order, so a store that adds chunks in
+    index order can save the index with its snapshots only and catch up on
+    later additions and deletions after loading it.
+    """
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._term_ids = {}
+        self._postings_docs = []
+        self._postings_tfs = []
+        self._doc_lengths = array("I")
+        self._doc_keys = []
+        # key -> latest document number, and document numbers removed since
+        self._doc_numbers = {}
+        self._deleted = set()
+        self._deleted_array = np.empty(0, dtype=np.uint32)
+        # Total length of the documents not removed
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._doc_keys)
+
+    def add_many(self, keys, token_lists):
+        """Index documents given their keys and tokenize() output."""
+        with self._lock:
+            for key, tokens in zip(keys, token_lists):
+                doc_number = len(self._doc_keys)
+                self._doc_keys.append(key)
+                self._doc_numbers[key] = doc_number
+                self._doc_lengths.append(len(tokens))
+                self._total_length += len(tokens)
+                for term, tf in Counter(tokens).items():
+                    term_id = self._term_ids.get(term)
+                    if term_id is None:
+                        term_id = len(self._postings_docs)
+                        self._term_ids[term] = term_id
+                        self._postings_docs.append(array("I"))
+                        self._postings_tfs.append(array("I"))
+                    self._postings_docs[term_id].append(doc_number)
+                    self._postings_tfs[term_id].append(tf)
+
+    def remove(self, keys):
+        """Hide documents from search by key."""
+        with self._lock:
+            removed = []
+            for key in keys:
+                doc_number = self._doc_numbers.pop(key, None)
+                if doc_number is not None:
+                    removed.append(doc_number)
+            self._hide(removed)
+
+    def remove_numbers(self, doc_numbers):
+        """
+        Hide documents from search by document number, e.g. replaying
+        deletions recorded by index position. A key re-added since keeps its
+        newer document.
+        """
+        with self._lock:
+            removed = [n for n in doc_numbers if n < len(self._doc_keys) and n not in self._deleted]
+            for doc_number in removed:
+                key = self._doc_keys[doc_number]
+                if self._doc_numbers.get(key) == doc_number:
+                    del self._doc_numbers[key]
+            self._hide(removed)
+
+    def restore_numbers(self, doc_numbers):
+        """Make documents hidden by remove_numbers() searchable again."""
+        with self._lock:
+            restored = [n for n in doc_numbers if n in self._deleted]
+            for doc_number in restored:
+                key = self._doc_keys[doc_number]
+                if self._doc_numbers.get(key, -1) < doc_number:
+                    self._doc_numbers[key] = doc_number
+            self._deleted.difference_update(restored)
+            self._total_length += sum(self._doc_lengths[n] for n in restored)
+            self._deleted_array = np.setdiff1d(self._deleted_array, np.array(restored, dtype=np.uint32))
+
+    def set_deleted(self, doc_numbers):
+        """Hide exactly these document numbers, e.g. to match a docstore after loading."""
+        doc_numbers = set(doc_numbers)
+        self.restore_numbers(sorted(self._deleted - doc_numbers))
+        self.remove_numbers(sorted(doc_numbers - self._deleted))
+
+    def _hide(self, doc_numbers):
+        doc_numbers = [n for n in dict.fromkeys(doc_numbers) if n not in self._deleted]
+        self._deleted.update(doc_numbers)
+        self._total_length -= sum(self._doc_lengths[n] for n in doc_numbers)
+        self._deleted_array = np.union1d(self._deleted_array, np.array(doc_numbers, dtype=np.uint32))
+
+    def _score_postings(self, terms):
+        """
+        Score the postings of the given terms. Must hold self._lock; the
+        numpy views of the postings arrays are released on return, so
+        later appends can resize those arrays again.
+        """
+        doc_count = len(self._doc_keys) - len(self._deleted)
+        avg_length = self._total_length / doc_count or 1.0
+        doc_lengths = np.frombuffer(self._doc_lengths, dtype=np.uint32)
+
+        matched_docs, matched_scores = [], []
+        for term in terms:
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                continue
+            docs = np.frombuffer(self._postings_docs[term_id], dtype=np.uint32)
+            tfs = np.frombuffer(self._postings_tfs[term_id], dtype=np.uint32).astype(np.float32)
+            doc_freq = len(docs)
+            if self._deleted:
+                doc_freq -= int(np.isin(docs, self._deleted_array, assume_unique=True).sum())
+            idf = math.log(1.0 + (doc_count - doc_freq + 0.5) / (doc_freq + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * doc_lengths[docs] / avg_length)
+            matched_docs.append(docs.copy())
+            matched_scores.append(idf * tfs * (self.k1 + 1.0) / (tfs + norm))
+        return matched_docs, matched_scores
+
+    def search(self, query: str, k: int = 5):
+        """Return up to k (key, score) pairs, best first."""
+        terms = set(tokenize(query))
+        with self._lock:
+            if len(self._doc_keys) == len(self._deleted) or not terms:
+                return []
+            matched_docs, matched_scores = self._score_postings(terms)
+            if not matched_docs:
+                return []
+
+            doc_numbers, inverse = np.unique(np.concatenate(matched_docs), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(matched_scores))
+            if self._deleted:
+                live = ~np.isin(doc_numbers, self._deleted_array, assume_unique=True)
+                doc_numbers, scores = doc_numbers[live], scores[live]
+                if not len(scores):
+                    return []
+
+            top = min(k, len(scores))
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best])]
+            return [(self._doc_keys[doc_numbers[i]], float(scores[i])) for i in best]
+
+    def save(self, path: str):
+        with self._lock:
+            state = {
+                "term_ids": self._term_ids,
+                "postings_docs": self._postings_docs,
+                "postings_tfs": self._postings_tfs,
+                "doc_lengths": self._doc_lengths,
+                "doc_keys": self._doc_keys,
+                "deleted": self._deleted
+            }
+            data = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        index = cls()
+        index._term_ids = state["term_ids"]
+        index._postings_docs = state["postings_docs"]
+        index._postings_tfs = state["postings_tfs"]
+        index._doc_lengths = state["doc_lengths"]
+        index._doc_keys = state["doc_keys"]
+        index._deleted = state.get("deleted", set())
+        index._deleted_array = np.array(sorted(index._deleted), dtype=np.uint32)
+        index._doc_numbers = {key: n for n, key in enumerate(index._doc_keys) if n not in index._deleted}
+        doc_lengths = np.frombuffer(index._doc_lengths, dtype=np.uint32)
+        index._total_length = int(doc_lengths.sum(dtype=np.int64)) - int(doc_lengths[index._deleted_array].sum())
+        return index
+
+
+def reciprocal_rank_fusion(rankings, k: int = 60):
+    """
+    Fuse ranked lists of keys: each key scores sum(1 / (k + rank)) over the
+    lists it appears in. Returns keys best first.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
@@ -0,0 +1,108 @@
+import time
+from contextlib import contextmanager
+from prometheus_client import Counter, Gauge, Histogram
+
+# Pipeline stages with a latency histogram, throughput counter and in-flight gauge
+STAGES = (
+    "pdf_extract",    # one task of PDF pages, in a worker process
+    "html_clean",     # one page's HTML to text, in a worker process
+    "chunk",          # one split of a page or text segment into chunks
+    "embed",          # one batch of chunk texts not in the embedding cache
+    "embed_query",    # one batch of query texts
+    "index_add",      # adding a batch of vectors to FAISS and BM25
+    "index_save",     # persisting the index after a change
+    "retrieve",       # one retrieval call, cache hits included
+    "llm_generate",   # one LLM answer, streamed or not
+)
+
+# 1 ms up to 2 minutes, covering both per-batch stages and LLM calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+STAGE_LATENCY = Histogram(
+    "rag_stage_latency_seconds", "Latency of one call of a pipeline stage", ["stage"], buckets=LATENCY_BUCKETS
+)
+STAGE_ITEMS = Counter(
+    "rag_stage_items_total", "Items processed by a pipeline stage (pages, chunks, vectors, queries, answers)", ["stage"]
+)
+STAGE_ERRORS = Counter("rag_stage_errors_total", "Pipeline stage calls that raised", ["stage"])
+STAGE_IN_FLIGHT = Gauge("rag_stage_in_flight", "Pipeline stage calls submitted or running", ["stage"])
+
+INGEST_JOBS_IN_FLIGHT = Gauge("rag_ingest_jobs_in_flight", "Ingestion jobs running")
+INGEST_JOBS = Counter("rag_ingest_jobs_total", "Finished ingestion jobs", ["kind", "status"])
+INGEST_ITEMS = Counter("rag_ingest_items_total", "Ingested PDFs and URLs by outcome", ["kind", "outcome"])
+
+HTTP_REQUESTS = Counter("rag_http_requests_total", "HTTP requests served", ["method", "route", "status"])
+HTTP_LATENCY = Histogram(
+    "rag_http_request_duration_seconds", "HTTP request latency", ["method", "route"], buckets=LATENCY_BUCKETS
+)
+HTTP_IN_FLIGHT = Gauge("rag_http_requests_in_flight", "HTTP requests being served")
+
+CONTEXT_TOKENS = Counter(
+    "rag_context_tokens_total", "Context tokens of retrieved chunks and of the packed prompt context", ["kind"]
+)
+
+# Corpus size; the API wires these to the vector store at scrape time
+CORPUS_VECTORS = Gauge("rag_corpus_vectors", "Live vectors in the loaded collections")
+CORPUS_DOCUMENTS = Gauge("rag_corpus_documents", "Stored sources (PDFs and URLs) in the loaded collections")
+
+COLLECTIONS_LOADED = Gauge("rag_collections_loaded", "Collections loaded in memory")
+COLLECTION_MEMORY_BYTES = Gauge("rag_collection_memory_bytes", "Estimated memory of the loaded collections")
+COLLECTION_LOADS = Counter("rag_collection_loads_total", "Collections loaded from disk")
+COLLECTION_EVICTIONS = Counter("rag_collection_evictions_total", "Idle collections unloaded to stay within the memory budget")
+
+# Export every stage from the first scrape, before it has seen traffic
+for _stage in STAGES:
+    STAGE_LATENCY.labels(_stage)
+    STAGE_ITEMS.labels(_stage)
+    STAGE_ERRORS.labels(_stage)
+    STAGE_IN_FLIGHT.labels(_stage)
+
+
+@contextmanager
+def track_stage(stage: str, items: int = 0):
+    """
+    Time a stage call running in this process, counting it as in flight
+    meanwhile, and add `items` to its throughput counter if it succeeds.
+    """
+    STAGE_IN_FLIGHT.labels(stage).inc()
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    else:
+        if items:
+            STAGE_ITEMS.labels(stage).inc(items)
+    finally:
+        STAGE_LATENCY.labels(stage).observe(time.perf_counter() - start)
+        STAGE_IN_FLIGHT.labels(stage).dec()
+
+
+def count_items(stage: str, items: int):
+    """Add to a stage's throughput counter when the count is only known afterwards."""
+    if items:
+        STAGE_ITEMS.labels(stage).inc(items)
+
+
+def stage_submitted(stage: str):
+    """Count a stage call handed to a worker process as in flight."""
+    STAGE_IN_FLIGHT.labels(stage).inc()
+
+
+def stage_completed(stage: str, seconds: float = None, items: int = 0, failed: bool = False):
+    """Record a stage call timed in a worker process, once its result is back."""
+    STAGE_IN_FLIGHT.labels(stage).dec()
+    if failed:
+        STAGE_ERRORS.labels(stage).inc()
+        return
+    STAGE_LATENCY.labels(stage).observe(seconds)
+    if items:
+        STAGE_ITEMS.labels(stage).inc(items)
+
+
+def timed(func, *args):
+    """Run func(*args) and return (result, seconds); picklable for worker processes."""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
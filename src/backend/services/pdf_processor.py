@@ -1,27 +1,115 @@
 import os
-from langchain_community.document_loaders import PyPDFLoader
+import uuid
+import asyncio
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pypdf import PdfReader
+from .content_cache import get_cached_pages, cache_pages
+from .uploads import save_stream, stored_name
+from .metrics import track_stage, stage_submitted, stage_completed, timed, STAGE_IN_FLIGHT
 
 PDF_DIR = "backend/data/pdfs"
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
 
 
 os.makedirs(PDF_DIR, exist_ok=True)
 
-async def save_and_extract_pdf(file):
+# Shared across uploads so worker processes are only started once
+_process_pool = None
+
+async def save_pdf_upload(file, directory: str = PDF_DIR):
     """
-        Save and extract text from a PDF file.
+        Save an uploaded PDF file to directory under its hash and filename,
+        streamed to disk with the size limit enforced and the hash computed
+        on the way. Returns the saved path and the file's content hash.
     """
 
-    file_path = os.path.join(PDF_DIR, file.filename)
+    os.makedirs(directory, exist_ok=True)
+    name = os.path.basename(file.filename)
+    temp_path = os.path.join(directory, f"{uuid.uuid4().hex}.upload")
+
+    # Copy from the framework's spooled temporary file off the event loop,
+    # then name the file once its hash is known
+    _, file_hash = await asyncio.to_thread(save_stream, file.file, temp_path, file.filename)
+    file_path = os.path.join(directory, stored_name(file_hash, name))
+    os.replace(temp_path, file_path)
+
+    return file_path, file_hash
+
+def _extract_page_range(file_path: str, start: int, end: int):
+    """
+        Extract pages [start, end) in a worker process.
+        Returns a list of (page_number, text) with 1-based page numbers.
+    """
+    reader = PdfReader(file_path)
+    return [(n + 1, reader.pages[n].extract_text() or "") for n in range(start, end)]
 
-    # Read file content asynchronously
-    content = await file.read()
-    
-    with open(file_path, "wb") as f:
-        f.write(content)
+def _get_process_pool():
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=PDF_EXTRACT_WORKERS)
+    return _process_pool
 
-    loader = PyPDFLoader(file_path)
-    documents = loader.load()
+def _extract_pages(file_path: str):
+    """
+        Yield (page_number, text) in page order. Page ranges are extracted in
+        parallel, but only a bounded window of ranges is in flight so memory
+        does not grow with document size.
+    """
+    page_count = len(PdfReader(file_path).pages)
+    ranges = [
+        (start, min(start + PDF_PAGES_PER_TASK, page_count))
+        for start in range(0, page_count, PDF_PAGES_PER_TASK)
+    ]
 
-    full_text = "\n".join([doc.page_content for doc in documents])
+    if PDF_EXTRACT_WORKERS <= 1 or len(ranges) <= 1:
+        for start, end in ranges:
+            with track_stage("pdf_extract", items=end - start):
+                pages = _extract_page_range(file_path, start, end)
+            yield from pages
+        return
+
+    pool = _get_process_pool()
+    pending = deque()
+    remaining = iter(ranges)
+
+    def submit(start, end):
+        stage_submitted("pdf_extract")
+        pending.append(pool.submit(timed, _extract_page_range, file_path, start, end))
+
+    for start, end in remaining:
+        submit(start, end)
+        if len(pending) >= PDF_EXTRACT_WORKERS * 2:
+            break
+
+    try:
+        while pending:
+            future = pending.popleft()
+            try:
+                pages, seconds = future.result()
+            except Exception:
+                stage_completed("pdf_extract", failed=True)
+                raise
+            stage_completed("pdf_extract", seconds, items=len(pages))
+            next_range = next(remaining, None)
+            if next_range is not None:
+                submit(*next_range)
+            yield from pages
+    finally:
+        # Tasks abandoned by an error or a closed generator are no longer in flight
+        for future in pending:
+            future.cancel()
+            STAGE_IN_FLIGHT.labels("pdf_extract").dec()
+
+def iter_pdf_pages(file_path: str, file_hash: str):
+    """
+        Stream (page_number, text) from a saved PDF file. Pages already
+        extracted from identical bytes are served from the cache without
+        re-parsing.
+    """
+    cached_pages = get_cached_pages(file_hash)
+    if cached_pages is not None:
+        return cached_pages
 
-    return full_text
\ No newline at end of file
+    return cache_pages(file_hash, _extract_pages(file_path))
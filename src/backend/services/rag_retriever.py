@@ -1,9 +1,124 @@
-from .vector_store import get_vector_store
+import os
+import numpy as np
+from .embeddings import get_embedding_model, embed_queries, get_embedding_version
+from .vector_store import use_collection
+from .lexical_index import reciprocal_rank_fusion
+from .lru_cache import LRUCache
+from .metrics import track_stage
 
-def retrieve_relevant_chunks(query: str, top_k: int = 5):
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "10000"))
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "10000"))
+
+# "vector" (dense only), "lexical" (BM25 only) or "hybrid" (both, fused with RRF)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector")
+RETRIEVAL_MODES = ("vector", "lexical", "hybrid")
+# Candidates taken from each search before fusion, and the RRF rank constant
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "50"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Query vectors are keyed by the embedding version, since TF-IDF query
+# vectors depend on corpus statistics, and results also by the collection and
+# its corpus version. Stale entries are never matched and age out of the LRU.
+query_embedding_cache = LRUCache(QUERY_EMBEDDING_CACHE_SIZE)
+retrieval_cache = LRUCache(RETRIEVAL_CACHE_SIZE)
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+def embed_query(query: str):
+    """
+    Embed a query with the process-wide embedding model, reusing the vector
+    of an identical normalized query
     """
-    Retrieve top-k relevant chunks for a query
+    normalized = normalize_query(query)
+    key = (normalized, get_embedding_version())
+    embedding = query_embedding_cache.get(key)
+    if embedding is None:
+        with track_stage("embed_query", items=1):
+            embedding = get_embedding_model().embed_query(normalized)
+        query_embedding_cache.put(key, embedding)
+    return embedding
+
+def _embed_normalized_queries(queries):
+    """Embed normalized queries, batching the ones not in the embedding cache"""
+    embedding_version = get_embedding_version()
+    vectors = [query_embedding_cache.get((query, embedding_version)) for query in queries]
+    to_embed = [i for i, vector in enumerate(vectors) if vector is None]
+    if to_embed:
+        with track_stage("embed_query", items=len(to_embed)):
+            new_vectors = embed_queries([queries[i] for i in to_embed])
+        for i, vector in zip(to_embed, new_vectors):
+            vectors[i] = vector
+            query_embedding_cache.put((queries[i], embedding_version), vector)
+    return np.vstack(vectors)
+
+def _check_mode(mode: str):
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode '{mode}', expected one of {RETRIEVAL_MODES}")
+
+def _search(queries, top_k: int, mode: str, store):
     """
-    vector_store = get_vector_store()
-    docs = vector_store.similarity_search(query, k=top_k)
-    return docs
+    Rank documents of a loaded collection store for normalized queries. Dense
+    search for all queries is one FAISS call; in hybrid mode each query's
+    dense and BM25 candidates are fused with reciprocal rank fusion.
+    """
+    candidates = top_k if mode == "vector" else max(top_k, HYBRID_CANDIDATES)
+    if mode == "lexical":
+        dense_rankings = [[] for _ in queries]
+    else:
+        dense_rankings = store.vector_search_ids(_embed_normalized_queries(queries), k=candidates)
+
+    results = []
+    for query, dense_ids in zip(queries, dense_rankings):
+        if mode == "vector":
+            ids = dense_ids
+        elif mode == "lexical":
+            ids = store.lexical_search_ids(query, k=top_k)
+        else:
+            ids = reciprocal_rank_fusion([dense_ids, store.lexical_search_ids(query, k=candidates)], k=RRF_K)
+        results.append(store.get_documents(ids[:top_k]))
+    return results
+
+def retrieve_relevant_chunks(query: str, top_k: int = 5, mode: str = None, collection: str = None):
+    """
+    Retrieve top-k relevant chunks for a query from a collection (the
+    default one if not given)
+    """
+    mode = mode or RETRIEVAL_MODE
+    _check_mode(mode)
+    with track_stage("retrieve", items=1), use_collection(collection) as store:
+        normalized = normalize_query(query)
+        key = (normalized, top_k, mode, store.name, store.version, get_embedding_version())
+        docs = retrieval_cache.get(key)
+        if docs is None:
+            docs = _search([normalized], top_k, mode, store)[0]
+            retrieval_cache.put(key, docs)
+    return list(docs)
+
+def retrieve_relevant_chunks_batch(queries, top_k: int = 5, mode: str = None, collection: str = None):
+    """
+    Retrieve top-k relevant chunks for many queries from one collection.
+    Uncached queries are embedded as one matrix and searched with a single
+    FAISS call.
+    """
+    mode = mode or RETRIEVAL_MODE
+    _check_mode(mode)
+    with track_stage("retrieve", items=len(queries)), use_collection(collection) as store:
+        state = (store.name, store.version, get_embedding_version())
+        normalized = [normalize_query(query) for query in queries]
+        results = [retrieval_cache.get((key, top_k, mode) + state) for key in normalized]
+
+        pending = sorted({key for key, docs in zip(normalized, results) if docs is None})
+        if pending:
+            found = dict(zip(pending, _search(pending, top_k, mode, store)))
+            for key, docs in found.items():
+                retrieval_cache.put((key, top_k, mode) + state, docs)
+            results = [docs if docs is not None else found[key] for key, docs in zip(normalized, results)]
+
+    return [list(docs) for docs in results]
+
+def get_cache_stats():
+    return {
+        "query_embeddings": query_embedding_cache.stats(),
+        "retrieval_results": retrieval_cache.stats()
+    }
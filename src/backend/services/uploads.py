@@ -0,0 +1,241 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+
+# Partial resumable uploads and their metadata
+UPLOAD_DIR = "backend/data/uploads"
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "200"))
+MAX_UPLOAD_BYTES = MAX_UPLOAD_MB * 1024 * 1024
+# Bytes read, hashed and written at a time; bounds memory per upload
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_KB", "1024")) * 1024
+# Resumable uploads idle for longer than this are deleted
+UPLOAD_EXPIRE_SECONDS = float(os.getenv("UPLOAD_EXPIRE_SECONDS", "86400"))
+
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+logger = logging.getLogger(__name__)
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class UploadOffsetMismatch(ValueError):
+    """A chunk was sent for an offset other than the bytes received so far."""
+    def __init__(self, offset: int):
+        super().__init__(f"Expected a chunk at offset {offset}")
+        self.offset = offset
+
+
+def _too_large(name: str) -> UploadTooLarge:
+    return UploadTooLarge(f"File '{name}' exceeds {MAX_UPLOAD_MB}MB limit")
+
+
+def stored_name(file_hash: str, name: str) -> str:
+    """File name an uploaded file is kept under; uploads sharing a name never replace each other."""
+    return f"{file_hash[:16]}-{name}"
+
+
+def save_stream(source, file_path: str, name: str = None, max_bytes: int = MAX_UPLOAD_BYTES):
+    """
+    Copy a binary file object to file_path in pieces, hashing it and failing
+    past max_bytes. Returns (size, sha256).
+    """
+    part_path = f"{file_path}.{uuid.uuid4().hex}.part"
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with open(part_path, "wb") as f:
+            while True:
+                piece = source.read(UPLOAD_CHUNK_BYTES)
+                if not piece:
+                    break
+                size += len(piece)
+                if size > max_bytes:
+                    raise _too_large(name or os.path.basename(file_path))
+                hasher.update(piece)
+                f.write(piece)
+        os.replace(part_path, file_path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return size, hasher.hexdigest()
+
+
+# ---------------------------
+# Resumable uploads
+# ---------------------------
+# upload ID -> {"lock", "hasher"}; the hasher covers the bytes on disk and is
+# rebuilt from the partial file after a restart or a failed chunk
+_state = {}
+
+
+def _meta_path(upload_id: str) -> str:
+    return os.path.join(UPLOAD_DIR, f"{upload_id}.json")
+
+
+def _part_path(upload_id: str) -> str:
+    return os.path.join(UPLOAD_DIR, f"{upload_id}.part")
+
+
+def _read_meta(upload_id: str):
+    # IDs are generated hex strings; anything else cannot name an upload
+    if not upload_id.isalnum():
+        return None
+    try:
+        with open(_meta_path(upload_id)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _describe(meta):
+    return {**meta, "offset": os.path.getsize(_part_path(meta["upload_id"])), "max_bytes": MAX_UPLOAD_BYTES,
+            "chunk_bytes": UPLOAD_CHUNK_BYTES}
+
+
+def _remove(upload_id: str):
+    _state.pop(upload_id, None)
+    for path in (_part_path(upload_id), _meta_path(upload_id)):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _expire_stale():
+    now = time.time()
+    for name in os.listdir(UPLOAD_DIR):
+        upload_id, ext = os.path.splitext(name)
+        if ext != ".json":
+            continue
+        part_path = _part_path(upload_id)
+        last_write = os.path.getmtime(part_path if os.path.exists(part_path) else os.path.join(UPLOAD_DIR, name))
+        if now - last_write > UPLOAD_EXPIRE_SECONDS:
+            logger.info(f"Removing expired upload {upload_id}")
+            _remove(upload_id)
+
+
+def create_upload(filename: str, size: int = None, sha256: str = None, collection: str = None):
+    """
+    Start a resumable upload; `size` and `sha256` are checked when it
+    completes. Returns its description, with `upload_id` and `offset`.
+    """
+    name = os.path.basename(filename or "")
+    if name in ("", ".", ".."):
+        raise ValueError(f"Invalid filename '{filename}'")
+    if size is not None and size > MAX_UPLOAD_BYTES:
+        raise _too_large(name)
+    _expire_stale()
+
+    meta = {
+        "upload_id": uuid.uuid4().hex,
+        "filename": name,
+        "size": size,
+        "sha256": sha256.lower() if sha256 else None,
+        "collection": collection,
+        "created_at": time.time()
+    }
+    open(_part_path(meta["upload_id"]), "wb").close()
+    with open(_meta_path(meta["upload_id"]), "w") as f:
+        json.dump(meta, f)
+    return _describe(meta)
+
+
+def get_upload(upload_id: str):
+    """Description of a resumable upload, with the bytes received so far as `offset`; None if unknown."""
+    meta = _read_meta(upload_id)
+    return _describe(meta) if meta is not None else None
+
+
+def _rehash(path: str):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for piece in iter(lambda: f.read(UPLOAD_CHUNK_BYTES), b""):
+            hasher.update(piece)
+    return hasher
+
+
+def _append(path: str, data: bytes):
+    with open(path, "ab") as f:
+        f.write(data)
+
+
+async def append_upload(upload_id: str, offset: int, chunks):
+    """
+    Append an async stream of byte pieces to a resumable upload at `offset`.
+    Returns the description with the new offset.
+    """
+    meta = _read_meta(upload_id)
+    if meta is None:
+        raise KeyError(upload_id)
+    state = _state.setdefault(upload_id, {"lock": asyncio.Lock(), "hasher": None})
+    path = _part_path(upload_id)
+    limit = min(MAX_UPLOAD_BYTES, meta["size"] or MAX_UPLOAD_BYTES)
+
+    async with state["lock"]:
+        current = os.path.getsize(path)
+        if offset != current:
+            raise UploadOffsetMismatch(current)
+        if state["hasher"] is None:
+            state["hasher"] = await asyncio.to_thread(_rehash, path)
+
+        size = current
+        buffer = bytearray()
+        try:
+            async for piece in chunks:
+                size += len(piece)
+                if size > limit:
+                    raise _too_large(meta["filename"])
+                buffer += piece
+                if len(buffer) >= UPLOAD_CHUNK_BYTES:
+                    data, buffer = bytes(buffer), bytearray()
+                    state["hasher"].update(data)
+                    await asyncio.to_thread(_append, path, data)
+            if buffer:
+                data = bytes(buffer)
+                state["hasher"].update(data)
+                await asyncio.to_thread(_append, path, data)
+        except BaseException:
+            os.truncate(path, offset)
+            state["hasher"] = None
+            raise
+
+    return _describe(meta)
+
+
+async def complete_upload(upload_id: str, target_dir: str):
+    """
+    Check a resumable upload's size and hash and move the file to
+    target_dir. Returns (file path, sha256).
+    """
+    meta = _read_meta(upload_id)
+    if meta is None:
+        raise KeyError(upload_id)
+    state = _state.setdefault(upload_id, {"lock": asyncio.Lock(), "hasher": None})
+    path = _part_path(upload_id)
+
+    async with state["lock"]:
+        received = os.path.getsize(path)
+        if meta["size"] is not None and received != meta["size"]:
+            raise UploadOffsetMismatch(received)
+        hasher = state["hasher"] or await asyncio.to_thread(_rehash, path)
+        file_hash = hasher.hexdigest()
+        if meta["sha256"] and file_hash != meta["sha256"]:
+            raise ValueError(f"SHA-256 mismatch for '{meta['filename']}': received {file_hash}")
+
+        os.makedirs(target_dir, exist_ok=True)
+        file_path = os.path.join(target_dir, stored_name(file_hash, meta["filename"]))
+        os.replace(path, file_path)
+        _remove(upload_id)
+    return file_path, file_hash
+
+
+def abort_upload(upload_id: str) -> bool:
+    if _read_meta(upload_id) is None:
+        return False
+    _remove(upload_id)
+    return True
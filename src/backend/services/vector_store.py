@@ -1,39 +1,1352 @@
+import os
+import re
+import json
+import time
+import uuid
+import logging
+import shutil
+import itertools
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import faiss
+import numpy as np
 from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_core.documents import Document
-from .embeddings import get_embedding_model
+from .embeddings import (
+    get_embedding_model, describe_embedding_model, load_embedding_state, save_embedding_state, reset_embedding_state,
+    count_documents
+)
+from .content_cache import EmbeddingCache, hash_text
+from .chunk_store import get_chunk_store
+from .lexical_index import BM25Index, tokenize
+from .metrics import track_stage, COLLECTION_LOADS, COLLECTION_EVICTIONS
+from .ann_index import (
+    new_index, build_index, target_layout, needs_rebuild, apply_search_params, describe_index,
+    index_encoding, reconstruct_vectors, rerank, search_index, is_trained_layout, PositionFilter, RERANK_EXACT,
+    RERANK_FACTOR
+)
 
-# Global FAISS store (in-memory for now)
-vector_store = None
+logger = logging.getLogger(__name__)
 
-def create_or_load_vector_store(chunks):
+INDEX_DIR = "backend/data/index"
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "docstore.jsonl"
+LEXICAL_INDEX_FILE = "lexical.pkl"
+VECTOR_LOG_FILE = "vectors.log"
+# Names the files of a collection's current snapshot generation
+MANIFEST_FILE = "manifest.json"
+# The default collection lives directly under INDEX_DIR, named ones below this
+COLLECTIONS_DIR = os.path.join(INDEX_DIR, "collections")
+os.makedirs(INDEX_DIR, exist_ok=True)
+
+DEFAULT_COLLECTION = "default"
+_COLLECTION_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# Deleted vectors stay in the index, hidden from search, until they exceed
+# this fraction of it; the index is then rebuilt without them
+COMPACT_DELETED_FRACTION = float(os.getenv("COMPACT_DELETED_FRACTION", "0.2"))
+# Idle collections are unloaded, least recently used first, while the loaded
+# ones take more than this (estimated from their index, docstore and BM25 files)
+COLLECTION_MEMORY_BUDGET_MB = int(os.getenv("COLLECTION_MEMORY_BUDGET_MB", "4096"))
+# Vectors added since the last index snapshot are appended to a vector log
+# and replayed on load; a new snapshot generation is written once the log
+# holds more than this fraction of the snapshot's vectors
+INDEX_LOG_MERGE_FRACTION = float(os.getenv("INDEX_LOG_MERGE_FRACTION", "0.25"))
+
+# Collection files by kind; generation 0 uses these names, later ones add
+# the generation number, e.g. index.3.faiss
+_COLLECTION_FILES = {
+    "index": INDEX_FILE,
+    "docstore": DOCSTORE_FILE,
+    "lexical": LEXICAL_INDEX_FILE,
+    "vector_log": VECTOR_LOG_FILE
+}
+_COLLECTION_FILE_NAME = re.compile(
+    r"^(?:index(?:\.\d+)?\.faiss|docstore(?:\.\d+)?\.jsonl|lexical(?:\.\d+)?\.pkl|vectors(?:\.\d+)?\.log"
+    r"|manifest\.json)(?:\.tmp)?$"
+)
+# A vector log starts with the index position of its first vector and the
+# dimension (two int64), followed by float32 vectors
+_VECTOR_LOG_HEADER_BYTES = 16
+
+# Loaded collections, least recently used first
+_collections = OrderedDict()
+_registry_lock = threading.Lock()
+_cache_lock = threading.Lock()
+# Corpus versions are unique across collections and reloads, so a cache
+# entry tagged with one never matches a different state of any collection
+_versions = itertools.count(1)
+# Embedding cache for the active model, and the model it was opened for
+_embedding_cache = None
+_embedding_cache_namespace = None
+# The embedding model is shared by all collections; its fitted state is
+# restored once, before the first collection loads
+_embedding_state_loaded = False
+# Index rebuilds and compactions run here, off the request path, one at a time
+_maintenance = ThreadPoolExecutor(max_workers=1, thread_name_prefix="index-maintenance")
+# Runtime overrides of IVF nprobe / HNSW efSearch; None uses the env defaults
+_search_params = {"nprobe": None, "ef_search": None}
+
+
+def validate_collection_name(name: str) -> str:
+    if not _COLLECTION_NAME.match(name or ""):
+        raise ValueError(f"Invalid collection name '{name}': use 1-64 letters, digits, '_' or '-'")
+    return name
+
+
+def collection_dir(collection: str, base: str = INDEX_DIR) -> str:
+    """Directory under `base` holding a collection's files."""
+    if collection == DEFAULT_COLLECTION:
+        return base
+    return os.path.join(base, "collections", collection)
+
+
+def _rss_bytes():
+    """Current resident set size of this process, or None if unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _read_index(path):
+    """
+    Read a FAISS index with memory-mapped I/O, falling back to a normal read
+    for index types or FAISS builds that cannot be mapped.
+    """
+    mmap_flags = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+    try:
+        return faiss.read_index(path, mmap_flags), True
+    except RuntimeError:
+        return faiss.read_index(path), False
+
+
+def _file_bytes(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def _generation_file(name: str, generation: int) -> str:
+    if not generation:
+        return name
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{generation}{ext}"
+
+
+def _read_manifest(directory: str):
+    """
+    A collection's manifest: its snapshot generation and the file of each
+    kind. Stores written before manifests existed are generation 0.
+    """
+    path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {"generation": 0, "files": dict(_COLLECTION_FILES)}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _collection_bytes(directory: str):
+    return sum(_file_bytes(os.path.join(directory, file)) for file in _read_manifest(directory)["files"].values())
+
+
+def _write_vector_log_header(path, base: int, dim: int):
+    with open(path, "wb") as f:
+        f.write(np.array([base, dim], dtype=np.int64).tobytes())
+
+
+def _read_vector_log(path, start: int, dim: int):
+    """
+    Logged vectors from index position `start` on, as an (n, dim) float32
+    matrix, and the number of complete records in the log.
+    """
+    size = _file_bytes(path)
+    if size < _VECTOR_LOG_HEADER_BYTES:
+        return np.empty((0, dim), dtype=np.float32), 0
+    record_bytes = 4 * dim
+    count = (size - _VECTOR_LOG_HEADER_BYTES) // record_bytes
+    if _VECTOR_LOG_HEADER_BYTES + count * record_bytes != size:
+        os.truncate(path, _VECTOR_LOG_HEADER_BYTES + count * record_bytes)
+    with open(path, "rb") as f:
+        base, log_dim = np.fromfile(f, dtype=np.int64, count=2)
+        if log_dim != dim or base > start:
+            raise ValueError(f"Vector log at {path} (base {base}, dim {log_dim}) does not follow its index "
+                             f"({start} vectors, dim {dim})")
+        # Records before `start` are already in the snapshot
+        skip = min(start - int(base), count)
+        f.seek(skip * record_bytes, os.SEEK_CUR)
+        vectors = np.fromfile(f, dtype=np.float32, count=(count - skip) * dim)
+    return vectors.reshape(-1, dim), count
+
+
+def _ensure_embedding_state():
+    """Restore the fitted embedding model before anything embeds a query."""
+    global _embedding_state_loaded
+
+    with _cache_lock:
+        if not _embedding_state_loaded:
+            load_embedding_state(INDEX_DIR)
+            _embedding_state_loaded = True
+
+
+def _get_embedding_cache():
+    """Embedding cache for the active embedding model."""
+    global _embedding_cache, _embedding_cache_namespace
+
+    namespace = describe_embedding_model()["model"]
+    with _cache_lock:
+        if _embedding_cache is None or _embedding_cache_namespace != namespace:
+            _embedding_cache = EmbeddingCache(namespace)
+            _embedding_cache_namespace = namespace
+        return _embedding_cache
+
+
+def _exact_vectors(store, positions):
+    """Float32 vectors for index positions, from the embedding cache where possible."""
+    hashes = [store.docstore.search(store.index_to_docstore_id[int(position)]).metadata.get("content_hash")
+              for position in positions]
+    cached = _get_embedding_cache().get_many([h for h in hashes if h])
+    vectors = np.empty((len(hashes), store.index.d), dtype=np.float32)
+    missing = []
+    for row, content_hash in enumerate(hashes):
+        vector = cached.get(content_hash)
+        if vector is None:
+            missing.append(row)
+        else:
+            vectors[row] = vector
+    if missing:
+        vectors[missing] = reconstruct_vectors(store.index, [positions[row] for row in missing])
+    return vectors
+
+
+class _ReadWriteLock:
+    """Exclusive when used as a context manager; reading() is shared. Waiting writers go first."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def reading(self):
+        with self._condition:
+            while self._writing or self._writers_waiting:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    def __enter__(self):
+        with self._condition:
+            self._writers_waiting += 1
+            while self._writing or self._readers:
+                self._condition.wait()
+            self._writers_waiting -= 1
+            self._writing = True
+
+    def __exit__(self, *exc):
+        with self._condition:
+            self._writing = False
+            self._condition.notify_all()
+
+
+def _chunk_key(source, content_hash):
+    """Docstore ID of a chunk: the same text under the same source is one entry."""
+    return hash_text(f"{source}\n{content_hash}")
+
+
+def chunk_key(source: str, text: str):
+    """Docstore ID a chunk of this text from this source is stored under."""
+    return _chunk_key(source, hash_text(text))
+
+
+class CollectionStore:
     """
-    Create FAISS vector store from document chunks
+    One named collection: a FAISS store and BM25 index over its chunks,
+    persisted under its own directory and loaded on first use.
     """
-    global vector_store
+    def __init__(self, name: str):
+        self.name = name
+        self.directory = collection_dir(name)
+        # Snapshot generation and the paths of its files, from the manifest
+        self._use_generation(0, _COLLECTION_FILES)
+
+        # FAISS store, and a BM25 index over the same chunks keyed by docstore ID
+        self.vector_store = None
+        self.lexical_index = BM25Index()
+        # True while the index is a read-only memory map of index_path
+        self._index_is_mmapped = False
+        # Number of index positions already appended to docstore_path
+        self._persisted_count = 0
+        # Vectors in the index snapshot file and in the vector log after it,
+        # and arrays of vectors added since, in position order
+        self._snapshot_count = 0
+        self._logged_count = 0
+        self._unlogged = []
+        # True once positions were renumbered, so the next generation needs a fresh docstore
+        self._docstore_snapshot_pending = False
+        # Vectors the current index was trained on (0 for untrained layouts),
+        # and whether a rebuild is queued on the maintenance thread
+        self._trained_vectors = 0
+        self._rebuild_scheduled = False
+        # Figures from the last load()
+        self.load_stats = {}
+        self.loaded = False
+        self._load_lock = threading.Lock()
+        # Serializes writers (add + save) against each other
+        self._write_lock = threading.Lock()
+        # Held exclusively while the FAISS index or docstore is mutated and
+        # shared by searches, which FAISS runs without the GIL
+        self._index_lock = _ReadWriteLock()
+        # Bumped on every change to the stored corpus; caches tag entries with it
+        self.version = next(_versions)
+        # Index positions of deleted chunks, and the search filter hiding them
+        self._deleted_positions = set()
+        self._position_filter = None
+        # Chunks added by replace_source() transactions that have not
+        # committed yet, hidden from search: position -> transaction ID, and
+        # transaction ID -> [(docstore ID, position, text)]
+        self._pending_positions = {}
+        self._pending = {}
+        # Docstore ID -> index position, and source -> docstore IDs, for live chunks
+        self._key_positions = {}
+        self._source_keys = {}
+        # (texts, +1/-1) of chunks added or hidden but not yet counted into the
+        # shared embedding statistics; flushed by _persist_changes()
+        self._uncounted = []
+        # Chunk store IDs no longer referenced by the collection; flushed by _persist_changes()
+        self._discarded = []
+        # Requests currently using the collection; it is never unloaded while > 0
+        self.active = 0
+        # Estimated resident size, from the persisted files
+        self.memory_bytes = 0
+
+    def _use_generation(self, generation: int, files):
+        self.generation = generation
+        self.files = dict(files)
+        self.index_path = os.path.join(self.directory, self.files["index"])
+        self.docstore_path = os.path.join(self.directory, self.files["docstore"])
+        self.lexical_index_path = os.path.join(self.directory, self.files["lexical"])
+        self.vector_log_path = os.path.join(self.directory, self.files["vector_log"])
+
+    def _ensure_writable(self):
+        """Swap a read-only memory-mapped index for an in-memory copy before the first add."""
+        if self._index_is_mmapped:
+            self.vector_store.index = faiss.read_index(self.index_path)
+            apply_search_params(self.vector_store.index, **_search_params)
+            self._index_is_mmapped = False
+
+    def _live_positions(self):
+        return [p for p in range(self.vector_store.index.ntotal)
+                if p not in self._deleted_positions and p not in self._pending_positions]
+
+    def _update_position_filter(self):
+        hidden = self._deleted_positions.union(self._pending_positions)
+        self._position_filter = PositionFilter(hidden) if hidden else None
+
+    def _track_chunks(self, keys, positions, docs):
+        for key, position, doc in zip(keys, positions, docs):
+            self._key_positions[key] = position
+            self._source_keys.setdefault(doc.metadata["source"], set()).add(key)
+
+    def _needs_compaction(self):
+        return len(self._deleted_positions) > COMPACT_DELETED_FRACTION * self.vector_store.index.ntotal
+
+    def _rebuild_due(self):
+        store = self.vector_store
+        # Positions must stay put while a replace_source() transaction is open
+        if store is None or self._pending:
+            return False
+        return needs_rebuild(store.index, trained_vectors=self._trained_vectors) or self._needs_compaction()
+
+    def _schedule_rebuild(self):
+        """Queue a rebuild on the maintenance thread if one is due. Must hold _write_lock."""
+        if self._rebuild_scheduled or not self._rebuild_due():
+            return
+        self._rebuild_scheduled = True
+        with _registry_lock:
+            self.active += 1
+        _maintenance.submit(self._run_scheduled_rebuild)
+
+    def _run_scheduled_rebuild(self):
+        try:
+            with self._write_lock:
+                self._rebuild_scheduled = False
+                if self._rebuild_index_if_needed():
+                    with track_stage("index_save"):
+                        self._write_generation([])
+                    self._update_memory_estimate()
+        except Exception:
+            logger.exception("Rebuilding the vector index of collection '%s' failed", self.name)
+        finally:
+            with _registry_lock:
+                self.active -= 1
+
+    def _rebuild_index_if_needed(self):
+        """
+        Rebuild the index when its layout, training or deleted vectors call
+        for it. Must hold _write_lock. Returns True if it was rebuilt.
+        """
+        if not self._rebuild_due():
+            return False
+        store = self.vector_store
+
+        start = time.perf_counter()
+        live = self._live_positions()
+        kind, encoding = target_layout(len(live))
+        if live:
+            index = build_index(_exact_vectors(store, live), kind, encoding)
+        else:
+            index = new_index(store.index.d, kind, encoding)
+        apply_search_params(index, **_search_params)
+
+        compacted = bool(self._deleted_positions)
+        ids = [store.index_to_docstore_id[p] for p in live]
+        if compacted:
+            lexical = BM25Index()
+            lexical.add_many(ids, [tokenize(store.docstore.search(key).page_content) for key in ids])
+
+        with self._index_lock:
+            store.index = index
+            self._trained_vectors = len(live) if is_trained_layout(kind, encoding) else 0
+            self._index_is_mmapped = False
+            if compacted:
+                store.index_to_docstore_id = dict(enumerate(ids))
+                self._key_positions = {key: position for position, key in enumerate(ids)}
+                self.lexical_index = lexical
+                self._deleted_positions.clear()
+                self._position_filter = None
+                self._docstore_snapshot_pending = True
+            self._bump_corpus_version()
+
+        logger.info("Rebuilt vector index of collection '%s' as %s/%s over %d vectors in %.1fs",
+                    self.name, kind, encoding, index.ntotal, time.perf_counter() - start)
+        return True
+
+    def apply_search_params(self):
+        if self.vector_store is not None:
+            with self._index_lock:
+                apply_search_params(self.vector_store.index, **_search_params)
+                self._bump_corpus_version()
+
+    def get_stored_vectors(self):
+        """All live vectors as an (n, dim) float32 matrix, in index order."""
+        return _exact_vectors(self.get_vector_store(), self._live_positions())
+
+    def get_index_info(self):
+        """Type, size and search settings of the current index."""
+        if self.vector_store is None:
+            return {"type": None, "vectors": 0}
+        return describe_index(self.vector_store.index)
+
+    def get_store_stats(self):
+        """Live vector and document counts, and the size of the store on disk."""
+        with self._index_lock:
+            store = self.vector_store
+            stats = {
+                "vectors": (store.index.ntotal - len(self._deleted_positions) - len(self._pending_positions)
+                            if store is not None else 0),
+                "deleted_vectors": len(self._deleted_positions),
+                "pending_vectors": len(self._pending_positions),
+                "trained_vectors": self._trained_vectors,
+                "documents": len(self._source_keys),
+                "index": describe_index(store.index) if store is not None else None
+            }
+        stats.update(
+            generation=self.generation,
+            index_bytes=_file_bytes(self.index_path),
+            vector_log_bytes=_file_bytes(self.vector_log_path),
+            docstore_bytes=_file_bytes(self.docstore_path),
+            lexical_index_bytes=_file_bytes(self.lexical_index_path)
+        )
+        return stats
+
+    def _update_memory_estimate(self):
+        self.memory_bytes = _collection_bytes(self.directory)
+
+    def _docstore_line(self, position):
+        doc_id = self.vector_store.index_to_docstore_id[position]
+        doc = self.vector_store.docstore.search(doc_id)
+        line = {
+            "position": position,
+            "id": doc_id,
+            "page_content": doc.page_content,
+            "metadata": doc.metadata
+        }
+        if position in self._pending_positions:
+            line["txn"] = self._pending_positions[position]
+        return json.dumps(line) + "\n"
+
+    def _append_docstore(self, f, deleted_positions, commit=None, updated=None):
+        for position in range(self._persisted_count, self.vector_store.index.ntotal):
+            f.write(self._docstore_line(position))
+        if commit is not None:
+            # One line, so a transaction's chunks appear and the ones it
+            # replaces disappear together on load
+            line = {"commit": commit, "deleted": list(deleted_positions)}
+            if updated:
+                line["metadata"] = {str(position): metadata for position, metadata in updated.items()}
+            f.write(json.dumps(line) + "\n")
+        else:
+            for position in deleted_positions:
+                f.write(json.dumps({"position": position, "deleted": True}) + "\n")
+        self._persisted_count = self.vector_store.index.ntotal
+
+    def _log_needs_merge(self):
+        logged = self._logged_count + sum(len(vectors) for vectors in self._unlogged)
+        return not os.path.exists(self.index_path) or logged > INDEX_LOG_MERGE_FRACTION * self._snapshot_count
+
+    def _append_changes(self, deleted_positions, commit=None, updated=None):
+        """Append new docstore entries, deletions and vectors to the docstore and vector log."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.docstore_path, "a", encoding="utf-8") as f:
+            self._append_docstore(f, deleted_positions, commit, updated)
+        if self._unlogged:
+            vectors = np.ascontiguousarray(np.vstack(self._unlogged), dtype=np.float32)
+            if _file_bytes(self.vector_log_path) < _VECTOR_LOG_HEADER_BYTES:
+                _write_vector_log_header(self.vector_log_path, self._snapshot_count, vectors.shape[1])
+            with open(self.vector_log_path, "ab") as f:
+                f.write(vectors.tobytes())
+            self._logged_count += len(vectors)
+            self._unlogged = []
+        save_embedding_state(INDEX_DIR)
+
+    def _write_generation(self, deleted_positions, commit=None, updated=None):
+        """Write the store as a new snapshot generation and switch the manifest to it."""
+        os.makedirs(self.directory, exist_ok=True)
+        store = self.vector_store
+        generation = self.generation + 1
+        files = dict(self.files)
+        mode = "a"
+        if self._docstore_snapshot_pending:
+            files["docstore"] = _generation_file(DOCSTORE_FILE, generation)
+            mode = "w"
+            self._persisted_count = 0
+            deleted_positions = []
+            commit = updated = None
+        with open(os.path.join(self.directory, files["docstore"]), mode, encoding="utf-8") as f:
+            self._append_docstore(f, deleted_positions, commit, updated)
+
+        for kind in ("index", "lexical", "vector_log"):
+            files[kind] = _generation_file(_COLLECTION_FILES[kind], generation)
+        faiss.write_index(store.index, os.path.join(self.directory, files["index"]))
+        self.lexical_index.save(os.path.join(self.directory, files["lexical"]))
+        _write_vector_log_header(os.path.join(self.directory, files["vector_log"]), store.index.ntotal, store.index.d)
+        save_embedding_state(INDEX_DIR)
+
+        manifest_path = os.path.join(self.directory, MANIFEST_FILE)
+        with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"generation": generation, "files": files, "trained_vectors": self._trained_vectors}, f)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+        previous = set(self.files.values())
+        self._use_generation(generation, files)
+        self._snapshot_count = store.index.ntotal
+        self._logged_count = 0
+        self._unlogged = []
+        self._docstore_snapshot_pending = False
+        self._remove_unreferenced_files(previous)
+
+    def _remove_unreferenced_files(self, candidates=None):
+        """Remove collection files the manifest does not name, e.g. left by an interrupted write."""
+        if candidates is None:
+            candidates = os.listdir(self.directory) if os.path.isdir(self.directory) else []
+        referenced = set(self.files.values())
+        for file in candidates:
+            if file not in referenced and _COLLECTION_FILE_NAME.match(file) and file != MANIFEST_FILE:
+                path = os.path.join(self.directory, file)
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def ensure_loaded(self):
+        """
+        Load the persisted collection once; concurrent first users wait for it.
+        Returns True if this call read it from disk.
+        """
+        if self.loaded:
+            return False
+        _ensure_embedding_state()
+        with self._load_lock:
+            if self.loaded:
+                return False
+            self.load()
+            self.loaded = True
+        return bool(self.load_stats.get("loaded"))
+
+    def load(self):
+        """
+        Load the persisted FAISS index and docstore, if any, and return load
+        statistics (wall time, resident memory before/after, index size).
+        """
+        manifest = _read_manifest(self.directory)
+        self._use_generation(manifest["generation"], manifest["files"])
+        if not os.path.exists(self.index_path):
+            self.load_stats = {"loaded": False, "vectors": 0}
+            return self.load_stats
+        self._remove_unreferenced_files()
+
+        start = time.perf_counter()
+        rss_before = _rss_bytes()
+
+        # Vectors logged since the snapshot are added to it, which needs an
+        # in-memory copy; an index with an empty log is memory-mapped
+        if _file_bytes(self.vector_log_path) > _VECTOR_LOG_HEADER_BYTES:
+            index, mmapped = faiss.read_index(self.index_path), False
+        else:
+            index, mmapped = _read_index(self.index_path)
+        snapshot_count = index.ntotal
+        logged, log_records = _read_vector_log(self.vector_log_path, snapshot_count, index.d)
+        if len(logged):
+            index.add(logged)
+
+        entries = {}
+        deleted = set()
+        committed = set()
+        if os.path.exists(self.docstore_path):
+            with open(self.docstore_path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    if "commit" in entry:
+                        committed.add(entry["commit"])
+                        deleted.update(position for position in entry["deleted"] if position < index.ntotal)
+                        for position, metadata in entry.get("metadata", {}).items():
+                            if int(position) in entries:
+                                entries[int(position)]["metadata"] = metadata
+                        continue
+                    if entry["position"] >= index.ntotal:
+                        continue
+                    if entry.get("deleted"):
+                        deleted.add(entry["position"])
+                    else:
+                        entries[entry["position"]] = entry
+        # Chunks of a replace_source() that never committed count as deleted
+        deleted.update(position for position, entry in entries.items()
+                       if "txn" in entry and entry["txn"] not in committed)
+
+        if len(entries) != index.ntotal:
+            raise ValueError(
+                f"Docstore at {self.docstore_path} has {len(entries)} entries "
+                f"but the index holds {index.ntotal} vectors"
+            )
+
+        docstore = InMemoryDocstore({
+            entry["id"]: Document(page_content=entry["page_content"], metadata=entry["metadata"])
+            for position, entry in entries.items() if position not in deleted
+        })
+        index_to_docstore_id = {position: entry["id"] for position, entry in entries.items()}
+
+        lexical = BM25Index.load(self.lexical_index_path) if os.path.exists(self.lexical_index_path) else None
+        if lexical is None or len(lexical) > index.ntotal:
+            # Missing or ahead of the index: rebuild it from the docstore
+            lexical = BM25Index()
+        # It is saved with index snapshots, so catch up on chunks added and
+        # deleted since; document numbers are index positions
+        caught_up = [entries[position] for position in range(len(lexical), index.ntotal)]
+        lexical.add_many(
+            [entry["id"] for entry in caught_up],
+            [tokenize(entry["page_content"]) for entry in caught_up]
+        )
+        lexical.set_deleted(deleted)
 
-    embeddings = get_embedding_model()
+        self.vector_store = FAISS(
+            embedding_function=get_embedding_model(),
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id
+        )
+        self.lexical_index = lexical
+        apply_search_params(index, **_search_params)
+        self._index_is_mmapped = mmapped
+        self._persisted_count = index.ntotal
+        self._snapshot_count = snapshot_count
+        self._logged_count = log_records
+        self._unlogged = []
+        self._docstore_snapshot_pending = False
+        # Indexes saved without it are taken to be trained on what the snapshot holds
+        self._trained_vectors = manifest.get("trained_vectors", snapshot_count)
+        self._rebuild_scheduled = False
+        self._deleted_positions = set(deleted)
+        self._pending_positions = {}
+        self._pending = {}
+        self._update_position_filter()
+        self._key_positions = {}
+        self._source_keys = {}
+        live = [position for position in range(index.ntotal) if position not in deleted]
+        self._track_chunks(
+            [index_to_docstore_id[position] for position in live],
+            live,
+            [docstore.search(index_to_docstore_id[position]) for position in live]
+        )
+        self._bump_corpus_version()
+
+        # INDEX_TYPE may have changed since the index was saved
+        with self._write_lock:
+            self._schedule_rebuild()
+        self._update_memory_estimate()
+
+        rss_after = _rss_bytes()
+        self.load_stats = {
+            "loaded": True,
+            "collection": self.name,
+            "vectors": self.vector_store.index.ntotal,
+            "deleted": len(self._deleted_positions),
+            "mmapped": self._index_is_mmapped,
+            "index": describe_index(self.vector_store.index),
+            "load_seconds": round(time.perf_counter() - start, 3),
+            "generation": self.generation,
+            "logged_vectors": len(logged),
+            "index_bytes": os.path.getsize(self.index_path),
+            "rss_bytes_before": rss_before,
+            "rss_bytes_after": rss_after
+        }
+        return self.load_stats
+
+    def _bump_corpus_version(self):
+        self.version = next(_versions)
+
+    def _is_stored(self, key):
+        return self.vector_store is not None and key in self.vector_store.docstore._dict
 
-    documents = [
-        Document(
-            page_content=chunk["text"],
-            metadata={
+    def _prepare_chunks(self, chunks, skip_stored: bool = True, ingest_id: str = None):
+        """
+        Docstore IDs, metadata, BM25 tokens and vectors for a batch of
+        chunks, deduplicated and optionally skipping stored ones.
+        """
+        texts, metadatas, ids, content_hashes = [], [], [], []
+        seen = set()
+        skipped = []
+        for chunk in chunks:
+            content_hash = hash_text(chunk["text"])
+            key = _chunk_key(chunk["source"], content_hash)
+            if key in seen or (skip_stored and self._is_stored(key)):
+                if "store_id" in chunk:
+                    skipped.append(chunk["store_id"])
+                continue
+            seen.add(key)
+            texts.append(chunk["text"])
+            metadata = {
                 "source": chunk["source"],
                 "chunk_id": chunk["chunk_id"],
-                "chunk_info": chunk.get("chunk_info", f"Chunk {chunk['chunk_id']}")
+                "chunk_info": chunk.get("chunk_info", f"Chunk {chunk['chunk_id']}"),
+                "content_hash": content_hash
             }
-        )
-        for chunk in chunks
-    ]
+            for optional_key in ("page", "store_id"):
+                if optional_key in chunk:
+                    metadata[optional_key] = chunk[optional_key]
+            if ingest_id is not None:
+                metadata["ingest_id"] = ingest_id
+            metadatas.append(metadata)
+            ids.append(key)
+            content_hashes.append(content_hash)
+
+        if skipped:
+            get_chunk_store().discard(skipped)
+
+        prepared = {"texts": texts, "metadatas": metadatas, "ids": ids, "vectors": [], "tokens": []}
+        if not texts:
+            return prepared
+
+        cache = _get_embedding_cache()
+        cached = cache.get_many(content_hashes)
+        missing = [i for i, h in enumerate(content_hashes) if h not in cached]
+        if missing:
+            with track_stage("embed", items=len(missing)):
+                new_vectors = np.asarray(get_embedding_model().embed_documents([texts[i] for i in missing]),
+                                         dtype=np.float32)
+            cache.put_many([content_hashes[i] for i in missing], new_vectors)
+            cached.update(zip((content_hashes[i] for i in missing), new_vectors))
+
+        prepared["vectors"] = [cached[h] for h in content_hashes]
+        prepared["tokens"] = [tokenize(text) for text in texts]
+        return prepared
+
+    def _add_prepared(self, prepared, txn=None, retained=()):
+        """
+        Add prepared chunks not stored yet, hidden until _commit() if txn is
+        given. Must hold _write_lock and _index_lock. Returns how many.
+        """
+        keep = []
+        for i, key in enumerate(prepared["ids"]):
+            if not self._is_stored(key):
+                keep.append(i)
+            elif key not in retained:
+                self._discard_store_ids([prepared["metadatas"][i]])
+        if not keep:
+            return 0
+        text_embeddings = [(prepared["texts"][i], prepared["vectors"][i]) for i in keep]
+        metadatas = [prepared["metadatas"][i] for i in keep]
+        ids = [prepared["ids"][i] for i in keep]
+
+        if self.vector_store is None:
+            dim = len(text_embeddings[0][1])
+            self.vector_store = FAISS(
+                embedding_function=get_embedding_model(),
+                index=new_index(dim, *target_layout(0)),
+                docstore=InMemoryDocstore(),
+                index_to_docstore_id={}
+            )
+            apply_search_params(self.vector_store.index, **_search_params)
+        else:
+            self._ensure_writable()
+        first_position = len(self.vector_store.index_to_docstore_id)
+        with track_stage("index_add", items=len(ids)):
+            self.vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+            self.lexical_index.add_many(ids, [prepared["tokens"][i] for i in keep])
+        self._unlogged.append(np.asarray([prepared["vectors"][i] for i in keep], dtype=np.float32))
+        positions = range(first_position, first_position + len(ids))
+        if txn is not None:
+            self._pending.setdefault(txn, []).extend(
+                zip(ids, positions, (text for text, _ in text_embeddings)))
+            self._pending_positions.update((position, txn) for position in positions)
+            self.lexical_index.remove_numbers(positions)
+            self._update_position_filter()
+            return len(ids)
+        self._uncounted.append(([text for text, _ in text_embeddings], 1))
+        self._track_chunks(ids, positions, map(self.vector_store.docstore.search, ids))
+        return len(ids)
+
+    def _commit(self, txn):
+        """
+        Make the chunks of a transaction searchable. Must hold _write_lock
+        and _index_lock. Returns how many there were.
+        """
+        pending = self._pending.pop(txn, [])
+        for key, position, _ in pending:
+            del self._pending_positions[position]
+        positions = [position for _, position, _ in pending]
+        self.lexical_index.restore_numbers(positions)
+        self._update_position_filter()
+        self._uncounted.append(([text for _, _, text in pending], 1))
+        self._track_chunks([key for key, _, _ in pending], positions,
+                           (self.vector_store.docstore.search(key) for key, _, _ in pending))
+        return len(pending)
+
+    def _abort(self, txn):
+        """Drop the chunks of a transaction that will not commit. Must hold _write_lock and _index_lock."""
+        for key, position, _ in self._pending.pop(txn, []):
+            del self._pending_positions[position]
+            doc = self.vector_store.docstore._dict.pop(key, None)
+            if doc is not None:
+                self._discard_store_ids([doc.metadata])
+            self._deleted_positions.add(position)
+        self._update_position_filter()
+
+    def _hide_keys(self, keys):
+        """
+        Hide stored chunks from search and drop them from the docstore. Must
+        hold _write_lock and _index_lock. Returns their index positions.
+        """
+        positions = [self._key_positions.pop(key) for key in keys]
+        texts = []
+        for key in keys:
+            doc = self.vector_store.docstore._dict.pop(key)
+            texts.append(doc.page_content)
+            self._discard_store_ids([doc.metadata])
+            source_keys = self._source_keys.get(doc.metadata["source"])
+            if source_keys is not None:
+                source_keys.discard(key)
+                if not source_keys:
+                    del self._source_keys[doc.metadata["source"]]
+        self._deleted_positions.update(positions)
+        self._update_position_filter()
+        self.lexical_index.remove(keys)
+        self._uncounted.append((texts, -1))
+        return positions
+
+    def _update_metadata(self, metadatas):
+        """
+        Give stored chunks new metadata, by docstore ID. Must hold _write_lock
+        and _index_lock. Returns {position: metadata} of the chunks changed.
+        """
+        updated = {}
+        docstore = self.vector_store.docstore._dict
+        for key, metadata in metadatas.items():
+            doc = docstore.get(key)
+            if doc is None:
+                self._discard_store_ids([metadata])
+                continue
+            if doc.metadata == metadata:
+                continue
+            if doc.metadata.get("store_id") != metadata.get("store_id"):
+                self._discard_store_ids([doc.metadata])
+            # Replaced rather than changed in place, for readers holding the old one
+            docstore[key] = doc.model_copy(update={"metadata": metadata})
+            updated[self._key_positions[key]] = metadata
+        return updated
+
+    def _discard_store_ids(self, metadatas):
+        """Queue the chunk store entries of chunks the collection dropped."""
+        self._discarded.extend(md["store_id"] for md in metadatas if "store_id" in md)
+
+    def _flush_discarded(self):
+        """
+        Release queued chunk store entries, and compact the chunk store on the
+        maintenance thread once enough of it is unreferenced.
+        """
+        discarded, self._discarded = self._discarded, []
+        if not discarded:
+            return
+        chunk_store = get_chunk_store()
+        chunk_store.discard(discarded)
+        if chunk_store.needs_compaction():
+            _maintenance.submit(chunk_store.compact_if_needed)
+
+    def _persist_changes(self, added: int, deleted_positions, commit=None, updated=None):
+        """
+        Persist chunks just added and/or hidden, and queue any maintenance
+        that became due. Must hold _write_lock.
+        """
+        # Counted here rather than under _index_lock, where searches would wait on it
+        for texts, sign in self._uncounted:
+            count_documents(texts, sign)
+        self._uncounted = []
+        with track_stage("index_save"):
+            if self._log_needs_merge():
+                self._write_generation(deleted_positions, commit, updated)
+            else:
+                self._append_changes(deleted_positions, commit, updated)
+        self._flush_discarded()
+        self._update_memory_estimate()
+        self._schedule_rebuild()
+
+    def add_chunks(self, chunks):
+        """Add document chunks, skipping ones already stored."""
+        prepared = self._prepare_chunks(chunks)
+        if not prepared["ids"]:
+            return self.vector_store
+
+        with self._write_lock:
+            with self._index_lock:
+                added = self._add_prepared(prepared)
+                if added:
+                    self._bump_corpus_version()
+            if added:
+                self._persist_changes(added, [])
+
+        return self.vector_store
+
+    def replace_source(self, source: str, chunks, batch_size: int = 256, on_batch=None):
+        """
+        Atomically replace every stored chunk of a source with `chunks`,
+        added in batches of batch_size. Returns (chunks added, chunks deleted).
+        """
+        txn = uuid.uuid4().hex
+        new_keys = set()
+        added = 0
+        with self._index_lock:
+            old_keys = set(self._source_keys.get(source, ()))
+        # New metadata (chunk_id, page, ...) of the chunks kept from the old version
+        kept = {}
+
+        def add_batch(batch):
+            nonlocal added
+            prepared = self._prepare_chunks(batch, skip_stored=False, ingest_id=txn)
+            new_keys.update(prepared["ids"])
+            for key, metadata in zip(prepared["ids"], prepared["metadatas"]):
+                if key in old_keys:
+                    kept.setdefault(key, metadata)
+            with self._write_lock:
+                with self._index_lock:
+                    batch_added = self._add_prepared(prepared, txn, retained=kept)
+                if batch_added:
+                    self._persist_changes(batch_added, [])
+            added += batch_added
+            if on_batch:
+                on_batch(batch)
+
+        try:
+            batch = []
+            for chunk in chunks:
+                batch.append(chunk)
+                if len(batch) >= batch_size:
+                    add_batch(batch)
+                    batch = []
+            if batch:
+                add_batch(batch)
+
+            with self._write_lock:
+                with self._index_lock:
+                    self._commit(txn)
+                    stale = [key for key in self._source_keys.get(source, ()) if key not in new_keys]
+                    deleted_positions = self._hide_keys(stale) if stale else []
+                    updated = self._update_metadata(kept)
+                    if added or stale or updated:
+                        self._bump_corpus_version()
+                if added or stale or updated:
+                    self._persist_changes(0, deleted_positions, commit=txn, updated=updated)
+        except BaseException:
+            with self._write_lock:
+                if txn in self._pending:
+                    with self._index_lock:
+                        self._abort(txn)
+                    self._flush_discarded()
+            raise
+        return added, len(stale)
+
+    def _delete_keys(self, keys):
+        """Delete stored chunks by docstore ID. Must hold _write_lock."""
+        keys = [key for key in dict.fromkeys(keys) if key in self._key_positions]
+        if not keys:
+            return 0
+
+        with self._index_lock:
+            positions = self._hide_keys(keys)
+            self._bump_corpus_version()
+        self._persist_changes(0, positions)
+        return len(keys)
+
+    def delete_documents(self, keys):
+        """Delete stored chunks by docstore ID. Returns how many were deleted."""
+        with self._write_lock:
+            if self.vector_store is None:
+                return 0
+            return self._delete_keys(keys)
+
+    def delete_source(self, source: str, keep_keys=None):
+        """
+        Delete every stored chunk of a source, except the docstore IDs in
+        keep_keys. Returns how many chunks were deleted.
+        """
+        keep_keys = keep_keys or set()
+        with self._write_lock:
+            if self.vector_store is None:
+                return 0
+            return self._delete_keys([key for key in self._source_keys.get(source, ()) if key not in keep_keys])
+
+    def list_sources(self):
+        """Stored sources and their live chunk counts."""
+        with self._index_lock:
+            return {source: len(keys) for source, keys in self._source_keys.items()}
+
+    def clear(self, count_out: bool = True):
+        """
+        Drop every stored chunk of the collection, in memory and on disk,
+        counting them out of the embedding statistics if count_out.
+        """
+        with self._write_lock:
+            with self._index_lock:
+                if self.vector_store is not None:
+                    docs = list(self.vector_store.docstore._dict.values())
+                    if count_out and docs:
+                        count_documents([doc.page_content for doc in docs], -1)
+                        save_embedding_state(INDEX_DIR)
+                    self._discard_store_ids(doc.metadata for doc in docs)
+                self.vector_store = None
+                self.lexical_index = BM25Index()
+                self._index_is_mmapped = False
+                self._persisted_count = 0
+                self._snapshot_count = 0
+                self._logged_count = 0
+                self._unlogged = []
+                self._docstore_snapshot_pending = False
+                self._trained_vectors = 0
+                self._use_generation(0, _COLLECTION_FILES)
+                self.load_stats = {"loaded": False, "vectors": 0}
+                self._deleted_positions = set()
+                self._position_filter = None
+                self._pending_positions = {}
+                self._pending = {}
+                self._key_positions = {}
+                self._source_keys = {}
+                self._uncounted = []
+                self.memory_bytes = 0
+                self._bump_corpus_version()
+            self._flush_discarded()
+
+            # The manifest goes first, so an interrupted clear never leaves it naming missing files
+            manifest_path = os.path.join(self.directory, MANIFEST_FILE)
+            if os.path.exists(manifest_path):
+                os.remove(manifest_path)
+            self._remove_unreferenced_files()
+            for file in _COLLECTION_FILES.values():
+                path = os.path.join(self.directory, file)
+                if os.path.exists(path):
+                    os.remove(path)
+            if self.name != DEFAULT_COLLECTION:
+                shutil.rmtree(self.directory, ignore_errors=True)
+
+    def vector_search_ids(self, embeddings, k: int = 5):
+        """
+        Dense search for an (n, dim) matrix of query embeddings in one FAISS
+        call. Returns one ranked list of docstore IDs per query.
+        """
+        store = self.get_vector_store()
+        query_matrix = np.ascontiguousarray(np.atleast_2d(embeddings), dtype=np.float32)
+        with self._index_lock.reading():
+            if RERANK_EXACT and index_encoding(store.index) != "float32":
+                _, candidates = search_index(store.index, query_matrix, k * RERANK_FACTOR, self._position_filter)
+                indices = rerank(query_matrix, candidates, lambda positions: _exact_vectors(store, positions), k)
+            else:
+                _, indices = search_index(store.index, query_matrix, k, self._position_filter)
+            return [[store.index_to_docstore_id[i] for i in row if i != -1] for row in indices]
+
+    def lexical_search_ids(self, query: str, k: int = 5):
+        """BM25 search; returns a ranked list of docstore IDs."""
+        with self._index_lock.reading():
+            return [key for key, _ in self.lexical_index.search(query, k)]
+
+    def get_documents(self, ids):
+        """Look up stored documents by docstore ID, skipping unknown IDs."""
+        store = self.get_vector_store()
+        docs = []
+        for doc_id in ids:
+            doc = store.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                docs.append(doc)
+        return docs
+
+    def get_vector_store(self):
+        if self.vector_store is None:
+            raise ValueError(f"Vector store not initialized for collection '{self.name}'")
+        return self.vector_store
+
+
+# ---------------------------
+# Collection registry
+# ---------------------------
+def _enforce_memory_budget():
+    """
+    Unload idle collections, least recently used first, while the loaded
+    ones exceed COLLECTION_MEMORY_BUDGET_MB; the last one used is kept.
+    """
+    budget = COLLECTION_MEMORY_BUDGET_MB * 1024 * 1024
+    with _registry_lock:
+        total = sum(store.memory_bytes for store in _collections.values())
+        for name in list(_collections)[:-1]:
+            if total <= budget:
+                break
+            store = _collections[name]
+            if store.active:
+                continue
+            del _collections[name]
+            total -= store.memory_bytes
+            COLLECTION_EVICTIONS.inc()
+            logger.info("Unloaded collection '%s' (%.1f MB) to stay within %d MB",
+                        name, store.memory_bytes / 2 ** 20, COLLECTION_MEMORY_BUDGET_MB)
+
+
+@contextmanager
+def use_collection(collection: str = None):
+    """The loaded store of a collection, kept from being unloaded until the block exits."""
+    name = validate_collection_name(collection or DEFAULT_COLLECTION)
+    with _registry_lock:
+        store = _collections.get(name)
+        if store is None:
+            store = CollectionStore(name)
+            _collections[name] = store
+        _collections.move_to_end(name)
+        store.active += 1
+    memory_before = store.memory_bytes
+    loaded = False
+    try:
+        try:
+            loaded = store.ensure_loaded()
+            if loaded:
+                COLLECTION_LOADS.inc()
+        except Exception:
+            with _registry_lock:
+                if _collections.get(name) is store:
+                    del _collections[name]
+            raise
+        yield store
+    finally:
+        with _registry_lock:
+            store.active -= 1
+            # Idle collections with nothing stored cost nothing to recreate
+            if not store.active and store.vector_store is None and _collections.get(name) is store:
+                del _collections[name]
+        if loaded or store.memory_bytes > memory_before:
+            _enforce_memory_budget()
+
+
+def list_collections():
+    """Collections on disk or in memory, with their load state and estimated size."""
+    names = set()
+    if any(os.path.exists(os.path.join(INDEX_DIR, file)) for file in (MANIFEST_FILE, INDEX_FILE)):
+        names.add(DEFAULT_COLLECTION)
+    if os.path.isdir(COLLECTIONS_DIR):
+        names.update(name for name in os.listdir(COLLECTIONS_DIR) if _COLLECTION_NAME.match(name))
+    with _registry_lock:
+        loaded = dict(_collections)
+    names.update(loaded)
+
+    collections = []
+    for name in sorted(names):
+        store = loaded.get(name)
+        directory = collection_dir(name)
+        collections.append({
+            "name": name,
+            "loaded": store is not None,
+            "vectors": store.get_store_stats()["vectors"] if store is not None else None,
+            "bytes": _collection_bytes(directory)
+        })
+    return collections
+
+
+def get_collection_stats():
+    """Loaded collections, their live vectors and sources, and their estimated memory against the budget."""
+    with _registry_lock:
+        stores = list(_collections.values())
+    return {
+        "loaded": [store.name for store in stores],
+        "vectors": sum(store.get_store_stats()["vectors"] for store in stores),
+        "documents": sum(len(store.list_sources()) for store in stores),
+        "memory_bytes": sum(store.memory_bytes for store in stores),
+        "memory_budget_bytes": COLLECTION_MEMORY_BUDGET_MB * 1024 * 1024
+    }
+
+
+def _drop_collection(name: str, count_out: bool = True):
+    # Requests still holding the store finish against the emptied one, later
+    # ones load the collection afresh. It is loaded first when its chunks must
+    # be counted out of the shared embedding statistics.
+    with _registry_lock:
+        store = _collections.pop(name, None) or CollectionStore(name)
+    if count_out:
+        store.ensure_loaded()
+    store.clear(count_out)
+
+
+def delete_collection(collection: str):
+    """Delete a collection's chunks and files. Returns False if it did not exist."""
+    name = validate_collection_name(collection)
+    if not any(entry["name"] == name for entry in list_collections()):
+        return False
+    _drop_collection(name)
+    return True
+
+
+def reset_vector_store():
+    """Drop every collection and the fitted embedding state, in memory and under INDEX_DIR."""
+    global _embedding_cache, _embedding_cache_namespace
+
+    # The embedding state is reset as a whole below, so nothing is loaded
+    for entry in list_collections():
+        _drop_collection(entry["name"], count_out=False)
+    shutil.rmtree(COLLECTIONS_DIR, ignore_errors=True)
+    with _cache_lock:
+        _embedding_cache = None
+        _embedding_cache_namespace = None
+    reset_embedding_state(INDEX_DIR)
+
+
+def wait_for_index_maintenance():
+    """Block until index rebuilds and compactions queued so far have finished."""
+    _maintenance.submit(lambda: None).result()
+
+
+def set_search_params(nprobe: int = None, ef_search: int = None):
+    """
+    Change IVF nprobe / HNSW efSearch at runtime, trading recall for
+    latency. Passing None restores the env default.
+    """
+    _search_params.update(nprobe=nprobe, ef_search=ef_search)
+    with _registry_lock:
+        stores = list(_collections.values())
+    for store in stores:
+        store.apply_search_params()
+
+
+# ---------------------------
+# Per-collection operations; collection=None is the default collection
+# ---------------------------
+def load_vector_store(collection: str = None):
+    """Load a persisted collection, if not loaded yet, and return its load statistics."""
+    with use_collection(collection) as store:
+        return dict(store.load_stats)
+
+
+def get_load_stats(collection: str = None):
+    with _registry_lock:
+        store = _collections.get(collection or DEFAULT_COLLECTION)
+    return dict(store.load_stats) if store is not None else {}
+
+
+def get_stored_vectors(collection: str = None):
+    """All live vectors as an (n, dim) float32 matrix, in index order."""
+    with use_collection(collection) as store:
+        return store.get_stored_vectors()
+
+
+def get_index_info(collection: str = None):
+    """Type, size and search settings of the current index."""
+    with use_collection(collection) as store:
+        return store.get_index_info()
+
+
+def get_store_stats(collection: str = None):
+    """Live vector and document counts, and the size of the store on disk."""
+    with use_collection(collection) as store:
+        return store.get_store_stats()
+
+
+def get_corpus_version(collection: str = None):
+    """Version of a collection's stored corpus; changes whenever documents are added or deleted"""
+    with use_collection(collection) as store:
+        return store.version
+
+
+def create_or_load_vector_store(chunks, collection: str = None):
+    """Add document chunks to a collection, skipping chunks already stored."""
+    with use_collection(collection) as store:
+        return store.add_chunks(chunks)
+
+
+def replace_source(source: str, chunks, batch_size: int = 256, on_batch=None, collection: str = None):
+    """Atomically replace a source's chunks in a collection; see CollectionStore.replace_source."""
+    with use_collection(collection) as store:
+        return store.replace_source(source, chunks, batch_size, on_batch)
+
+
+def delete_documents(keys, collection: str = None):
+    """Delete stored chunks by docstore ID. Returns how many were deleted."""
+    with use_collection(collection) as store:
+        return store.delete_documents(keys)
+
+
+def delete_source(source: str, keep_keys=None, collection: str = None):
+    """
+    Delete every stored chunk of a source, except the docstore IDs in
+    keep_keys. Returns how many chunks were deleted.
+    """
+    with use_collection(collection) as store:
+        return store.delete_source(source, keep_keys)
+
+
+def list_sources(collection: str = None):
+    """Stored sources and their live chunk counts."""
+    with use_collection(collection) as store:
+        return store.list_sources()
+
+
+def vector_search_ids(embeddings, k: int = 5, collection: str = None):
+    """Dense search of a collection; returns one ranked list of docstore IDs per query."""
+    with use_collection(collection) as store:
+        return store.vector_search_ids(embeddings, k)
+
+
+def lexical_search_ids(query: str, k: int = 5, collection: str = None):
+    """BM25 search of a collection; returns a ranked list of docstore IDs."""
+    with use_collection(collection) as store:
+        return store.lexical_search_ids(query, k)
 
-    if vector_store is None:
-        vector_store = FAISS.from_documents(documents, embeddings)
-    else:
-        vector_store.add_documents(documents)
 
-    return vector_store
+def get_documents(ids, collection: str = None):
+    """Look up stored documents by docstore ID, skipping unknown IDs."""
+    with use_collection(collection) as store:
+        return store.get_documents(ids)
 
 
-def get_vector_store():
-    if vector_store is None:
-        raise ValueError("Vector store not initialized")
-    return vector_store
+def get_vector_store(collection: str = None):
+    with use_collection(collection) as store:
+        return store.get_vector_store()
@@ -1,9 +1,15 @@
 import os
+import time
+import threading
 import requests
-from bs4 import BeautifulSoup
-import ssl
 import urllib3
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from .html_extractor import extract_text, extract_lines
+from .metrics import track_stage, stage_submitted, stage_completed, timed
 
 # Disable SSL warnings for corporate networks
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -11,113 +17,316 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 WEB_DIR = "backend/data/webs"
 os.makedirs(WEB_DIR, exist_ok=True)
 
-def fetch_and_clean_website(url: str):
+# Concurrent fetches across all hosts, and processes parsing HTML meanwhile
+WEB_FETCH_WORKERS = int(os.getenv("WEB_FETCH_WORKERS", "16"))
+WEB_PARSE_WORKERS = int(os.getenv("WEB_PARSE_WORKERS", str(os.cpu_count() or 1)))
+# Politeness per host: concurrent requests, and minimum seconds between
+# request starts (a larger robots.txt Crawl-delay wins)
+WEB_MAX_CONNECTIONS_PER_HOST = int(os.getenv("WEB_MAX_CONNECTIONS_PER_HOST", "2"))
+WEB_MIN_DELAY_PER_HOST = float(os.getenv("WEB_MIN_DELAY_PER_HOST", "0.5"))
+WEB_RESPECT_ROBOTS = os.getenv("WEB_RESPECT_ROBOTS", "true").lower() == "true"
+WEB_TIMEOUT_SECONDS = float(os.getenv("WEB_TIMEOUT_SECONDS", "15"))
+# Keep-alive connections kept per host in the shared pool
+WEB_POOL_SIZE = int(os.getenv("WEB_POOL_SIZE", "32"))
+
+# Enhanced headers to better mimic a real browser
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Accept-Charset': 'UTF-8',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'none',
+    'Sec-Ch-Ua': '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
+    'Sec-Ch-Ua-Mobile': '?0',
+    'Sec-Ch-Ua-Platform': '"Windows"',
+    'Cache-Control': 'no-cache',
+    'Pragma': 'no-cache'
+}
+USER_AGENT = os.getenv("WEB_USER_AGENT", HEADERS['User-Agent'])
+HEADERS['User-Agent'] = USER_AGENT
+
+# Shared by all fetches so connections to a host are kept alive and reused
+_session = None
+_session_lock = threading.Lock()
+_fetch_pool = None
+_parse_pool = None
+_pools_lock = threading.Lock()
+
+
+def _get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            # Transient failures are retried with backoff, honouring Retry-After
+            retry = Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=("GET", "HEAD"),
+                respect_retry_after_header=True,
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(pool_connections=WEB_POOL_SIZE, pool_maxsize=WEB_POOL_SIZE, max_retries=retry)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update(HEADERS)
+            _session = session
+        return _session
+
+
+def _get_pools():
+    global _fetch_pool, _parse_pool
+    with _pools_lock:
+        if _fetch_pool is None:
+            _fetch_pool = ThreadPoolExecutor(max_workers=WEB_FETCH_WORKERS, thread_name_prefix="web-fetch")
+            if WEB_PARSE_WORKERS > 1:
+                _parse_pool = ProcessPoolExecutor(max_workers=WEB_PARSE_WORKERS)
+        return _fetch_pool, _parse_pool
+
+
+# ---------------------------
+# Politeness: robots.txt and per-host limits
+# ---------------------------
+class _HostState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(WEB_MAX_CONNECTIONS_PER_HOST)
+        self.next_start = 0.0
+        self.robots = None
+
+
+_hosts = {}
+_hosts_lock = threading.Lock()
+
+
+def _host_state(url: str):
+    parsed = urlparse(url)
+    key = f"{parsed.scheme}://{parsed.netloc}"
+    with _hosts_lock:
+        state = _hosts.get(key)
+        if state is None:
+            state = _hosts[key] = _HostState()
+    return key, state
+
+
+def _load_robots(host: str):
+    """Fetch and parse a host's robots.txt; unreachable robots.txt allows everything."""
+    robots = RobotFileParser(f"{host}/robots.txt")
+    response = None
+    for verify in (True, False):
+        try:
+            response = _get_session().get(f"{host}/robots.txt", timeout=WEB_TIMEOUT_SECONDS, verify=verify)
+            break
+        except requests.exceptions.SSLError:
+            continue
+        except requests.exceptions.RequestException:
+            break
+
+    if response is None:
+        robots.allow_all = True
+    elif response.status_code in (401, 403):
+        robots.disallow_all = True
+    elif response.status_code >= 400:
+        robots.allow_all = True
+    else:
+        robots.parse(response.text.splitlines())
+    return robots
+
+
+def _check_robots(url: str, state: _HostState, host: str):
+    with state.lock:
+        if state.robots is None:
+            state.robots = _load_robots(host)
+    if not state.robots.can_fetch(USER_AGENT, url):
+        raise PermissionError(f"Fetching {url} is disallowed by {host}/robots.txt")
+
+
+def _wait_for_turn(state: _HostState):
+    """Space out request starts to one host by its minimum delay."""
+    delay = WEB_MIN_DELAY_PER_HOST
+    if state.robots is not None:
+        delay = max(delay, state.robots.crawl_delay(USER_AGENT) or 0)
+    with state.lock:
+        now = time.monotonic()
+        start = max(now, state.next_start)
+        state.next_start = start + delay
+    if start > now:
+        time.sleep(start - now)
+
+
+def _polite_get(url: str, **kwargs):
+    host, state = _host_state(url)
+    if WEB_RESPECT_ROBOTS:
+        _check_robots(url, state, host)
+    with state.slots:
+        _wait_for_turn(state)
+        return _get_session().get(url, timeout=WEB_TIMEOUT_SECONDS, allow_redirects=True, **kwargs)
+
+
+# ---------------------------
+# Fetching and cleaning
+# ---------------------------
+def fetch_page(url: str, validators: dict = None):
     """
-    Fetch and clean website content with SSL handling and bot detection evasion
+    Fetch a page over the shared connection pool, within the host's
+    politeness limits. Falls back to no SSL verification for corporate
+    networks, and to extra headers when a site answers 403.
+
+    With stored validators (etag / last_modified) the request is
+    conditional. Returns a dict with the page "html" (None if the server
+    answered 304 Not Modified), "not_modified" and the new "etag" and
+    "last_modified".
     """
+    headers = {}
+    if validators and validators.get("etag"):
+        headers['If-None-Match'] = validators["etag"]
+    if validators and validators.get("last_modified"):
+        headers['If-Modified-Since'] = validators["last_modified"]
+
     try:
-        # Enhanced headers to better mimic a real browser
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Accept-Charset': 'UTF-8',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-            'Sec-Fetch-Dest': 'document',
-            'Sec-Fetch-Mode': 'navigate',
-            'Sec-Fetch-Site': 'none',
-            'Sec-Ch-Ua': '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
-            'Sec-Ch-Ua-Mobile': '?0',
-            'Sec-Ch-Ua-Platform': '"Windows"',
-            'Cache-Control': 'no-cache',
-            'Pragma': 'no-cache'
+        response = _polite_get(url, headers=headers)
+    except (requests.exceptions.SSLError, requests.exceptions.ConnectionError):
+        print(f"SSL issue with {url}, trying without SSL verification...")
+        response = _polite_get(url, verify=False, headers=headers)
+
+    if response.status_code == 403:
+        print(f"Website blocking access to {url}. Trying alternative approach...")
+        response = _polite_get(url, verify=False, headers={
+            **headers,
+            'Referer': 'https://www.google.com/',
+            'Origin': 'https://www.google.com'
+        })
+
+    if response.status_code == 304:
+        return {
+            "html": None,
+            "not_modified": True,
+            "etag": response.headers.get("ETag") or (validators or {}).get("etag"),
+            "last_modified": response.headers.get("Last-Modified") or (validators or {}).get("last_modified")
         }
-        
-        # Create session with retries and delays
-        session = requests.Session()
-        
-        # Add a delay to avoid being detected as a bot
-        import time
-        time.sleep(2)
-        
-        # Try multiple approaches for both SSL and bot detection
-        response = None
-        
-        # First try: Normal request with enhanced headers
-        try:
-            response = session.get(url, timeout=15, headers=headers, allow_redirects=True)
-            response.raise_for_status()
-        except (requests.exceptions.SSLError, requests.exceptions.ConnectionError):
-            print(f"SSL issue with {url}, trying without SSL verification...")
-            # Second try: Disable SSL verification
-            try:
-                response = session.get(url, timeout=15, headers=headers, verify=False, allow_redirects=True)
-                response.raise_for_status()
-            except requests.exceptions.HTTPError as e:
-                if e.response.status_code == 403:
-                    # Third try: Even more realistic headers for 403 errors
-                    headers.update({
-                        'Referer': 'https://www.google.com/',
-                        'Origin': 'https://www.google.com'
-                    })
-                    time.sleep(3)  # Longer delay
-                    response = session.get(url, timeout=15, headers=headers, verify=False, allow_redirects=True)
-                    response.raise_for_status()
+    response.raise_for_status()
+    return {
+        "html": response.text,
+        "not_modified": False,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified")
+    }
+
+
+def fetch_html(url: str) -> str:
+    """Fetch a page unconditionally and return its HTML."""
+    return fetch_page(url)["html"]
+
+
+def clean_html(html: str) -> str:
+    """Extract the readable text of an HTML page with the configured extractor."""
+    return extract_text(html)
+
+
+def clean_html_lines(html: str) -> list:
+    """Extract the readable lines of an HTML page with the configured extractor."""
+    return extract_lines(html)
+
+
+def _save_lines(url: str, lines: list):
+    parsed_url = urlparse(url)
+    filename = f"{parsed_url.netloc}_{parsed_url.path.replace('/', '_')}.txt"
+    # Clean filename
+    filename = "".join(c for c in filename if c.isalnum() or c in "._-")
+    file_path = os.path.join(WEB_DIR, filename)
+    size = sum(len(line.encode("utf-8")) for line in lines) + max(len(lines) - 1, 0)
+
+    # Leave the file alone if the page text has not changed
+    if os.path.exists(file_path) and os.path.getsize(file_path) == size:
+        with open(file_path, encoding="utf-8", newline="") as f:
+            if f.read().split("\n") == lines:
+                return
+
+    # Written line by line, never joined into one string
+    with open(file_path, "w", encoding="utf-8", newline="") as f:
+        for n, line in enumerate(lines):
+            if n:
+                f.write("\n")
+            f.write(line)
+
+    print(f"Successfully fetched {size} bytes of text from {url}")
+
+
+def _save_text(url: str, cleaned_text: str):
+    _save_lines(url, cleaned_text.split("\n"))
+
+
+def fetch_and_clean_websites(urls, validators: dict = None):
+    """
+    Fetch and clean many URLs concurrently. Fetches run on a thread pool over
+    the shared keep-alive session while finished pages are parsed in worker
+    processes, so parsing overlaps with fetching. `validators` maps URLs to
+    their stored validators for conditional requests.
+
+    Yields (url, page) in completion order, where page is a dict with the
+    cleaned text as a list of "lines" (None if not modified), "not_modified",
+    "etag" and "last_modified"; a URL that failed yields (url, exception)
+    instead.
+    """
+    validators = validators or {}
+    fetch_pool, parse_pool = _get_pools()
+    # Without worker processes, parsing runs on the fetch threads instead
+    parse_pool = parse_pool or fetch_pool
+    fetching = {fetch_pool.submit(fetch_page, url, validators.get(url)): url for url in urls}
+    parsing = {}
+
+    while fetching or parsing:
+        done, _ = wait(list(fetching) + list(parsing), return_when=FIRST_COMPLETED)
+        for future in done:
+            if future in fetching:
+                url = fetching.pop(future)
+                try:
+                    page = future.result()
+                except Exception as e:
+                    yield url, e
+                    continue
+                html = page.pop("html")
+                if page["not_modified"]:
+                    yield url, dict(page, lines=None)
                 else:
-                    raise
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 403:
-                # Handle 403 error with different approach
-                print(f"Website blocking access to {url}. Trying alternative approach...")
-                headers.update({
-                    'Referer': 'https://www.google.com/',
-                    'Origin': 'https://www.google.com'
-                })
-                time.sleep(3)  # Add delay
-                response = session.get(url, timeout=15, headers=headers, verify=False, allow_redirects=True)
-                response.raise_for_status()
-            else:
-                raise
-        
-        # Parse HTML content
-        soup = BeautifulSoup(response.text, "html.parser")
-
-        # Remove unnecessary elements
-        for tag in soup(["script", "style", "nav", "footer", "header", "aside", "form", "iframe", "noscript"]):
-            tag.decompose()
-
-        # Extract text content
-        text = soup.get_text(separator="\n")
-        cleaned_text = "\n".join(line.strip() for line in text.splitlines() if line.strip())
-        
-        # Filter out very short lines that are likely navigation/UI elements
-        lines = cleaned_text.split('\n')
-        filtered_lines = [line for line in lines if len(line) > 10]  # Keep lines with more than 10 chars
-        cleaned_text = '\n'.join(filtered_lines)
-        
-        # Limit text length to avoid very large documents
-        if len(cleaned_text) > 50000:  # Limit to ~50KB of text
-            cleaned_text = cleaned_text[:50000] + "\n[Content truncated due to length]"
-
-        # Save to file
-        parsed_url = urlparse(url)
-        filename = f"{parsed_url.netloc}_{parsed_url.path.replace('/', '_')}.txt"
-        # Clean filename
-        filename = "".join(c for c in filename if c.isalnum() or c in "._-")
-        file_path = os.path.join(WEB_DIR, filename)
-
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(cleaned_text)
-
-        print(f"Successfully fetched {len(cleaned_text)} characters from {url}")
+                    stage_submitted("html_clean")
+                    parsing[parse_pool.submit(timed, clean_html_lines, html)] = (url, page)
+                continue
+
+            url, page = parsing.pop(future)
+            try:
+                lines, seconds = future.result()
+            except Exception as e:
+                stage_completed("html_clean", failed=True)
+                yield url, e
+                continue
+            stage_completed("html_clean", seconds, items=1)
+            _save_lines(url, lines)
+            yield url, dict(page, lines=lines)
+
+
+def fetch_and_clean_website(url: str):
+    """
+    Fetch and clean a single website, returning a helpful message instead of
+    raising when the site cannot be fetched
+    """
+    try:
+        html = fetch_html(url)
+        with track_stage("html_clean", items=1):
+            cleaned_text = clean_html(html)
+        _save_text(url, cleaned_text)
         return cleaned_text
-        
+
     except Exception as e:
         error_msg = f"Error fetching URL {url}: {str(e)}"
         print(error_msg)
-        
+
         # If all else fails, return a helpful message
         fallback_content = f"""
 Unable to fetch content from {url} due to website restrictions.
@@ -126,7 +335,7 @@ This website appears to be blocking automated requests. This is common with site
 
 Alternative suggestions:
 1. Try a different URL from the same site
-2. Use a simpler URL structure  
+2. Use a simpler URL structure
 3. Copy and paste the content manually into a text file and upload as PDF
 4. Try other educational websites that are more accessible
 
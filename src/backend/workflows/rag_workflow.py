@@ -3,6 +3,9 @@ from langchain_openai import AzureChatOpenAI
 from langchain_core.prompts import PromptTemplate
 import os
 import sys
+import asyncio
+import threading
+import httpx
 from dotenv import load_dotenv
 from typing import TypedDict, List
 from langchain_core.documents import Document
@@ -14,31 +17,62 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 load_dotenv()
 
 from services.rag_retriever import retrieve_relevant_chunks
+from services.metrics import track_stage
+from services.context_packer import pack_context
+from services.chat_sessions import format_history, followup_query
 
 # Define the state schema
 class GraphState(TypedDict):
     question: str
-    chat_history: List[dict]
+    collection: str
+    history: dict
     retrieved_docs: List[Document]
+    context: dict
     answer: str
 
-# LLM Setup
-llm = AzureChatOpenAI(
-    azure_endpoint=os.getenv("AZURE_OPENAI_API_BASE"),
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
-    azure_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
-    temperature=0.0
+# LLM connection pool, shared by every request in the process
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "500"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "100"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+
+llm_http_limits = httpx.Limits(
+    max_connections=LLM_MAX_CONNECTIONS,
+    max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry=60
 )
 
+# LLM Setup
+LLM_DEPLOYMENT_NAME = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
+
+# Built on first use, so importing the workflow needs no credentials
+_llm = None
+_llm_lock = threading.Lock()
+
+def get_llm():
+    """Return the process-wide LLM client, creating it on first use"""
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                _llm = AzureChatOpenAI(
+                    azure_endpoint=os.getenv("AZURE_OPENAI_API_BASE"),
+                    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                    api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
+                    azure_deployment=LLM_DEPLOYMENT_NAME,
+                    temperature=0.0,
+                    http_client=httpx.Client(limits=llm_http_limits, timeout=LLM_TIMEOUT_SECONDS),
+                    http_async_client=httpx.AsyncClient(limits=llm_http_limits, timeout=LLM_TIMEOUT_SECONDS)
+                )
+    return _llm
+
 # Prompt Template
 prompt_template = PromptTemplate(
-    input_variables=["question", "context"],
+    input_variables=["question", "context", "history"],
     template="""
 You are a helpful assistant.
 
 Use ONLY the context below to answer the question.
-
+{history}
 Context:
 {context}
 
@@ -53,25 +87,45 @@ Also provide source citations.
 # Workflow Graph
 graph = StateGraph(GraphState)
 
-def retrieve(state: GraphState) -> GraphState:
-    question = state["question"]
-    docs = retrieve_relevant_chunks(question)
-    state["retrieved_docs"] = docs
+async def retrieve(state: GraphState) -> GraphState:
+    # Follow-up questions are searched together with the previous question
+    question = followup_query(state["question"], state.get("history"))
+    # FAISS search is CPU-bound, keep it off the event loop
+    docs = await asyncio.to_thread(retrieve_relevant_chunks, question, collection=state.get("collection"))
+    # Merge neighbouring chunks and fit them to the token budget; only the
+    # chunks that made it into the prompt are cited
+    context = pack_context(docs)
+    state["context"] = context
+    state["retrieved_docs"] = context["documents"]
     return state
 
-def generate_answer(state: GraphState) -> GraphState:
-    context = "\n\n".join([doc.page_content for doc in state["retrieved_docs"]])
-    question = state["question"]
+def build_prompt(question: str, context: dict, history: dict = None) -> str:
+    # Earlier turns let the LLM resolve follow-up questions
+    history_text = format_history(history)
+    if history_text:
+        history_text = f"\nConversation so far:\n{history_text}\n"
+
+    # Format the prompt with the packed context and question
+    return prompt_template.format(question=question, context=context["text"], history=history_text)
 
-    # Format the prompt with the context and question
-    formatted_prompt = prompt_template.format(question=question, context=context)
+async def generate_answer(state: GraphState) -> GraphState:
+    context = state.get("context") or pack_context(state["retrieved_docs"])
+    formatted_prompt = build_prompt(state["question"], context, state.get("history"))
     
     # Use the LLM directly
-    answer = llm.invoke(formatted_prompt)
+    with track_stage("llm_generate", items=1):
+        answer = await get_llm().ainvoke(formatted_prompt)
 
     state["answer"] = answer.content
     return state
 
+async def stream_answer(question: str, context: dict, history: dict = None):
+    """Yield answer text pieces as the LLM produces them, from a packed context"""
+    with track_stage("llm_generate", items=1):
+        async for chunk in get_llm().astream(build_prompt(question, context, history)):
+            if chunk.content:
+                yield chunk.content
+
 # Add nodes to the graph
 graph.add_node("retrieve", retrieve)
 graph.add_node("generate_answer", generate_answer)
@@ -1,9 +1,11 @@
 import streamlit as st
 import requests
 import json
+import time
 
 # Backend API configuration
 API_BASE_URL = "http://localhost:8000"
+JOB_POLL_INTERVAL = 1.0
 
 st.set_page_config(
     page_title="Document Q&A Assistant",
@@ -16,16 +18,76 @@ st.write(
 )
 
 
+# Messages shown on the page; the backend keeps the history the LLM sees
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
 
+if "session_id" not in st.session_state:
+    st.session_state.session_id = None
+
+
 if "document_uploaded" not in st.session_state:
     st.session_state.document_uploaded = False
 
 
+def wait_for_job(job_id):
+    """Poll an ingestion job, showing its progress in the sidebar, and return its final state"""
+    progress = st.sidebar.progress(0.0)
+    status_text = st.sidebar.empty()
+    while True:
+        response = requests.get(f"{API_BASE_URL}/jobs/{job_id}")
+        response.raise_for_status()
+        job = response.json()
+
+        total = max(job["items_total"], 1)
+        progress.progress(min(job["items_done"] / total, 1.0))
+        item = f" - {job['current_item']}" if job.get("current_item") else ""
+        pages = f", page {job['pages_done']}" if job.get("pages_done") else ""
+        status_text.caption(f"{job['stage']}{item} ({job['chunks_total']} chunks{pages})")
+
+        if job["status"] in ("completed", "failed"):
+            progress.empty()
+            status_text.empty()
+            return job
+        time.sleep(JOB_POLL_INTERVAL)
+
+
+def report_job(job, label):
+    """Show the outcome of a finished ingestion job"""
+    for error in job["errors"]:
+        st.sidebar.error(f"❌ {error['item']}: {error['error']}")
+    if job["status"] == "completed":
+        st.session_state.document_uploaded = True
+        unchanged = len(job["items_unchanged"])
+        note = f" ({unchanged} unchanged)" if unchanged else ""
+        st.sidebar.success(f"✅ Processed {label} - {job['chunks_total']} chunks created{note}")
+
+
+def stream_query(question, session_id, collection):
+    """Yield (event, data) pairs from the server-sent events of /query/stream"""
+    with requests.post(
+        f"{API_BASE_URL}/query/stream",
+        json={"question": question, "session_id": session_id, "collection": collection},
+        stream=True
+    ) as response:
+        if response.status_code != 200:
+            yield "error", {"detail": response.text}
+            return
+
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                yield event, json.loads(line[len("data: "):])
+
+
 st.sidebar.header("📥 Upload Knowledge Source")
 
+# Documents are uploaded to and questions answered from this collection
+collection = st.sidebar.text_input("Collection", value="default").strip() or "default"
+
 uploaded_files=st.sidebar.file_uploader(
     "Upload PDF files",
     type=["pdf"],
@@ -34,50 +96,47 @@ uploaded_files=st.sidebar.file_uploader(
 
 if uploaded_files:
     if st.sidebar.button("Process PDF Files"):
-        with st.sidebar.spinner("Processing PDF files..."):
-            try:
-                # Prepare files for upload
-                files = []
-                for uploaded_file in uploaded_files:
-                    # Reset file pointer
-                    uploaded_file.seek(0)
-                    files.append(("files", (uploaded_file.name, uploaded_file.getvalue(), "application/pdf")))
-                
-                # Send to backend
-                response = requests.post(f"{API_BASE_URL}/upload/pdf", files=files)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    st.session_state.document_uploaded = True
-                    st.sidebar.success(f"✅ Processed {len(uploaded_files)} PDF(s) - {result.get('total_chunks', 0)} chunks created")
-                else:
-                    st.sidebar.error(f"❌ Error processing PDFs: {response.text}")
-            except Exception as e:
-                st.sidebar.error(f"❌ Error: {str(e)}")
+        try:
+            # Prepare files for upload
+            files = []
+            for uploaded_file in uploaded_files:
+                # Reset file pointer
+                uploaded_file.seek(0)
+                files.append(("files", (uploaded_file.name, uploaded_file.getvalue(), "application/pdf")))
+            
+            # Send to backend, then follow the ingestion job
+            response = requests.post(f"{API_BASE_URL}/upload/pdf", params={"collection": collection}, files=files)
+            
+            if response.status_code == 200:
+                job = wait_for_job(response.json()["job_id"])
+                report_job(job, f"{len(uploaded_files)} PDF(s)")
+            else:
+                st.sidebar.error(f"❌ Error processing PDFs: {response.text}")
+        except Exception as e:
+            st.sidebar.error(f"❌ Error: {str(e)}")
     else:
         st.sidebar.info(f"📄 {len(uploaded_files)} file(s) ready to process")
 
 
-url=st.sidebar.text_input("Or enter a website URL")
-
-if st.sidebar.button("Add URL"):
-    if url:
-        with st.sidebar.spinner("Processing website..."):
-            try:
-                # Send URL to backend
-                response = requests.post(
-                    f"{API_BASE_URL}/upload/url", 
-                    json={"url": url}
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    st.session_state.document_uploaded = True
-                    st.sidebar.success(f"✅ Processed URL - {result.get('total_chunks', 0)} chunks created")
-                else:
-                    st.sidebar.error(f"❌ Error processing URL: {response.text}")
-            except Exception as e:
-                st.sidebar.error(f"❌ Error: {str(e)}")
+urls_text=st.sidebar.text_area("Or enter website URLs (one per line)")
+urls = [line.strip() for line in urls_text.splitlines() if line.strip()]
+
+if st.sidebar.button("Add URLs"):
+    if urls:
+        try:
+            # Send URLs to backend as one batch, then follow the ingestion job
+            response = requests.post(
+                f"{API_BASE_URL}/upload/urls", 
+                json={"urls": urls, "collection": collection}
+            )
+            
+            if response.status_code == 200:
+                job = wait_for_job(response.json()["job_id"])
+                report_job(job, f"{len(urls)} URL(s)")
+            else:
+                st.sidebar.error(f"❌ Error processing URLs: {response.text}")
+        except Exception as e:
+            st.sidebar.error(f"❌ Error: {str(e)}")
     else:
         st.sidebar.warning("Please enter a valid URL.")
 
@@ -110,6 +169,7 @@ if st.button("🔄 Reset Chat & Documents"):
         if response.status_code == 200:
             # Reset frontend state
             st.session_state.chat_history = []
+            st.session_state.session_id = None
             st.session_state.document_uploaded = False
             st.success("✅ Reset complete!")
             st.rerun()
@@ -130,57 +190,64 @@ if user_question:
     with st.chat_message("user"):
         st.markdown(user_question)
 
-    # Get AI response from backend
+    # Stream AI response from backend
     with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            try:
-                response = requests.post(
-                    f"{API_BASE_URL}/query",
-                    json={
-                        "question": user_question,
-                        "chat_history": st.session_state.chat_history
-                    }
-                )
+        answer_placeholder = st.empty()
+        answer_placeholder.markdown("Thinking...")
+        ai_response = ""
+        result = {}
+        timing = None
+        try:
+            for event, payload in stream_query(user_question, st.session_state.session_id, collection):
+                if event == "sources":
+                    result = payload
+                    st.session_state.session_id = payload.get("session_id", st.session_state.session_id)
+                elif event == "token":
+                    ai_response += payload["text"]
+                    answer_placeholder.markdown(ai_response + "▌")
+                elif event == "done":
+                    timing = payload
+                elif event == "error":
+                    ai_response = f"❌ Error getting response: {payload['detail']}"
+
+            if not ai_response:
+                ai_response = "No answer generated"
+            sources = result.get("sources", [])
+            source_details = result.get("source_details", [])
+            total_chunks = result.get("total_chunks_retrieved", len(sources))
+
+            # Display the answer
+            answer_placeholder.markdown(ai_response)
+
+            # Display sources if available
+            if sources:
+                # Get unique sources
+                unique_sources = list(set([s for s in sources if s]))
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    ai_response = result.get("answer", "No answer generated")
-                    sources = result.get("sources", [])
-                    source_details = result.get("source_details", [])
-                    total_chunks = result.get("total_chunks_retrieved", len(sources))
-                    
-                    # Display the answer
-                    st.markdown(ai_response)
-                    
-                    # Display sources if available
-                    if sources:
-                        # Get unique sources
-                        unique_sources = list(set([s for s in sources if s]))
-                        
-                        if len(unique_sources) == 1:
-                            st.markdown(f"**Source:** {unique_sources[0]}")
-                            st.caption(f"📄 Answer based on {total_chunks} relevant chunks from this document")
-                        else:
-                            st.markdown("**Sources:**")
-                            for i, source in enumerate(unique_sources, 1):
-                                st.markdown(f"{i}. {source}")
-                            st.caption(f"📄 Answer based on {total_chunks} chunks from {len(unique_sources)} documents")
-                        
-                        # Show expandable source details
-                        with st.expander("� View Source Details", expanded=False):
-                            for i, detail in enumerate(source_details, 1):
-                                st.markdown(f"**{i}. {detail.get('chunk_info', f'Chunk {i}')}**")
-                                st.markdown(f"*Source: {detail.get('source', 'Unknown')}*")
-                                st.code(detail.get('preview', 'No preview available'), language=None)
-                                if i < len(source_details):
-                                    st.divider()
+                if len(unique_sources) == 1:
+                    st.markdown(f"**Source:** {unique_sources[0]}")
+                    st.caption(f"📄 Answer based on {total_chunks} relevant chunks from this document")
                 else:
-                    ai_response = f"❌ Error getting response: {response.text}"
-                    st.markdown(ai_response)
-                    
-            except Exception as e:
-                ai_response = f"❌ Connection error: {str(e)}"
-                st.markdown(ai_response)
+                    st.markdown("**Sources:**")
+                    for i, source in enumerate(unique_sources, 1):
+                        st.markdown(f"{i}. {source}")
+                    st.caption(f"📄 Answer based on {total_chunks} chunks from {len(unique_sources)} documents")
+                
+                # Show expandable source details
+                with st.expander("� View Source Details", expanded=False):
+                    for i, detail in enumerate(source_details, 1):
+                        st.markdown(f"**{i}. {detail.get('chunk_info', f'Chunk {i}')}**")
+                        st.markdown(f"*Source: {detail.get('source', 'Unknown')}*")
+                        st.code(detail.get('preview', 'No preview available'), language=None)
+                        if i < len(source_details):
+                            st.divider()
+
+            if timing and timing.get("ttft_ms") is not None:
+                st.caption(f"⏱️ First token after {timing['ttft_ms']:.0f} ms, full answer after {timing['total_ms']:.0f} ms")
+                
+        except Exception as e:
+            ai_response = f"❌ Connection error: {str(e)}"
+            answer_placeholder.markdown(ai_response)
 
     # Store AI response
     st.session_state.chat_history.append(
@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+# Services create their data directories relative to the working directory
+# when imported, so move to a scratch directory before any of them loads
+os.chdir(tempfile.mkdtemp(prefix="rag-tests-"))
+# Count prompt tokens without downloading a tiktoken encoding
+os.environ.setdefault("CONTEXT_TOKENIZER", "chars")
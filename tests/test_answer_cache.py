@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+
+import pytest
+
+from services import answer_cache
+from services.answer_cache import SemanticAnswerCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(answer_cache, "time", SimpleNamespace(time=lambda: now.value))
+    return now
+
+
+def test_similar_question_hits_and_dissimilar_one_misses(clock):
+    cache = SemanticAnswerCache(max_size=4, threshold=0.95)
+    cache.store([1.0, 0.0, 0.0], corpus_version=1, response="answer")
+
+    assert cache.lookup([0.99, 0.05, 0.0], corpus_version=1) == "answer"
+    assert cache.lookup([0.7, 0.7, 0.0], corpus_version=1) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_entries_are_per_collection_and_corpus_version(clock):
+    cache = SemanticAnswerCache(max_size=4)
+    cache.store([1.0, 0.0], corpus_version=1, response="docs answer", collection="docs")
+    cache.store([1.0, 0.0], corpus_version=1, response="faq answer", collection="faq")
+
+    assert cache.lookup([1.0, 0.0], corpus_version=1, collection="faq") == "faq answer"
+    # A new corpus version of one collection drops only that collection's entries
+    assert cache.lookup([1.0, 0.0], corpus_version=2, collection="docs") is None
+    assert cache.lookup([1.0, 0.0], corpus_version=1, collection="docs") is None
+    assert cache.lookup([1.0, 0.0], corpus_version=1, collection="faq") == "faq answer"
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = SemanticAnswerCache(max_size=4, ttl_seconds=60)
+    cache.store([1.0, 0.0], corpus_version=1, response="answer")
+
+    clock.value += 59
+    assert cache.lookup([1.0, 0.0], corpus_version=1) == "answer"
+    clock.value += 2
+    assert cache.lookup([1.0, 0.0], corpus_version=1) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = SemanticAnswerCache(max_size=2)
+    cache.store([1.0, 0.0, 0.0], corpus_version=1, response="first")
+    cache.store([0.0, 1.0, 0.0], corpus_version=1, response="second")
+    assert cache.lookup([1.0, 0.0, 0.0], corpus_version=1) == "first"
+
+    cache.store([0.0, 0.0, 1.0], corpus_version=1, response="third")
+
+    assert cache.lookup([0.0, 1.0, 0.0], corpus_version=1) is None
+    assert cache.lookup([1.0, 0.0, 0.0], corpus_version=1) == "first"
+    assert cache.lookup([0.0, 0.0, 1.0], corpus_version=1) == "third"
+    assert cache.evictions == 1
+
+
+def test_zero_size_cache_stores_nothing(clock):
+    cache = SemanticAnswerCache(max_size=0)
+    cache.store([1.0, 0.0], corpus_version=1, response="answer")
+
+    assert cache.lookup([1.0, 0.0], corpus_version=1) is None
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,28 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from api import main
+
+
+@pytest.fixture
+def client():
+    # Validation runs before the handler, so no LLM or lifespan is needed
+    return TestClient(main.app)
+
+
+@pytest.mark.parametrize("body", [
+    {"questions": ["what is faiss?"], "top_k": 0},
+    {"questions": ["what is faiss?"], "top_k": -3},
+    {"questions": ["what is faiss?"], "top_k": main.MAX_TOP_K + 1},
+    {"questions": ["what is faiss?"], "max_concurrency": 0},
+    {"questions": ["what is faiss?"], "max_concurrency": main.BATCH_QUERY_CONCURRENCY + 1},
+    {"questions": []},
+    {"questions": ["what is faiss?", "   "]},
+    {"questions": ["what is faiss?"] * (main.MAX_BATCH_QUESTIONS + 1)},
+])
+def test_batch_query_rejects_invalid_requests(client, monkeypatch, body):
+    def fail(*args, **kwargs):
+        raise AssertionError("an invalid batch reached retrieval")
+    monkeypatch.setattr(main, "retrieve_relevant_chunks_batch", fail)
+
+    assert client.post("/query/batch", json=body).status_code == 422
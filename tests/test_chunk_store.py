@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from services import chunk_store, vector_store
+from services.chunk_store import ChunkStore
+from services.vector_store import CollectionStore, wait_for_index_maintenance
+
+
+def make_chunks(source, texts):
+    return [{"text": text, "source": source, "chunk_id": i} for i, text in enumerate(texts)]
+
+
+@pytest.fixture
+def chunks(tmp_path, monkeypatch):
+    store = ChunkStore(str(tmp_path))
+    monkeypatch.setattr(vector_store, "get_chunk_store", lambda: store)
+    return store
+
+
+def test_compaction_keeps_store_ids(chunks):
+    ids = chunks.append_many(make_chunks("doc.txt", ["alpha", "beta", "gamma", "delta"]))
+    chunks.discard(ids[1:3])
+    assert chunks.needs_compaction()
+
+    assert chunks.compact() == 2
+    assert chunks.get(ids[3])["text"] == "delta"
+    with pytest.raises(KeyError):
+        chunks.get(ids[1])
+    assert [chunk["store_id"] for chunk in chunks.iter_chunks()] == [ids[0], ids[3]]
+    assert chunks.append_many(make_chunks("doc.txt", ["epsilon"])) == [4]
+
+    # The new generation replaces the old files and survives a reopen
+    assert sorted(os.listdir(chunks.directory)) == [
+        "chunks.1.idx", "chunks.1.jsonl", "chunks.deleted", "chunks.manifest.json"]
+    reopened = ChunkStore(chunks.directory)
+    assert [chunk["text"] for chunk in reopened.iter_chunks()] == ["alpha", "delta", "epsilon"]
+
+
+def test_discarded_chunks_survive_reopen(chunks, monkeypatch):
+    monkeypatch.setattr(chunk_store, "CHUNK_STORE_COMPACT_FRACTION", 0.5)
+    ids = chunks.append_many(make_chunks("doc.txt", ["alpha", "beta", "gamma"]))
+    chunks.discard(ids[:1])
+    assert not chunks.needs_compaction()
+
+    reopened = ChunkStore(chunks.directory)
+    assert len(reopened) == 2
+    reopened.discard(ids[:2])
+    assert reopened.needs_compaction()
+
+
+def test_deleted_and_replaced_sources_are_pruned(chunks):
+    store = CollectionStore("pruning")
+    store.ensure_loaded()
+    old = make_chunks("doc.txt", ["alpha text", "beta text", "gamma text"])
+    other = make_chunks("other.txt", ["delta text"])
+    chunks.append_many(old + other)
+    store.add_chunks(old + other)
+
+    new = make_chunks("doc.txt", ["beta text", "epsilon text"])
+    chunks.append_many(new)
+    store.replace_source("doc.txt", new)
+    wait_for_index_maintenance()
+    assert sorted(chunk["text"] for chunk in chunks.iter_chunks()) == ["beta text", "delta text", "epsilon text"]
+    kept = store.get_documents([key for key, doc in store.vector_store.docstore._dict.items()
+                                if doc.page_content == "beta text"])[0]
+    assert chunks.get(kept.metadata["store_id"])["chunk_id"] == 0
+
+    store.delete_source("doc.txt")
+    wait_for_index_maintenance()
+    assert [chunk["text"] for chunk in chunks.iter_chunks()] == ["delta text"]
+    assert chunks.generation > 0
@@ -0,0 +1,47 @@
+import random
+
+import pytest
+
+from services.chunker import CHUNK_SIZE, _get_splitter, chunk_stream
+
+
+def random_lines(rng):
+    """Lines with blank runs, long paragraphs and long lines without spaces."""
+    lines = []
+    for _ in range(rng.randint(1, 120)):
+        kind = rng.random()
+        if kind < 0.25:
+            lines.extend([""] * rng.randint(1, 3))
+        elif kind < 0.35:
+            lines.append("x" * rng.randint(CHUNK_SIZE - 5, 3 * CHUNK_SIZE))
+        elif kind < 0.45:
+            lines.append(" ".join("w" * rng.randint(1, 12) for _ in range(rng.randint(100, 400))))
+        else:
+            lines.append(" ".join(rng.choice(["alpha", "beta", "gamma", "delta"]) for _ in range(rng.randint(0, 60))))
+    return lines
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_chunk_stream_matches_whole_text_splitting(seed):
+    lines = random_lines(random.Random(seed))
+    expected = _get_splitter().split_text("\n".join(lines))
+
+    chunks = list(chunk_stream(iter(lines), source=f"doc{seed}.txt"))
+
+    assert [chunk["text"] for chunk in chunks] == expected
+    assert [chunk["chunk_id"] for chunk in chunks] == list(range(len(expected)))
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "\n\n\n",
+    "short text",
+    "a" * (CHUNK_SIZE - 1) + "\n\nb",
+    "a" * (CHUNK_SIZE - 1) + "\n\n\nb",
+    "a" * CHUNK_SIZE + "\n" + "b" * 10,
+    ("word " * 200 + "\n") * 5,
+])
+def test_chunk_stream_edge_cases(text):
+    expected = _get_splitter().split_text(text)
+
+    assert [chunk["text"] for chunk in chunk_stream(text.split("\n"), source="edge.txt")] == expected
@@ -0,0 +1,47 @@
+from langchain_core.documents import Document
+
+from services import vector_store
+from services.context_packer import pack_context
+from services.vector_store import CollectionStore, chunk_key
+
+
+def chunks(texts, source="doc.txt"):
+    return [{"text": text, "source": source, "chunk_id": i} for i, text in enumerate(texts)]
+
+
+def test_replaced_source_packs_every_chunk():
+    vector_store.reset_vector_store()
+    store = CollectionStore("packing")
+    store.ensure_loaded()
+    store.add_chunks(chunks(["alpha", "beta", "gamma"]))
+    texts = ["zeta", "alpha", "beta", "gamma"]
+    store.replace_source("doc.txt", chunks(texts))
+
+    docs = store.get_documents([chunk_key("doc.txt", text) for text in texts])
+    context = pack_context(docs)
+
+    assert len(context["documents"]) == 4
+    assert context["text"].startswith("[Source: doc.txt, chunks 1-4]")
+    for text in texts:
+        assert text in context["text"]
+
+
+def test_chunks_sharing_a_chunk_id_are_kept_apart():
+    docs = [
+        Document(page_content="old version text", metadata={"source": "doc.txt", "chunk_id": 0, "ingest_id": "a"}),
+        Document(page_content="new version text", metadata={"source": "doc.txt", "chunk_id": 0, "ingest_id": "b"}),
+        Document(page_content="next chunk text", metadata={"source": "doc.txt", "chunk_id": 1, "ingest_id": "b"}),
+    ]
+
+    context = pack_context(docs)
+
+    assert len(context["documents"]) == 3
+    assert "[Source: doc.txt, chunk 1]\nold version text" in context["text"]
+    assert "[Source: doc.txt, chunks 1-2]\nnew version text\nnext chunk text" in context["text"]
+
+
+def test_same_chunk_retrieved_twice_is_packed_once():
+    doc = Document(page_content="only text", metadata={"source": "doc.txt", "chunk_id": 0})
+
+    assert pack_context([doc, Document(page_content="only text", metadata=dict(doc.metadata))])["text"] == \
+        "[Source: doc.txt, chunk 1]\nonly text"
@@ -0,0 +1,65 @@
+import pytest
+
+from services.lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+def make_index(docs):
+    index = BM25Index()
+    index.add_many(list(docs), [tokenize(text) for text in docs.values()])
+    return index
+
+
+def test_deleted_documents_do_not_skew_scores():
+    live = {"short": "faiss index", "long": "faiss index " + "filler words " * 20}
+    filler = {f"gone{i}": "faiss " + "other text " * 200 for i in range(20)}
+    index = make_index({**live, **filler})
+    index.remove(list(filler))
+
+    # Scores match an index that never held the deleted documents
+    assert index.search("faiss index", k=5) == pytest.approx(make_index(live).search("faiss index", k=5))
+    assert [key for key, _ in index.search("faiss", k=5)] == ["short", "long"]
+
+
+def test_restored_documents_count_again():
+    docs = {"a": "alpha beta", "b": "alpha " * 10, "c": "gamma"}
+    index = make_index(docs)
+    index.remove_numbers([1, 2])
+    index.restore_numbers([1, 2])
+
+    assert index.search("alpha", k=3) == pytest.approx(make_index(docs).search("alpha", k=3))
+
+
+def test_lengths_are_recounted_on_load(tmp_path):
+    docs = {"a": "alpha beta", "b": "alpha " * 10, "c": "alpha gamma delta"}
+    index = make_index(docs)
+    index.remove(["b"])
+    index.save(str(tmp_path / "bm25.pkl"))
+
+    loaded = BM25Index.load(str(tmp_path / "bm25.pkl"))
+    assert loaded.search("alpha", k=3) == pytest.approx(index.search("alpha", k=3))
+    assert [key for key, _ in loaded.search("alpha", k=3)] == ["a", "c"]
+
+
+def test_fully_deleted_index_returns_nothing():
+    index = make_index({"a": "alpha", "b": "beta"})
+    index.remove(["a", "b"])
+
+    assert index.search("alpha") == []
+
+
+def test_rrf_prefers_keys_ranked_by_both_lists():
+    # "c" is near the top of both lists, so it beats each list's own winner
+    assert reciprocal_rank_fusion([["a", "c", "d"], ["b", "c", "e"]])[0] == "c"
+
+
+def test_rrf_breaks_ties_by_first_appearance():
+    assert reciprocal_rank_fusion([["a", "b"], ["b", "a"]]) == ["a", "b"]
+    assert reciprocal_rank_fusion([["a", "b"], []]) == ["a", "b"]
+
+
+def test_rrf_rank_constant_weighs_lower_ranks():
+    rankings = [["a", "b", "c", "f", "d"], ["e", "g", "d"]]
+
+    # A small k rewards the top rank more than appearing in both lists
+    assert reciprocal_rank_fusion(rankings, k=1)[0] == "a"
+    assert reciprocal_rank_fusion(rankings, k=60)[0] == "d"
@@ -0,0 +1,28 @@
+import numpy as np
+
+from services import rag_retriever
+
+
+class RankedStore:
+    """A collection store with fixed dense and BM25 rankings."""
+    def __init__(self, dense, lexical):
+        self.dense = dense
+        self.lexical = lexical
+
+    def vector_search_ids(self, embeddings, k):
+        return [self.dense[:k] for _ in embeddings]
+
+    def lexical_search_ids(self, query, k):
+        return self.lexical[:k]
+
+    def get_documents(self, ids):
+        return list(ids)
+
+
+def test_hybrid_search_returns_fused_order(monkeypatch):
+    monkeypatch.setattr(rag_retriever, "_embed_normalized_queries", lambda queries: np.zeros((len(queries), 2)))
+    store = RankedStore(dense=["a", "b", "c", "d"], lexical=["c", "a", "e"])
+
+    assert rag_retriever._search(["query"], 3, "hybrid", store) == [["a", "c", "b"]]
+    assert rag_retriever._search(["query"], 2, "vector", store) == [["a", "b"]]
+    assert rag_retriever._search(["query"], 2, "lexical", store) == [["c", "a"]]
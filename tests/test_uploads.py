@@ -0,0 +1,72 @@
+import asyncio
+import hashlib
+import io
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from services.pdf_processor import save_pdf_upload
+from services.uploads import (
+    UploadOffsetMismatch, append_upload, complete_upload, create_upload, get_upload
+)
+
+
+def send(upload_id, offset, data):
+    async def pieces():
+        yield data
+    return asyncio.run(append_upload(upload_id, offset, pieces()))
+
+
+def test_chunk_at_wrong_offset_is_rejected():
+    upload_id = create_upload("manual.pdf")["upload_id"]
+    send(upload_id, 0, b"first part ")
+
+    with pytest.raises(UploadOffsetMismatch) as error:
+        send(upload_id, 5, b"second part")
+
+    # The client is told where to resume and nothing was written
+    assert error.value.offset == len(b"first part ")
+    assert get_upload(upload_id)["offset"] == len(b"first part ")
+    assert send(upload_id, error.value.offset, b"second part")["offset"] == len(b"first part second part")
+
+
+def test_hash_mismatch_keeps_the_upload(tmp_path):
+    upload_id = create_upload("manual.pdf", sha256=hashlib.sha256(b"expected").hexdigest())["upload_id"]
+    send(upload_id, 0, b"received")
+
+    with pytest.raises(ValueError, match="SHA-256 mismatch"):
+        asyncio.run(complete_upload(upload_id, str(tmp_path)))
+
+    assert get_upload(upload_id)["offset"] == len(b"received")
+    assert os.listdir(tmp_path) == []
+
+
+def test_uploads_with_the_same_name_keep_their_own_files(tmp_path):
+    paths = []
+    for data in (b"version one", b"version two"):
+        upload_id = create_upload("manual.pdf")["upload_id"]
+        send(upload_id, 0, data)
+        paths.append(asyncio.run(complete_upload(upload_id, str(tmp_path)))[0])
+
+    assert paths[0] != paths[1]
+    with open(paths[0], "rb") as f:
+        assert f.read() == b"version one"
+
+
+def test_multipart_uploads_with_the_same_name_keep_their_own_files(tmp_path):
+    saved = [
+        asyncio.run(save_pdf_upload(SimpleNamespace(filename="manual.pdf", file=io.BytesIO(data)), str(tmp_path)))
+        for data in (b"version one", b"version two")
+    ]
+
+    assert saved[0][0] != saved[1][0]
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(path) for path, _ in saved)
+    with open(saved[0][0], "rb") as f:
+        assert hashlib.sha256(f.read()).hexdigest() == saved[0][1]
+
+
+@pytest.mark.parametrize("filename", ["", ".", "..", "docs/.."])
+def test_names_without_a_file_are_rejected(filename):
+    with pytest.raises(ValueError, match="Invalid filename"):
+        create_upload(filename)
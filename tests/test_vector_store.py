@@ -0,0 +1,271 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from services import ann_index, vector_store
+from services.vector_store import CollectionStore, chunk_key, wait_for_index_maintenance
+
+
+def make_chunks(source, count, start=0):
+    return [
+        {"text": f"chunk {i} of {source} about topic{i % 7} and subject{i % 11}", "source": source, "chunk_id": i}
+        for i in range(start, start + count)
+    ]
+
+
+def reload(name):
+    """A fresh store for a collection, read back from disk."""
+    # Let the other store of the collection finish writing first
+    wait_for_index_maintenance()
+    store = CollectionStore(name)
+    store.ensure_loaded()
+    return store
+
+
+def search(store, text, k=5):
+    return store.vector_search_ids(vector_store.get_embedding_model().embed_query(text), k=k)[0]
+
+
+def test_reload_replays_vector_log():
+    store = reload("persist")
+    store.add_chunks(make_chunks("a.txt", 40))
+    for start in (40, 44):
+        store.add_chunks(make_chunks("a.txt", 4, start))
+
+    # The first add is a snapshot; the small ones after it only go to the log
+    assert store.generation == 1
+    assert store.get_store_stats()["vector_log_bytes"] > 0
+
+    reloaded = reload("persist")
+    assert reloaded.load_stats["logged_vectors"] == 8
+    assert reloaded.get_store_stats()["vectors"] == 48
+    assert reloaded.list_sources() == {"a.txt": 48}
+    np.testing.assert_allclose(reloaded.get_stored_vectors(), store.get_stored_vectors())
+    query = "chunk 46 of a.txt about topic4"
+    assert search(reloaded, query) == search(store, query)
+
+
+def test_log_is_merged_into_a_new_generation():
+    store = reload("merge")
+    store.add_chunks(make_chunks("a.txt", 8))
+    store.add_chunks(make_chunks("a.txt", 1, 8))
+    assert store.generation == 1
+    store.add_chunks(make_chunks("a.txt", 4, 9))
+    assert store.generation == 2
+
+    # Files of the previous generation are gone
+    files = set(os.listdir(store.directory))
+    assert "index.1.faiss" not in files and "index.2.faiss" in files
+    assert reload("merge").get_store_stats()["vectors"] == 13
+
+
+def test_deletions_and_compaction_survive_reload():
+    store = reload("deletes")
+    chunks = make_chunks("a.txt", 20) + make_chunks("b.txt", 20)
+    store.add_chunks(chunks)
+    store.delete_documents([chunk_key("a.txt", chunks[0]["text"])])
+
+    reloaded = reload("deletes")
+    assert reloaded.list_sources() == {"a.txt": 19, "b.txt": 20}
+    assert reloaded.get_store_stats()["deleted_vectors"] == 1
+
+    # Deleting a whole source passes COMPACT_DELETED_FRACTION; compaction
+    # renumbers positions in the background
+    assert reloaded.delete_source("a.txt") == 19
+    wait_for_index_maintenance()
+    assert reloaded.get_store_stats()["deleted_vectors"] == 0
+    compacted = reload("deletes")
+    assert compacted.list_sources() == {"b.txt": 20}
+    assert compacted.get_store_stats()["vectors"] == 20
+    assert set(search(compacted, "chunk 3 of a.txt", k=40)) <= {chunk_key("b.txt", c["text"]) for c in chunks[20:]}
+
+
+def test_deleted_source_can_be_added_again():
+    store = reload("readd")
+    chunks = make_chunks("notes.txt", 10)
+    store.add_chunks(chunks + make_chunks("manual.txt", 10))
+    keys = {chunk_key("notes.txt", chunk["text"]) for chunk in chunks}
+
+    assert store.delete_source("notes.txt") == 10
+    assert store.list_sources() == {"manual.txt": 10}
+    assert not keys & set(search(store, "chunk 3 of notes.txt", k=20))
+
+    # The same chunks are stored again rather than skipped as already present
+    store.add_chunks(chunks)
+    assert store.list_sources() == {"notes.txt": 10, "manual.txt": 10}
+    assert chunk_key("notes.txt", chunks[3]["text"]) == search(store, chunks[3]["text"], k=1)[0]
+
+    reloaded = reload("readd")
+    assert reloaded.list_sources() == {"notes.txt": 10, "manual.txt": 10}
+    assert search(reloaded, chunks[3]["text"], k=1) == [chunk_key("notes.txt", chunks[3]["text"])]
+    assert len(reloaded.get_documents(search(reloaded, "chunk of notes.txt", k=40))) == 20
+    assert reloaded.delete_source("notes.txt") == 10
+    assert reload("readd").list_sources() == {"manual.txt": 10}
+
+
+def test_bm25_catches_up_after_reload():
+    store = reload("lexical")
+    chunks = make_chunks("a.txt", 20)
+    store.add_chunks(chunks)
+    extra = [{"text": "zebra crossing", "source": "b.txt", "chunk_id": 0},
+             {"text": "quokka habitat", "source": "b.txt", "chunk_id": 1}]
+    store.add_chunks(extra)
+    store.delete_documents([chunk_key("b.txt", extra[1]["text"])])
+    # Deleted, then stored again at a new position
+    store.delete_documents([chunk_key("a.txt", chunks[0]["text"])])
+    store.add_chunks(chunks[:1])
+    assert store.generation == 1
+
+    reloaded = reload("lexical")
+    assert reloaded.lexical_search_ids("zebra") == [chunk_key("b.txt", extra[0]["text"])]
+    assert reloaded.lexical_search_ids("quokka") == []
+    assert chunk_key("a.txt", chunks[0]["text"]) in reloaded.lexical_search_ids("chunk 0 of a.txt", k=20)
+
+
+def test_partial_vector_log_record_is_ignored():
+    store = reload("torn")
+    store.add_chunks(make_chunks("a.txt", 20))
+    store.add_chunks(make_chunks("a.txt", 2, 20))
+    with open(store.vector_log_path, "ab") as f:
+        f.write(b"\0" * 7)
+
+    reloaded = reload("torn")
+    assert reloaded.get_store_stats()["vectors"] == 22
+    reloaded.add_chunks(make_chunks("a.txt", 1, 22))
+    assert reload("torn").list_sources() == {"a.txt": 23}
+
+
+def test_interrupted_generation_keeps_previous_one():
+    store = reload("crash")
+    store.add_chunks(make_chunks("a.txt", 10))
+    # Files of a generation whose manifest was never written
+    for file in ("index.2.faiss", "lexical.2.pkl", "vectors.2.log"):
+        with open(os.path.join(store.directory, file), "wb") as f:
+            f.write(b"partial")
+
+    reloaded = reload("crash")
+    assert reloaded.generation == 1
+    assert reloaded.get_store_stats()["vectors"] == 10
+    assert not os.path.exists(os.path.join(store.directory, "index.2.faiss"))
+
+
+def test_store_without_manifest_loads_as_generation_zero():
+    store = reload("legacy")
+    store.add_chunks(make_chunks("a.txt", 10))
+    # Lay the files out as stores written before manifests existed
+    os.remove(os.path.join(store.directory, "manifest.json"))
+    os.remove(store.vector_log_path)
+    os.rename(store.index_path, os.path.join(store.directory, "index.faiss"))
+    os.rename(store.lexical_index_path, os.path.join(store.directory, "lexical.pkl"))
+
+    legacy = reload("legacy")
+    assert legacy.generation == 0
+    assert legacy.list_sources() == {"a.txt": 10}
+    legacy.add_chunks(make_chunks("a.txt", 2, 10))
+    assert legacy.generation == 0
+    assert reload("legacy").list_sources() == {"a.txt": 12}
+
+
+def test_replace_source_hides_new_chunks_until_commit():
+    store = reload("replace")
+    old = make_chunks("a.txt", 6)
+    store.add_chunks(old)
+    new = old[:2] + [{"text": f"revised paragraph {i}", "source": "a.txt", "chunk_id": i} for i in range(2, 10)]
+
+    seen = []
+
+    def on_batch(batch):
+        # Batches are stored as they come, but the old version stays the visible one
+        seen.append((store.list_sources(), store.get_store_stats()["pending_vectors"]))
+        assert store.lexical_search_ids("revised") == []
+
+    assert store.replace_source("a.txt", iter(new), batch_size=3, on_batch=on_batch) == (8, 4)
+    assert seen == [({"a.txt": 6}, 1), ({"a.txt": 6}, 4), ({"a.txt": 6}, 7), ({"a.txt": 6}, 8)]
+    assert store.list_sources() == {"a.txt": 10}
+    assert reload("replace").list_sources() == {"a.txt": 10}
+
+
+def test_replace_source_renumbers_kept_chunks():
+    store = reload("renumber")
+    texts = ["alpha paragraph", "beta paragraph", "gamma paragraph"]
+    store.add_chunks([{"text": text, "source": "a.txt", "chunk_id": i} for i, text in enumerate(texts)])
+
+    texts.insert(0, "zeta paragraph")
+    assert store.replace_source("a.txt", [{"text": text, "source": "a.txt", "chunk_id": i}
+                                          for i, text in enumerate(texts)]) == (1, 0)
+
+    def chunk_ids(store):
+        docs = store.get_documents([chunk_key("a.txt", text) for text in texts])
+        return [doc.metadata["chunk_id"] for doc in docs]
+
+    assert chunk_ids(store) == [0, 1, 2, 3]
+    assert chunk_ids(reload("renumber")) == [0, 1, 2, 3]
+
+
+def test_failed_replace_source_keeps_old_version():
+    store = reload("replace-fail")
+    old = make_chunks("a.txt", 6)
+    store.add_chunks(old)
+
+    def chunks():
+        yield from [{"text": f"revised paragraph {i}", "source": "a.txt", "chunk_id": i} for i in range(4)]
+        raise RuntimeError("extraction failed")
+
+    with pytest.raises(RuntimeError):
+        store.replace_source("a.txt", chunks(), batch_size=2)
+    assert store.list_sources() == {"a.txt": 6}
+    assert store.lexical_search_ids("revised") == []
+    assert store.get_store_stats()["pending_vectors"] == 0
+
+    # An interrupted replacement is not committed on disk either
+    reloaded = reload("replace-fail")
+    assert reloaded.list_sources() == {"a.txt": 6}
+    assert reloaded.lexical_search_ids("revised") == []
+    assert search(reloaded, "revised paragraph 1", k=10) == search(store, "revised paragraph 1", k=10)
+
+
+def test_trained_index_is_retrained_after_growing(monkeypatch):
+    monkeypatch.setattr(ann_index, "INDEX_TYPE", "ivf")
+    monkeypatch.setattr(ann_index, "IVF_TRAIN_MIN_VECTORS", 50)
+    store = reload("retrain")
+
+    def add(count, start):
+        store.add_chunks(make_chunks("a.txt", count, start))
+        wait_for_index_maintenance()
+        return store.get_store_stats()
+
+    stats = add(60, 0)
+    assert stats["index"]["type"] == "ivf" and stats["trained_vectors"] == 60
+    # Below RETRAIN_GROWTH_FACTOR (4x) growth the trained index is kept
+    assert add(170, 60)["trained_vectors"] == 60
+    assert add(10, 230)["trained_vectors"] == 240
+    assert reload("retrain").get_store_stats()["trained_vectors"] == 240
+
+
+@pytest.fixture(autouse=True)
+def _drop_collections():
+    yield
+    vector_store.reset_vector_store()
+
+
+def test_searches_do_not_wait_on_each_other():
+    store = reload("concurrent")
+    store.add_chunks(make_chunks("a.txt", 20))
+    results = []
+
+    def search_and_add():
+        results.append(search(store, "chunk 3 of a.txt"))
+        store.add_chunks(make_chunks("a.txt", 1, 20))
+        results.append(store.list_sources())
+
+    # A search held open on this thread lets another search through, while
+    # the writer behind it waits until the search is done
+    with store._index_lock.reading():
+        worker = threading.Thread(target=search_and_add)
+        worker.start()
+        worker.join(timeout=1)
+        assert len(results) == 1 and worker.is_alive()
+    worker.join(timeout=5)
+    assert results[1] == {"a.txt": 21}